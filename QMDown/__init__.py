@@ -21,11 +21,6 @@ for logger_name in DISABLED_LOGGERS:
 LANG: Final = "zh_CN"
 os.environ["LANGUAGE"] = LANG
 LOCALE_DIR: Final = pathlib.Path(__file__).parent / "languages"
+# 只绑定翻译域,翻译文件在首次需要翻译时才加载
 gettext.bindtextdomain(LANG, LOCALE_DIR)
 gettext.textdomain(LANG)
-t = gettext.translation(
-    LANG,
-    localedir=LOCALE_DIR,
-    languages=[LANG],
-)
-t.install()
@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Any
+
+import httpx
+from qqmusic_api import Credential, Session, set_session
+
+from QMDown.api import album, lyric, search, singer, song, songlist, top
+from QMDown.api.cache import MetadataCache, set_cache
+from QMDown.api.pool import CredentialPool, Strategy, get_pool, set_pool
+from QMDown.utils.connection import API_POOL, CDN_POOL, PooledTransport, PoolLimits
+from QMDown.utils.fs import get_cache_dir
+from QMDown.utils.ratelimit import HostLimit, RateLimitedTransport
+
+session: Session | None = None
+_transport: PooledTransport | None = None
+
+
+async def setup(
+    credential: dict[str, str] | None = None,
+    credentials: list[dict[str, str]] | None = None,
+    strategy: Strategy = "least_loaded",
+    cache: bool = True,
+    cache_path: Path | None = None,
+    api_limit: HostLimit | None = None,
+    cdn_limit: HostLimit | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+    api_pool: PoolLimits = API_POOL,
+    cdn_pool: PoolLimits = CDN_POOL,
+    dns_ttl: float = 300.0,
+):
+    """
+    初始化 QQ 音乐 API 客户端
+
+    元数据接口和文件下载共用同一个会话,请求经过 `RateLimitedTransport` 限速、重试和熔断,
+    再由 `PooledTransport` 分别交给 API 和 CDN 的连接池.
+    提供多个账号时每个账号一个会话,接口调用通过 `CredentialPool` 分摊到各账号,会话共用同一个传输层.
+
+    Args:
+        credential: Cookies
+        credentials: 多个账号的 Cookies,与 `credential` 合并
+        strategy: 多账号时的选择策略
+        cache: 是否缓存元数据接口响应
+        cache_path: 缓存数据库路径,默认位于用户缓存目录
+        api_limit: API 主机限速
+        cdn_limit: CDN 主机限速
+        transport: 底层传输层,默认为 `PooledTransport`
+        api_pool: API 连接池配置,默认启用 HTTP/2
+        cdn_pool: CDN 连接池配置
+        dns_ttl: DNS 缓存时间(秒),0 为不缓存
+    """
+    global session, _transport
+    if session is not None:
+        raise RuntimeError("Session already initialized")
+    if transport is None:
+        transport = PooledTransport(api_limits=api_pool, cdn_limits=cdn_pool, dns_ttl=dns_ttl)
+    _transport = transport if isinstance(transport, PooledTransport) else None
+    transport = RateLimitedTransport(
+        transport,
+        api_limit=api_limit,
+        cdn_limit=cdn_limit,
+    )
+    cookies = ([credential] if credential else []) + (credentials or [])
+    sessions = {
+        str(item.get("musicid", i)): Session(credential=Credential.from_cookies_dict(dict(item)), transport=transport)
+        for i, item in enumerate(cookies)
+    } or {"": Session(credential=Credential(), transport=transport)}
+    session = next(iter(sessions.values()))
+    set_session(session)
+    set_pool(CredentialPool(sessions, strategy) if len(sessions) > 1 else None)
+    set_cache(MetadataCache(cache_path or get_cache_dir() / "metadata.sqlite3") if cache else None)
+
+
+async def close():
+    """
+    关闭 QQ 音乐 API 客户端和缓存
+    """
+    global session, _transport
+    set_cache(None)
+    if (pool := get_pool()) is not None:
+        set_pool(None)
+        await pool.aclose()
+    elif session is not None:
+        await session.aclose()
+    session = None
+    _transport = None
+
+
+def connection_stats() -> dict[str, dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+    """API 和 CDN 连接池的使用情况,未使用 `PooledTransport` 时为空"""
+    return _transport.stats() if _transport is not None else {}
+
+
+async def get_Session() -> Session:
+    """
+    获取当前的 QQ 音乐 API 会话
+    """
+    global session
+    if session is None:
+        raise RuntimeError("Session not initialized, please call setup() first")
+    return session
+
+
+__all__ = [
+    "album",
+    "close",
+    "connection_stats",
+    "get_Session",
+    "get_pool",
+    "lyric",
+    "search",
+    "setup",
+    "singer",
+    "song",
+    "songlist",
+    "top",
+]
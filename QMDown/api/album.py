@@ -0,0 +1,8 @@
+from qqmusic_api.album import *  # noqa: F403
+from qqmusic_api.album import get_detail as _get_detail
+from qqmusic_api.album import get_song as _get_song
+
+from QMDown.api.cache import cached
+
+get_detail = cached("album.get_detail")(_get_detail)
+get_song = cached("album.get_song")(_get_song)
@@ -0,0 +1,296 @@
+"""API 响应缓存
+
+内存 LRU 在前,SQLite 持久化存储在后.
+通过 `cached` 包装的接口在缓存未启用时直接请求远程 API.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine
+from functools import wraps
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar
+
+from QMDown.api.pool import pooled
+from QMDown.utils.metrics import timed
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# 单条 SQL 语句的参数数量上限,低于旧版 SQLite 的默认限制 999
+MAX_VARIABLES = 500
+
+# 各接口缓存有效期(秒)
+DEFAULT_TTLS: dict[str, int] = {
+    "album.get_detail": 7 * DAY,
+    "album.get_song": 7 * DAY,
+    "lyric.get_lyric": 7 * DAY,
+    "search.search_by_type": HOUR,
+    "singer.get_info": DAY,
+    "singer.get_songs_list": 6 * HOUR,
+    "singer.get_songs_list_all": 6 * HOUR,
+    "song.query_song": 7 * DAY,
+    "song.query_track": 7 * DAY,
+    "song.unavailable": DAY,
+    "songlist.get_detail": HOUR,
+    "songlist.get_songlist": HOUR,
+    "top.get_detail": 10 * MINUTE,
+}
+
+
+class MemoryCache:
+    """带过期时间的内存 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries: int = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()  # pyright: ignore[reportExplicitAny]
+
+    def get(self, key: str) -> tuple[bool, Any]:  # pyright: ignore[reportExplicitAny]
+        item = self._data.get(key)
+        if item is None:
+            return False, None
+        expires, value = item  # pyright: ignore[reportAny]
+        if expires < time.time():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, expires: float):  # pyright: ignore[reportExplicitAny, reportAny]
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            _ = self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteCache:
+    """基于 SQLite 的持久化缓存,超出 `max_entries` 时淘汰最久未访问的条目"""
+
+    def __init__(self, path: Path, max_entries: int = 100_000) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self.max_entries: int = max_entries
+        self._lock: threading.Lock = threading.Lock()
+        self._conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        _ = self._conn.execute("PRAGMA journal_mode=WAL")
+        _ = self._conn.execute("PRAGMA synchronous=NORMAL")
+        _ = self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL
+            )"""
+        )
+        _ = self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._writes: int = 0
+
+    def get(self, key: str) -> tuple[bool, Any, float]:  # pyright: ignore[reportExplicitAny]
+        now = time.time()
+        with self._lock:
+            row: tuple[str, float] | None = self._conn.execute(  # pyright: ignore[reportAny]
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None, 0
+            if row[1] < now:
+                _ = self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return False, None, 0
+            _ = self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return True, json.loads(row[0]), row[1]
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[Any, float]]:  # pyright: ignore[reportExplicitAny]
+        """返回命中的 `{key: (value, expires)}`
+
+        按 `MAX_VARIABLES` 分块,每块一次查询,命中和过期的条目分别以一次 `executemany` 更新和删除.
+        """
+        now = time.time()
+        result: dict[str, tuple[Any, float]] = {}  # pyright: ignore[reportExplicitAny]
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[i : i + MAX_VARIABLES]
+                rows: list[tuple[str, str, float]] = self._conn.execute(
+                    f"SELECT key, value, expires FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                hits = [(key, value, expires) for key, value, expires in rows if expires >= now]
+                if expired := [(key,) for key, _, expires in rows if expires < now]:
+                    _ = self._conn.executemany("DELETE FROM cache WHERE key = ?", expired)
+                if hits:
+                    _ = self._conn.executemany(
+                        "UPDATE cache SET accessed = ? WHERE key = ?", [(now, key) for key, _, _ in hits]
+                    )
+                result.update((key, (json.loads(value), expires)) for key, value, expires in hits)
+        return result
+
+    def set(self, key: str, value: Any, expires: float):  # pyright: ignore[reportExplicitAny, reportAny]
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            _ = self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, expires, time.time()),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def set_many(self, items: dict[str, Any], expires: float):  # pyright: ignore[reportExplicitAny]
+        now = time.time()
+        rows = [
+            (key, json.dumps(value, ensure_ascii=False, separators=(",", ":")), expires, now)
+            for key, value in items.items()  # pyright: ignore[reportAny]
+        ]
+        with self._lock:
+            _ = self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)", rows
+            )
+            self._writes += len(rows)
+            self._evict()
+
+    def _evict(self):
+        _ = self._conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        _ = self._conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            _ = self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
+
+
+class MetadataCache:
+    """两级 API 响应缓存
+
+    Args:
+        path: SQLite 数据库路径,为 `None` 时仅使用内存缓存
+        ttls: 各接口缓存有效期,覆盖 `DEFAULT_TTLS`
+        memory_entries: 内存缓存最大条目数
+        disk_entries: 磁盘缓存最大条目数
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        ttls: dict[str, int] | None = None,
+        memory_entries: int = 1024,
+        disk_entries: int = 100_000,
+    ) -> None:
+        self.ttls: dict[str, int] = DEFAULT_TTLS | (ttls or {})
+        self.memory: MemoryCache = MemoryCache(memory_entries)
+        self.disk: SQLiteCache | None = SQLiteCache(path, disk_entries) if path else None
+        self.inflight: dict[str, asyncio.Future[Any]] = {}  # pyright: ignore[reportExplicitAny]
+
+    @staticmethod
+    def make_key(endpoint: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:  # pyright: ignore[reportExplicitAny]
+        return f"{endpoint}:{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+
+    async def get(self, key: str) -> tuple[bool, Any]:  # pyright: ignore[reportExplicitAny]
+        hit, value = self.memory.get(key)  # pyright: ignore[reportAny]
+        if hit or self.disk is None:
+            return hit, value
+        hit, value, expires = await asyncio.to_thread(self.disk.get, key)  # pyright: ignore[reportAny]
+        if hit:
+            self.memory.set(key, value, expires)
+        return hit, value
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """批量读取,返回命中的条目;磁盘查询按块合并"""
+        result: dict[str, Any] = {}  # pyright: ignore[reportExplicitAny]
+        misses: list[str] = []
+        for key in keys:
+            hit, value = self.memory.get(key)  # pyright: ignore[reportAny]
+            if hit:
+                result[key] = value
+            else:
+                misses.append(key)
+        if misses and self.disk is not None:
+            for key, (value, expires) in (await asyncio.to_thread(self.disk.get_many, misses)).items():  # pyright: ignore[reportAny]
+                self.memory.set(key, value, expires)
+                result[key] = value
+        return result
+
+    async def set_many(self, items: dict[str, Any], ttl: int):  # pyright: ignore[reportExplicitAny]
+        expires = time.time() + ttl
+        for key, value in items.items():  # pyright: ignore[reportAny]
+            self.memory.set(key, value, expires)
+        if self.disk is not None and items:
+            await asyncio.to_thread(self.disk.set_many, items, expires)
+
+    async def set(self, key: str, value: Any, ttl: int):  # pyright: ignore[reportExplicitAny, reportAny]
+        expires = time.time() + ttl
+        self.memory.set(key, value, expires)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, expires)
+
+    def close(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.close()
+
+
+_cache: MetadataCache | None = None
+
+
+def set_cache(cache: MetadataCache | None):
+    """设置全局缓存,`None` 表示禁用"""
+    global _cache
+    if _cache is not None and _cache is not cache:
+        _cache.close()
+    _cache = cache
+
+
+def get_cache() -> MetadataCache | None:
+    return _cache
+
+
+def cached(endpoint: str):
+    """按 `endpoint` 对应的有效期缓存接口返回值"""
+
+    def decorator(func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:  # pyright: ignore[reportExplicitAny]
+        func = timed("api", endpoint=endpoint)(pooled(func))
+
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            cache = _cache
+            ttl = cache.ttls.get(endpoint, 0) if cache else 0
+            if cache is None or ttl <= 0:
+                return await func(*args, **kwargs)
+            key = cache.make_key(endpoint, args, kwargs)
+            hit, value = await cache.get(key)  # pyright: ignore[reportAny]
+            if hit:
+                return value  # pyright: ignore[reportAny]
+            # 合并相同参数的并发请求
+            if (inflight := cache.inflight.get(key)) is not None:
+                return await asyncio.shield(inflight)
+            future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+            cache.inflight[key] = future
+            try:
+                result = await func(*args, **kwargs)
+                await cache.set(key, result, ttl)
+            except BaseException as e:
+                future.set_exception(e)
+                _ = future.exception()  # 标记异常已处理
+                raise
+            else:
+                future.set_result(result)
+            finally:
+                del cache.inflight[key]
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,6 @@
+from qqmusic_api.lyric import *  # noqa: F403
+from qqmusic_api.lyric import get_lyric as _get_lyric
+
+from QMDown.api.cache import cached
+
+get_lyric = cached("lyric.get_lyric")(_get_lyric)
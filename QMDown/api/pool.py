@@ -0,0 +1,145 @@
+"""多账号会话池"""
+
+import time
+from collections.abc import AsyncGenerator, Callable, Coroutine, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Literal, ParamSpec, TypeVar
+
+import httpx
+from qqmusic_api import Session
+from qqmusic_api.exceptions import CredentialExpiredError, CredentialInvalidError, ResponseCodeError
+
+# qqmusic_api 的接口通过该上下文变量获取会话;set_session 每次调用都会输出日志且无法恢复原值,因此直接使用
+from qqmusic_api.utils.session import _session_context  # pyright: ignore[reportPrivateUsage]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+Strategy = Literal["least_loaded", "round_robin"]
+
+# 请求频率超限或触发安全验证时接口返回的响应码
+QUOTA_CODES = frozenset({2001, 104400, 104401})
+
+
+@dataclass(eq=False)
+class Account:
+    name: str
+    session: Session
+    active: int = 0
+    """进行中的请求数"""
+    requests: int = 0
+    errors: int = 0
+    evicted_until: float = 0.0
+
+
+class CredentialPool:
+    """多账号会话池
+
+    每个账号一个 `Session`,每次接口调用按策略选择账号:`least_loaded` 选择进行中请求最少的账号,
+    `round_robin` 依次轮换. 凭证失效、HTTP 429 或 `evict_codes` 中的响应码会使账号在 `cooldown` 秒内不被选择,
+    所有账号都被剔除时选择最早恢复的账号.
+
+    Args:
+        sessions: 账号名到会话的映射
+        strategy: 选择策略
+        cooldown: 剔除时长(秒)
+        evict_codes: 视为配额耗尽的 API 响应码,默认为 `QUOTA_CODES`
+    """
+
+    def __init__(
+        self,
+        sessions: dict[str, Session],
+        strategy: Strategy = "least_loaded",
+        cooldown: float = 300.0,
+        evict_codes: Iterable[int] = QUOTA_CODES,
+    ) -> None:
+        if not sessions:
+            raise ValueError("sessions must not be empty")
+        self.accounts: list[Account] = [Account(name, session) for name, session in sessions.items()]
+        self.strategy: Strategy = strategy
+        self.cooldown: float = cooldown
+        self.evict_codes: frozenset[int] = frozenset(evict_codes)
+        self._next: int = 0
+
+    def select(self) -> Account:
+        now = time.monotonic()
+        available = [account for account in self.accounts if account.evicted_until <= now]
+        if not available:
+            return min(self.accounts, key=lambda account: account.evicted_until)
+        if self.strategy == "round_robin":
+            account = available[self._next % len(available)]
+            self._next += 1
+            return account
+        return min(available, key=lambda account: (account.active, account.requests))
+
+    def evict(self, account: Account, cooldown: float | None = None):
+        account.evicted_until = time.monotonic() + (self.cooldown if cooldown is None else cooldown)
+
+    def _should_evict(self, error: Exception) -> bool:
+        if isinstance(error, CredentialExpiredError | CredentialInvalidError):
+            return True
+        if isinstance(error, ResponseCodeError):
+            return error.code in self.evict_codes
+        return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+    @asynccontextmanager
+    async def use(self) -> AsyncGenerator[Account, None]:
+        """选择账号,上下文中的接口调用使用该账号的会话"""
+        account = self.select()
+        account.active += 1
+        account.requests += 1
+        token = _session_context.set(account.session)
+        try:
+            yield account
+        except Exception as e:
+            if self._should_evict(e):
+                account.errors += 1
+                self.evict(account)
+            raise
+        finally:
+            account.active -= 1
+            _session_context.reset(token)
+
+    def stats(self) -> list[dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+        now = time.monotonic()
+        return [
+            {
+                "name": account.name,
+                "active": account.active,
+                "requests": account.requests,
+                "errors": account.errors,
+                "evicted": account.evicted_until > now,
+            }
+            for account in self.accounts
+        ]
+
+    async def aclose(self):
+        for account in self.accounts:
+            await account.session.aclose()
+
+
+_pool: CredentialPool | None = None
+
+
+def set_pool(pool: CredentialPool | None):
+    global _pool
+    _pool = pool
+
+
+def get_pool() -> CredentialPool | None:
+    return _pool
+
+
+def pooled(func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:  # pyright: ignore[reportExplicitAny]
+    """启用账号池时通过池中选出的账号调用接口"""
+
+    @wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        if _pool is None:
+            return await func(*args, **kwargs)
+        async with _pool.use():
+            return await func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,6 @@
+from qqmusic_api.search import *  # noqa: F403
+from qqmusic_api.search import search_by_type as _search_by_type
+
+from QMDown.api.cache import cached
+
+search_by_type = cached("search.search_by_type")(_search_by_type)
@@ -0,0 +1,10 @@
+from qqmusic_api.singer import *  # noqa: F403
+from qqmusic_api.singer import get_info as _get_info
+from qqmusic_api.singer import get_songs_list as _get_songs_list
+from qqmusic_api.singer import get_songs_list_all as _get_songs_list_all
+
+from QMDown.api.cache import cached
+
+get_info = cached("singer.get_info")(_get_info)
+get_songs_list = cached("singer.get_songs_list")(_get_songs_list)
+get_songs_list_all = cached("singer.get_songs_list_all")(_get_songs_list_all)
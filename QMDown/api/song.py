@@ -0,0 +1,141 @@
+import asyncio
+from collections.abc import Sequence
+from typing import Any
+
+from qqmusic_api import get_session
+from qqmusic_api.song import *  # noqa: F403
+from qqmusic_api.song import SongFileType as SongFileType
+from qqmusic_api.song import get_song_urls as _get_song_urls
+from qqmusic_api.song import query_song as _query_song
+
+from QMDown.api.cache import cached, get_cache
+from QMDown.api.pool import get_pool, pooled
+from QMDown.utils.batch import Batcher
+from QMDown.utils.metrics import timed
+
+query_song = cached("song.query_song")(_query_song)
+
+
+@timed("api", endpoint="song.query_song")
+@pooled
+async def _query_by_id(ids: list[int]) -> dict[int, dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+    return {track["id"]: track for track in await _query_song(ids)}
+
+
+@timed("api", endpoint="song.query_song")
+@pooled
+async def _query_by_mid(mids: list[str]) -> dict[str, dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+    return {track["mid"]: track for track in await _query_song(mids)}
+
+
+_id_batcher = Batcher(_query_by_id)
+_mid_batcher = Batcher(_query_by_mid)
+
+
+@cached("song.query_track")
+async def query_track(value: int | str) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+    """根据 id 或 mid 获取单首歌曲信息,并发调用合并为批量请求"""
+    if isinstance(value, int):
+        return await _id_batcher.get(value)
+    return await _mid_batcher.get(value)
+
+
+_url_batchers: dict[SongFileType, Batcher[str, str]] = {}
+
+
+async def get_file_urls(mids: list[str], file_type: SongFileType = SongFileType.MP3_128) -> dict[str, str]:
+    """获取歌曲文件链接,并发调用合并为批量请求
+
+    Returns:
+        `{mid: url}`,无可用链接时为空字符串
+    """
+    if (batcher := _url_batchers.get(file_type)) is None:
+
+        @timed("api", endpoint="song.get_song_urls")
+        @pooled
+        async def _func(mids: list[str]) -> dict[str, str]:
+            return await _get_song_urls(mids, file_type)
+
+        batcher = _url_batchers[file_type] = Batcher(_func, max_size=300)
+    urls = await batcher.get_many(mids)
+    # 接口未返回的歌曲同样视为无可用链接
+    return {mid: urls.get(mid, "") for mid in mids}
+
+
+async def _probe_file_urls(
+    probes: dict[SongFileType, list[str]],
+) -> tuple[dict[SongFileType, dict[str, str]], dict[SongFileType, BaseException]]:
+    """并发查询各音质的链接,分别返回查询成功的结果和查询失败的错误"""
+    results = await asyncio.gather(
+        *(get_file_urls(probe, file_type) for file_type, probe in probes.items()),
+        return_exceptions=True,
+    )
+    found: dict[SongFileType, dict[str, str]] = {}
+    errors: dict[SongFileType, BaseException] = {}
+    for file_type, result in zip(probes, results, strict=True):
+        if isinstance(result, BaseException):
+            errors[file_type] = result
+        else:
+            found[file_type] = result
+    return found, errors
+
+
+async def resolve_file_urls(
+    mids: list[str],
+    file_types: Sequence[SongFileType],
+) -> dict[str, tuple[SongFileType, str] | None]:
+    """按 `file_types` 的优先顺序为每首歌曲选择可用的最高音质
+
+    所有音质在同一轮中并发批量查询,而不是逐首逐音质依次尝试.
+    无可用链接的歌曲音质按 `song.unavailable` 的有效期缓存,期间不再查询;缓存按账号区分.
+    启用账号池时每批请求由池中选出的账号处理,查询前无法确定账号,因此不使用该缓存.
+
+    查询失败的音质重试一次,仍然失败且会影响歌曲的音质选择时抛出异常,
+    只有查询成功但没有链接时才选择较低音质.
+
+    Returns:
+        `{mid: (file_type, url)}`,所有音质均不可用时为 `None`
+    """
+    cache = get_cache() if get_pool() is None else None
+    ttl = cache.ttls.get("song.unavailable", 0) if cache else 0
+    credential = get_session().credential
+    account = credential.musicid if credential else 0
+    keys = {
+        (mid, file_type): f"song.unavailable:{account}:{file_type.name}:{mid}"
+        for file_type in file_types
+        for mid in mids
+    }
+    unavailable = await cache.get_many(list(keys.values())) if cache and ttl else {}
+
+    probes = {file_type: [mid for mid in mids if keys[mid, file_type] not in unavailable] for file_type in file_types}
+    probes = {file_type: probe for file_type, probe in probes.items() if probe}
+    found, errors = await _probe_file_urls(probes)
+    if errors:
+        retried, errors = await _probe_file_urls({file_type: probes[file_type] for file_type in errors})
+        found |= retried
+
+    if cache and ttl:
+        # 只缓存查询成功的结果
+        await cache.set_many(
+            {
+                keys[mid, file_type]: True
+                for file_type, urls in found.items()
+                for mid in probes[file_type]
+                if not urls[mid]
+            },
+            ttl,
+        )
+
+    resolved: dict[str, tuple[SongFileType, str] | None] = {}
+    for mid in mids:
+        resolved[mid] = None
+        for file_type in file_types:
+            if keys[mid, file_type] in unavailable:
+                continue
+            # 查询失败不等于没有链接,不能静默选择较低音质
+            if (error := errors.get(file_type)) is not None:
+                raise error
+            if url := found[file_type][mid]:
+                resolved[mid] = (file_type, url)
+                break
+    return resolved
@@ -0,0 +1,8 @@
+from qqmusic_api.songlist import *  # noqa: F403
+from qqmusic_api.songlist import get_detail as _get_detail
+from qqmusic_api.songlist import get_songlist as _get_songlist
+
+from QMDown.api.cache import cached
+
+get_detail = cached("songlist.get_detail")(_get_detail)
+get_songlist = cached("songlist.get_songlist")(_get_songlist)
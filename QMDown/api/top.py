@@ -0,0 +1,6 @@
+from qqmusic_api.top import *  # noqa: F403
+from qqmusic_api.top import get_detail as _get_detail
+
+from QMDown.api.cache import cached
+
+get_detail = cached("top.get_detail")(_get_detail)
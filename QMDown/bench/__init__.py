@@ -0,0 +1,7 @@
+"""基准测试
+
+模拟服务和运行器分别位于 `QMDown.bench.mock` 与 `QMDown.bench.runner`,
+此处只定义工作负载名称,导入时不加载下载相关模块.
+"""
+
+WORKLOADS = ("single", "toplist", "playlists", "album", "singer")
@@ -0,0 +1,289 @@
+"""本地模拟的 QQ 音乐 API 与 CDN 服务"""
+
+# 请求与响应均为未经校验的 JSON
+# pyright: reportAny=false
+
+import asyncio
+import json
+import random
+import re
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Any
+
+import httpx
+from typing_extensions import override
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+_PATTERN = bytes(range(256)) * 256
+_COVER_PATH = "/music/photo_new/"
+_FILE_RE = re.compile(r"/[A-Z0-9]{4}(?P<mid>[0-9A-Za-z]+?)(?P=mid)\.")
+
+
+@dataclass
+class MockConfig:
+    """模拟服务配置
+
+    Attributes:
+        latency: 每个请求的额外延迟(秒)
+        bandwidth: 每个连接的带宽(字节/秒),0 表示不限
+        error_rate: 请求返回 503 的概率
+        file_size: 音频文件大小(字节)
+        cover_size: 专辑封面大小(字节),800px 的 JPEG 约 100KB
+        toplist_size: 排行榜歌曲数
+        songlist_size: 歌单歌曲数
+        album_size: 专辑歌曲数
+        singer_size: 歌手歌曲数
+        search_size: 搜索结果数,第一个结果的标题与关键词相同
+    """
+
+    latency: float = 0.0
+    bandwidth: float = 0.0
+    error_rate: float = 0.0
+    file_size: int = 1024 * 1024
+    cover_size: int = 100 * 1024
+    toplist_size: int = 1000
+    songlist_size: int = 20
+    album_size: int = 50
+    singer_size: int = 300
+    search_size: int = 60
+
+
+@dataclass
+class MockStats:
+    api_requests: int = 0
+    cdn_requests: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    methods: dict[str, int] = field(default_factory=dict)
+
+
+def make_track(song_id: int, file_size: int) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+    mid = f"M{song_id:013d}"
+    return {
+        "id": song_id,
+        "mid": mid,
+        "name": f"Track {song_id}",
+        "title": f"Track {song_id}",
+        "interval": 240,
+        "singer": [{"id": song_id % 100, "mid": f"S{song_id % 100:013d}", "name": f"Singer {song_id % 100}"}],
+        "album": {"id": song_id // 10, "mid": f"A{song_id // 10:013d}", "name": f"Album {song_id // 10}"},
+        "file": {
+            "media_mid": mid,
+            "size_128mp3": file_size,
+            "size_320mp3": file_size,
+            "size_flac": file_size,
+        },
+    }
+
+
+def _song_id(mid: str) -> int:
+    return int(mid[1:]) if mid[1:].isdigit() else 0
+
+
+class MockServer:
+    """模拟 API 与 CDN 的 HTTP/1.1 服务
+
+    POST 请求按 `musicu.fcg` 的格式处理,GET 请求视为 CDN 文件下载并支持 Range.
+    集合中的歌曲 id 由集合 id 推导,不同集合之间互不重复.
+    """
+
+    def __init__(self, config: MockConfig | None = None) -> None:
+        self.config: MockConfig = config or MockConfig()
+        self.stats: MockStats = MockStats()
+        self._server: asyncio.Server | None = None
+
+    @property
+    def origin(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Server not started")
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.origin
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        _ = await self.start()
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ):
+        await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = header.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+
+                if self.config.latency:
+                    await asyncio.sleep(self.config.latency)
+                if method == "POST":
+                    self.stats.api_requests += 1
+                else:
+                    self.stats.cdn_requests += 1
+                if self.config.error_rate and random.random() < self.config.error_rate:
+                    self.stats.errors += 1
+                    await self._send(writer, 503, b"")
+                elif method == "POST":
+                    await self._send(writer, 200, self._api(json.loads(body)), "application/json")
+                else:
+                    await self._cdn(writer, target, headers.get("range"))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        content_type: str = "application/octet-stream",
+        headers: dict[str, str] | None = None,
+    ):
+        lines = [
+            f"HTTP/1.1 {status} {httpx.codes.get_reason_phrase(status)}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            *(f"{key}: {value}" for key, value in (headers or {}).items()),
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _cdn(self, writer: asyncio.StreamWriter, target: str, range_header: str | None):
+        cover = target.startswith(_COVER_PATH)
+        size = self.config.cover_size if cover else self.config.file_size
+        match = _FILE_RE.match(target)
+        etag = f'"{match.group("mid") if match else "file"}-{size}"'
+        start, end = 0, size - 1
+        status = 200
+        headers = {"Accept-Ranges": "bytes", "ETag": etag}
+        if range_header and (m := _RANGE_RE.fullmatch(range_header)):
+            start = int(m.group(1))
+            end = min(int(m.group(2)) if m.group(2) else size - 1, size - 1)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1
+        head = [
+            f"HTTP/1.1 {status} {httpx.codes.get_reason_phrase(status)}",
+            f"Content-Type: {'image/jpeg' if cover else 'audio/mpeg'}",
+            f"Content-Length: {length}",
+            *(f"{key}: {value}" for key, value in headers.items()),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        offset = start
+        while offset <= end:
+            pos = offset % len(_PATTERN)
+            chunk = _PATTERN[pos : pos + min(end + 1 - offset, len(_PATTERN) - pos)]
+            writer.write(chunk)
+            await writer.drain()
+            offset += len(chunk)
+            self.stats.bytes_sent += len(chunk)
+            if self.config.bandwidth:
+                await asyncio.sleep(len(chunk) / self.config.bandwidth)
+
+    def _api(self, payload: dict[str, Any]) -> bytes:  # pyright: ignore[reportExplicitAny]
+        response: dict[str, Any] = {"code": 0}  # pyright: ignore[reportExplicitAny]
+        for key, request in payload.items():
+            if key == "comm":
+                continue
+            name = f"{request['module']}.{request['method']}"
+            self.stats.methods[name] = self.stats.methods.get(name, 0) + 1
+            data = self._dispatch(name, request.get("param", {}))
+            response[key] = {"code": 0, "data": data} if data is not None else {"code": 404}
+        return json.dumps(response).encode()
+
+    def _tracks(self, base: int, begin: int, num: int, total: int) -> list[dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+        return [make_track(base + i, self.config.file_size) for i in range(begin, min(begin + num, total))]
+
+    def _dispatch(self, name: str, param: dict[str, Any]) -> Any:  # pyright: ignore[reportExplicitAny]
+        cfg = self.config
+        match name:
+            case "music.trackInfo.UniformRuleCtrl.CgiGetTrackInfo":
+                ids = param.get("ids") or [_song_id(mid) for mid in param.get("mids", [])]
+                return {"tracks": [make_track(song_id, cfg.file_size) for song_id in ids]}
+            case "music.vkey.GetVkey.UrlGetVkey":
+                return {
+                    "midurlinfo": [
+                        {"songmid": mid, "wifiurl": f"{filename}?vkey=mock", "ekey": ""}
+                        for mid, filename in zip(param["songmid"], param["filename"], strict=False)
+                    ]
+                }
+            case "music.musicToplist.Toplist.GetDetail":
+                base = 10_000_000 + int(param["topId"]) * 100_000
+                return {
+                    "data": {"title": f"Toplist {param['topId']}", "totalNum": cfg.toplist_size},
+                    "songInfoList": self._tracks(base, int(param["offset"]), int(param["num"]), cfg.toplist_size),
+                }
+            case "music.srfDissInfo.DissInfo.CgiGetDiss":
+                base = 20_000_000 + int(param["disstid"]) % 10_000 * 1_000
+                return {
+                    "dirinfo": {"title": f"Songlist {param['disstid']}"},
+                    "total_song_num": cfg.songlist_size,
+                    "songlist": self._tracks(base, int(param["song_begin"]), int(param["song_num"]), cfg.songlist_size),
+                }
+            case "music.musichallAlbum.AlbumInfoServer.GetAlbumDetail":
+                album = param.get("albumMId") or param.get("albumId")
+                return {"basicInfo": {"albumName": f"Album {album}"}}
+            case "music.musichallAlbum.AlbumSongList.GetAlbumSongList":
+                base = 30_000_000 + hash(str(param.get("albumMid") or param.get("albumId"))) % 1_000 * 1_000
+                songs = self._tracks(base, int(param["begin"]), int(param["num"]), cfg.album_size)
+                return {"songList": [{"songInfo": song} for song in songs]}
+            case "music.UnifiedHomepage.UnifiedHomepageSrv.GetHomepageHeader":
+                return {"Info": {"Singer": {"Name": f"Singer {param['SingerMid']}"}}}
+            case "musichall.song_list_server.GetSingerSongList":
+                base = 40_000_000 + hash(param["singerMid"]) % 1_000 * 10_000
+                songs = self._tracks(base, int(param["begin"]), int(param["number"]), cfg.singer_size)
+                return {"totalNum": cfg.singer_size, "songList": [{"songInfo": song} for song in songs]}
+            case _:
+                return self._dispatch_misc(name, param)
+
+    def _dispatch_misc(self, name: str, param: dict[str, Any]) -> Any:  # pyright: ignore[reportExplicitAny]
+        match name:
+            case "music.musichallSong.PlayLyricInfo.GetPlayLyricInfo":
+                return {"lyric": "", "trans": "", "roma": ""}
+            case "music.search.SearchCgiService.DoSearchForQQMusicMobile":
+                return self._search(param)
+            case _:
+                return None
+
+    def _search(self, param: dict[str, Any]) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        query, num = param["query"], int(param["num_per_page"])
+        begin = (int(param["page_num"]) - 1) * num
+        songs = self._tracks(50_000_000 + hash(query) % 1_000 * 1_000, begin, num, self.config.search_size)
+        if begin == 0 and songs:
+            songs[0]["name"] = songs[0]["title"] = query
+        return {"body": {"item_song": songs}}
+
+
+class RewriteTransport(httpx.AsyncBaseTransport):
+    """将所有请求改写到 `origin`,用于把 API 与 CDN 请求导向模拟服务"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, origin: str) -> None:
+        self.transport: httpx.AsyncBaseTransport = transport
+        self.origin: httpx.URL = httpx.URL(origin)
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self.origin.scheme, host=self.origin.host, port=self.origin.port)
+        return await self.transport.handle_async_request(request)
+
+    @override
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,213 @@
+"""基于模拟服务的端到端基准测试"""
+
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, override
+
+from QMDown import __version__, api, console
+from QMDown.api.song import SongFileType
+from QMDown.bench import WORKLOADS
+from QMDown.bench.mock import MockConfig, MockServer, RewriteTransport
+from QMDown.downloader import Downloader, DownloadTask
+from QMDown.postprocess import PostProcessor
+from QMDown.track import Track
+from QMDown.utils.connection import API_POOL, CDN_POOL, PooledTransport, create_transport
+from QMDown.utils.library import LibraryIndex
+from QMDown.utils.metrics import Metrics, set_metrics
+from QMDown.utils.ratelimit import HostLimit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def workload_urls(name: str, config: MockConfig) -> tuple[list[str], int]:
+    """返回工作负载的 URL 列表和预期歌曲数"""
+    match name:
+        case "single":
+            return ["https://y.qq.com/n/ryqq/songDetail/M0000000000001"], 1
+        case "toplist":
+            return ["https://y.qq.com/n/ryqq/toplist/26"], config.toplist_size
+        case "playlists":
+            return [f"https://y.qq.com/n/ryqq/playlist/{7000 + i}" for i in range(50)], config.songlist_size * 50
+        case "album":
+            return ["https://y.qq.com/n/ryqq/albumDetail/002MAeob3zLXwZ"], config.album_size
+        case "singer":
+            return ["https://y.qq.com/n/ryqq/singer/0025NhlN2yWrP4"], config.singer_size
+        case _:
+            raise ValueError(f"Unknown workload: {name}")
+
+
+@dataclass
+class WorkloadResult:
+    name: str
+    expected: int
+    tracks: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    tracks_per_sec: float = 0.0
+    mb_per_sec: float = 0.0
+    latency_p50: float = 0.0
+    """从任务开始到单首歌曲下载完成的耗时(秒)"""
+    latency_p99: float = 0.0
+    peak_rss_mb: float | None = None
+    api_requests: int = 0
+    cdn_requests: int = 0
+    errors: int = 0
+    stages: dict[str, list[dict[str, Any]]] = field(default_factory=dict)  # pyright: ignore[reportExplicitAny]
+    """各阶段耗时直方图摘要"""
+    connections: dict[str, dict[str, Any]] = field(default_factory=dict)  # pyright: ignore[reportExplicitAny]
+    """API 和 CDN 连接池的使用情况"""
+
+
+@dataclass
+class BenchReport:
+    version: str = __version__
+    python: str = platform.python_version()
+    platform: str = sys.platform
+    config: dict[str, Any] = field(default_factory=dict)  # pyright: ignore[reportExplicitAny]
+    workloads: list[WorkloadResult] = field(default_factory=list)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KiB,macOS 为字节
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+class _TimedDownloader(Downloader):
+    """记录每首歌曲完成时间的下载器"""
+
+    def __init__(self, **kwargs: Any) -> None:  # pyright: ignore[reportExplicitAny, reportAny]
+        super().__init__(**kwargs)  # pyright: ignore[reportAny]
+        self.started: float = time.perf_counter()
+        self.latencies: list[float] = []
+        self.downloaded: int = 0
+
+    @override
+    async def _download(
+        self,
+        song: Track,
+        url: str,
+        path: Path,
+        resume: bool,
+        file_type: SongFileType,
+    ) -> Path | None:
+        result = await super()._download(song, url, path, resume, file_type)
+        if result is not None:
+            self.latencies.append(time.perf_counter() - self.started)
+            self.downloaded += result.stat().st_size
+        return result
+
+
+async def run_workload(
+    name: str,
+    server: MockServer,
+    concurrency: int = 8,
+    connections: int = 4,
+    tag: bool = False,
+) -> WorkloadResult:
+    urls, expected = workload_urls(name, server.config)
+    result = WorkloadResult(name=name, expected=expected)
+    api_requests, cdn_requests, errors = server.stats.api_requests, server.stats.cdn_requests, server.stats.errors
+
+    unlimited = HostLimit(1_000_000, 1_000_000)
+    await api.setup(
+        cache=False,
+        api_limit=unlimited,
+        cdn_limit=unlimited,
+        transport=PooledTransport(
+            RewriteTransport(create_transport(API_POOL), server.origin),
+            RewriteTransport(create_transport(CDN_POOL), server.origin),
+        ),
+    )
+    (await api.get_Session()).enable_cache = False
+    set_metrics(metrics := Metrics())
+    try:
+        with tempfile.TemporaryDirectory(prefix="qmdown-bench-") as tmp, LibraryIndex(Path(tmp)) as index:
+            downloader = _TimedDownloader(
+                concurrency=concurrency,
+                connections=connections,
+                index=index,
+                postprocessor=PostProcessor() if tag else None,
+                output=Path(tmp),
+            )
+            downloader.start()
+            for url in urls:
+                await downloader.add_task(DownloadTask(url=url))
+            await downloader.add_stop_task()
+            await downloader.wait_for_completion()
+            result.seconds = time.perf_counter() - downloader.started
+            result.tracks = len(downloader.latencies)
+            result.bytes = downloader.downloaded
+            result.connections = api.connection_stats()
+    finally:
+        set_metrics(None)
+        await api.close()
+
+    result.tracks_per_sec = result.tracks / result.seconds if result.seconds else 0.0
+    result.mb_per_sec = result.bytes / 1024 / 1024 / result.seconds if result.seconds else 0.0
+    result.latency_p50 = percentile(downloader.latencies, 50)
+    result.latency_p99 = percentile(downloader.latencies, 99)
+    result.peak_rss_mb = peak_rss_mb()
+    result.api_requests = server.stats.api_requests - api_requests
+    result.cdn_requests = server.stats.cdn_requests - cdn_requests
+    result.errors = server.stats.errors - errors
+    result.stages = {
+        name: [{key: value for key, value in item.items() if key != "buckets"} for item in series]  # pyright: ignore[reportAny]
+        for name, series in metrics.to_json().items()
+    }
+    return result
+
+
+async def run_bench(
+    workloads: list[str] | None = None,
+    config: MockConfig | None = None,
+    concurrency: int = 8,
+    connections: int = 4,
+    tag: bool = False,
+) -> BenchReport:
+    """启动模拟服务并依次运行工作负载
+
+    Args:
+        workloads: 工作负载名称,默认运行全部
+        config: 模拟服务配置
+        concurrency: 下载器并发工作协程数量
+        connections: 单文件最大并发连接数
+        tag: 是否写入标签和封面
+    """
+    config = config or MockConfig()
+    report = BenchReport(config={**asdict(config), "concurrency": concurrency, "connections": connections, "tag": tag})
+    quiet = console.quiet
+    console.quiet = True
+    try:
+        async with MockServer(config) as server:
+            for name in workloads or WORKLOADS:
+                report.workloads.append(await run_workload(name, server, concurrency, connections, tag))
+    finally:
+        console.quiet = quiet
+    return report
+
+
+def report_to_dict(report: BenchReport) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+    data = asdict(report)
+    for workload in data["workloads"]:  # pyright: ignore[reportAny]
+        for key, value in workload.items():  # pyright: ignore[reportAny]
+            if isinstance(value, float):
+                workload[key] = round(value, 4)
+    return data
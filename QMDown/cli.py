@@ -1,21 +1,48 @@
+import asyncio
+import json
 import logging
 import re
+import sys
+from collections import OrderedDict
+from collections.abc import AsyncIterator
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Any, TextIO
 
+import click
 import typer
-from rich import box
-from rich.align import Align
-from rich.console import Group, RenderableType
-from rich.logging import RichHandler
-from rich.panel import Panel
+from rich.console import RenderableType
 from rich.text import Text
-from rich_pyfiglet import RichFiglet
 from typer import rich_utils
 
 from QMDown import __version__, console
-from QMDown.downloader import Downloader, DownloadTask
+from QMDown.bench import WORKLOADS
 from QMDown.utils.async_typer import AsyncTyper
+from QMDown.utils.fs import get_cache_dir
+
+if TYPE_CHECKING:
+    from QMDown.downloader import Downloader
+    from QMDown.searcher import Searcher, SearchQuery
+    from QMDown.utils.jobqueue import JobQueue
+    from QMDown.utils.ratelimit import BandwidthLimiter
+
+# 下载相关模块(qqmusic_api、httpx 等)只在需要的命令中导入,以加快启动速度
+
+# 与 qqmusic_api.song.SongFileType 的成员一一对应
+QUALITIES = (
+    "master",
+    "atmos_2",
+    "atmos_51",
+    "flac",
+    "ogg_640",
+    "ogg_320",
+    "ogg_192",
+    "ogg_96",
+    "mp3_320",
+    "mp3_128",
+    "acc_192",
+    "acc_96",
+    "acc_48",
+)
 
 app = AsyncTyper(
     invoke_without_command=False,
@@ -36,6 +63,8 @@ def handle_no_color(value: bool):
 
 
 def handle_debug(value: bool):
+    from rich.logging import RichHandler
+
     logging.basicConfig(
         level="DEBUG" if value else "INFO",
         format="%(message)s",
@@ -52,19 +81,44 @@ def handle_debug(value: bool):
 
 
 def get_banner() -> RenderableType | None:
+    """非交互输出时不显示横幅,渲染结果按版本和终端参数缓存"""
+    if not console.is_terminal:
+        return None
+    cache = get_cache_dir() / f"banner-{__version__}-{console.width}-{console.color_system}-{console.no_color:d}.txt"
+    try:
+        return Text.from_ansi(cache.read_text(encoding="utf-8"), end="")
+    except OSError:
+        pass
+
+    from rich import box
+    from rich.align import Align
+    from rich.console import Group
+    from rich.panel import Panel
+    from rich_pyfiglet import RichFiglet
+
     title = RichFiglet(
         "QMDown",
         font="ansi_shadow",
         colors=["green"],
     )
     desc = Text("\n QQ 音乐解析/下载工具", style="bold blue")
-    return Panel(
-        Group(
-            Align.center(title),
-            Align.center(desc),
-        ),
-        box=box.SIMPLE,
-    )
+    with console.capture() as capture:
+        console.print(
+            Panel(
+                Group(
+                    Align.center(title),
+                    Align.center(desc),
+                ),
+                box=box.SIMPLE,
+            )
+        )
+    rendered = capture.get()
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        _ = cache.write_text(rendered, encoding="utf-8")
+    except OSError:
+        pass
+    return Text.from_ansi(rendered, end="")
 
 
 @app.callback()
@@ -105,60 +159,817 @@ async def main(
         console.print(banner)
 
 
+UrlsArgument = Annotated[
+    list[str] | None,
+    typer.Argument(
+        help="歌曲或专辑的 URL(可包含其他字符)",
+        metavar="URL",
+        show_default=False,
+    ),
+]
+InputFileOption = Annotated[
+    Path | None,
+    typer.Option(
+        "-i",
+        "--input-file",
+        help="从文件逐行读取 URL,- 表示标准输入",
+        dir_okay=False,
+        allow_dash=True,
+        show_default=False,
+    ),
+]
+OutputOption = Annotated[
+    Path | None,
+    typer.Option(
+        "-o",
+        "--output",
+        help="下载文件存储目录",
+        resolve_path=True,
+        show_default=False,
+        file_okay=False,
+    ),
+]
+ConcurrencyOption = Annotated[
+    int,
+    typer.Option(
+        "-n",
+        "--concurrency",
+        help="并发处理任务数量",
+        min=1,
+    ),
+]
+QualityOption = Annotated[
+    str,
+    typer.Option(
+        "-q",
+        "--quality",
+        help="音频文件类型",
+        click_type=click.Choice(QUALITIES),
+    ),
+]
+FallbackOption = Annotated[
+    list[str] | None,
+    typer.Option(
+        "--fallback",
+        help="指定音质不可用时依次尝试的音质,可重复指定",
+        click_type=click.Choice(QUALITIES),
+        show_default=False,
+    ),
+]
+ConnectionsOption = Annotated[
+    int,
+    typer.Option(
+        "--connections",
+        help="单文件最大并发连接数",
+        min=1,
+    ),
+]
+NoResumeOption = Annotated[
+    bool,
+    typer.Option(
+        "--no-resume",
+        help="禁用断点续传,忽略已有的 .part 文件",
+    ),
+]
+ResumeOption = Annotated[
+    bool,
+    typer.Option(
+        "--resume",
+        help="继续输出目录中上次中断的任务,跳过已完成的 URL",
+    ),
+]
+GroupOption = Annotated[
+    bool,
+    typer.Option(
+        "-g",
+        "--group",
+        help="按歌单/专辑/歌手/排行榜名称分目录保存,重复歌曲以硬链接共享",
+    ),
+]
+ApiRateOption = Annotated[
+    float,
+    typer.Option(
+        "--api-rate",
+        help="API 每秒请求数上限",
+        min=0.1,
+    ),
+]
+NoTagOption = Annotated[
+    bool,
+    typer.Option(
+        "--no-tag",
+        help="不写入标签和封面",
+    ),
+]
+LyricOption = Annotated[
+    bool,
+    typer.Option(
+        "--lyric",
+        help="在标签中嵌入歌词",
+    ),
+]
+MetricsOption = Annotated[
+    Path | None,
+    typer.Option(
+        "--metrics",
+        help="运行结束后将各阶段耗时写入文件,.json 后缀为 JSON,其余为 Prometheus 文本格式",
+        dir_okay=False,
+        show_default=False,
+    ),
+]
+MetricsPortOption = Annotated[
+    int | None,
+    typer.Option(
+        "--metrics-port",
+        help="运行期间在本地端口提供 Prometheus 格式的指标",
+        min=1,
+        max=65535,
+        show_default=False,
+    ),
+]
+NoCacheOption = Annotated[
+    bool,
+    typer.Option(
+        "--no-cache",
+        help="禁用元数据缓存",
+    ),
+]
+FsyncOption = Annotated[
+    str,
+    typer.Option(
+        "--fsync",
+        help="落盘策略: never 由系统决定,file 每个文件完成时 fsync,batch 按批 fsync",
+        click_type=click.Choice(("never", "file", "batch")),
+    ),
+]
+WriteBufferOption = Annotated[
+    int,
+    typer.Option(
+        "--write-buffer",
+        help="每个下载连接的写入缓冲区大小(KB)",
+        min=4,
+    ),
+]
+CookiesOption = Annotated[
+    list[str] | None,
+    typer.Option(
+        "-c",
+        "--cookies",
+        help="QQ音乐Cookie凭证(从浏览器开发者工具获取 `musicid` 和 `musickey`,拼接为 `musicid:musickey` 格式),可重复指定多个账号",
+        metavar="MUSICID:MUSICKEY",
+        show_default=False,
+    ),
+]
+BalanceOption = Annotated[
+    str,
+    typer.Option(
+        "--balance",
+        help="多账号时的请求分配策略",
+        click_type=click.Choice(("least_loaded", "round_robin")),
+    ),
+]
+LimitRateOption = Annotated[
+    str | None,
+    typer.Option(
+        "--limit-rate",
+        help="全局下载速率上限,如 `500K`、`5M`",
+        metavar="RATE",
+        show_default=False,
+    ),
+]
+LimitFileRateOption = Annotated[
+    str | None,
+    typer.Option(
+        "--limit-file-rate",
+        help="单个文件的下载速率上限",
+        metavar="RATE",
+        show_default=False,
+    ),
+]
+LimitScheduleOption = Annotated[
+    list[str] | None,
+    typer.Option(
+        "--limit-schedule",
+        help="按时间段限制全局速率,如 `09:00-18:00=1M`,可重复指定,时间段内覆盖 --limit-rate",
+        metavar="HH:MM-HH:MM=RATE",
+        show_default=False,
+    ),
+]
+
+
+# 不包含引号和尖括号,以便从 JSON、HTML 等文本中提取
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>]+")
+# 输入去重时记住的最近 URL 数,内存占用不随输入增长
+RECENT_URLS = 10_000
+
+
+def parse_cookies(values: list[str] | None) -> list[dict[str, str]]:
+    """解析 `musicid:musickey` 格式的凭证"""
+    cookies: list[dict[str, str]] = []
+    for value in values or []:
+        musicid, sep, musickey = value.partition(":")
+        if not sep or not musicid.isdigit() or not musickey:
+            raise typer.BadParameter(f"凭证格式应为 MUSICID:MUSICKEY: {value}", param_hint="--cookies")
+        cookies.append({"musicid": musicid, "musickey": musickey})
+    return cookies
+
+
+def parse_limits(
+    rate: str | None,
+    file_rate: str | None,
+    schedule: list[str] | None,
+    always: bool = False,
+) -> "BandwidthLimiter | None":
+    """解析带宽限制参数,未指定任何限制且 `always` 为 False 时返回 None"""
+    from QMDown.utils.ratelimit import BandwidthLimiter, RateWindow, parse_rate
+
+    if not (rate or file_rate or schedule or always):
+        return None
+    try:
+        global_rate = parse_rate(rate) if rate else 0
+    except ValueError:
+        raise typer.BadParameter(f"无效的速率: {rate}", param_hint="--limit-rate") from None
+    try:
+        per_file = parse_rate(file_rate) if file_rate else 0
+    except ValueError:
+        raise typer.BadParameter(f"无效的速率: {file_rate}", param_hint="--limit-file-rate") from None
+    windows: list[RateWindow] = []
+    for value in schedule or []:
+        try:
+            windows.append(RateWindow.parse(value))
+        except ValueError:
+            raise typer.BadParameter(
+                f"时间段格式应为 HH:MM-HH:MM=RATE: {value}", param_hint="--limit-schedule"
+            ) from None
+    return BandwidthLimiter(global_rate, per_file, windows)
+
+
+async def _read_lines(input_file: Path) -> AsyncIterator[str]:
+    """按块读取输入文件,不一次性载入内存"""
+    f: TextIO = sys.stdin if str(input_file) == "-" else input_file.open(encoding="utf-8")
+    try:
+        while lines := await asyncio.to_thread(f.readlines, 1 << 16):
+            for line in lines:
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+async def _find_urls(texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    recent: OrderedDict[str, None] = OrderedDict()
+    async for text in texts:
+        url: str
+        for url in URL_PATTERN.findall(text):  # pyright: ignore[reportAny]
+            if url in recent:
+                recent.move_to_end(url)
+                continue
+            recent[url] = None
+            if len(recent) > RECENT_URLS:
+                _ = recent.popitem(last=False)
+            yield url
+
+
+def iter_urls(values: list[str] | None, input_file: Path | None, required: bool = True) -> AsyncIterator[str]:
+    """依次产出参数和输入文件中的 URL,跳过最近 `RECENT_URLS` 个中重复的 URL"""
+    if required and not values and input_file is None:
+        console.print("[red]未找到有效的 URL[/red]")
+        raise typer.Exit(1)
+
+    async def texts() -> AsyncIterator[str]:
+        for value in values or []:
+            yield value
+        if input_file is not None:
+            async for line in _read_lines(input_file):
+                yield line
+
+    return _find_urls(texts())
+
+
+async def run_downloader(
+    urls: AsyncIterator[str],
+    output: Path,
+    concurrency: int,
+    quality: str,
+    connections: int,
+    no_resume: bool,
+    no_cache: bool,
+    group: bool,
+    api_rate: float,
+    cookies: list[str] | None = None,
+    balance: str = "least_loaded",
+    fsync: str = "never",
+    write_buffer: int = 1024,
+    no_tag: bool = False,
+    lyric: bool = False,
+    metrics: Path | None = None,
+    metrics_port: int | None = None,
+    sync: bool = False,
+    fallback: list[str] | None = None,
+    resume: bool = False,
+    limiter: "BandwidthLimiter | None" = None,
+):
+    from QMDown import api
+    from QMDown.api import song as song_api
+    from QMDown.downloader import Downloader
+    from QMDown.postprocess import PostProcessor
+    from QMDown.utils.jobqueue import JOBS_FILENAME, JobQueue
+    from QMDown.utils.library import LibraryIndex
+    from QMDown.utils.metrics import Metrics, serve_metrics, set_metrics
+    from QMDown.utils.ratelimit import HostLimit
+    from QMDown.utils.writer import DiskWriter
+
+    collector = Metrics() if metrics or metrics_port else None
+    set_metrics(collector)
+    metrics_server = await serve_metrics(metrics_port) if metrics_port else None
+    await api.setup(
+        credentials=parse_cookies(cookies),
+        strategy=balance,  # pyright: ignore[reportArgumentType]
+        cache=not no_cache,
+        api_limit=HostLimit(api_rate, api_rate * 2),
+    )
+    with LibraryIndex(output) as index, JobQueue(output / JOBS_FILENAME) as jobs:
+        if not resume:
+            jobs.clear()
+        downloader = Downloader(
+            concurrency=concurrency,
+            connections=connections,
+            file_type=song_api.SongFileType[quality.upper()],
+            fallback=[song_api.SongFileType[value.upper()] for value in fallback or []],
+            index=index,
+            group=group,
+            postprocessor=None if no_tag else PostProcessor(lyric=lyric),
+            writer=DiskWriter(buffer_size=write_buffer * 1024, fsync=fsync),  # pyright: ignore[reportArgumentType]
+            jobs=jobs,
+            sync=sync,
+            limiter=limiter,
+            output=output,
+        )
+        try:
+            with downloader.progress:
+                downloader.start()
+                count = await _add_tasks(downloader, urls, jobs if resume else None, no_resume)
+                await downloader.add_stop_task()
+                await downloader.wait_for_completion()
+        finally:
+            await api.close()
+            if metrics_server is not None:
+                metrics_server.close()
+            if metrics and collector is not None:
+                collector.dump(metrics)
+            set_metrics(None)
+    if not count:
+        if resume:
+            console.print("[green]没有需要继续的任务")
+            return
+        console.print("[red]未找到有效的 URL[/red]")
+        raise typer.Exit(1)
+    if sync:
+        console.print(f"[green]同步完成,跳过 [blue]{downloader.skipped}[/] 首已下载歌曲")
+
+
+async def _add_tasks(
+    downloader: "Downloader",
+    urls: AsyncIterator[str],
+    jobs: "JobQueue | None",
+    no_resume: bool,
+) -> int:
+    """添加下载任务并返回任务数,给出 `jobs` 时先继续其中未完成的任务"""
+    from QMDown.downloader import DownloadTask
+
+    count = 0
+    if jobs is not None:
+        for task in jobs.unfinished():
+            await downloader.add_task(DownloadTask(url=task.url, resume=task.resume and not no_resume))
+            count += 1
+        console.print(f"[green]继续 [blue]{count}[/] 个未完成的任务")
+    async for url in urls:
+        # 跳过已完成或已重新加入的任务
+        if jobs is not None and jobs.get(url) is not None:
+            continue
+        await downloader.add_task(DownloadTask(url=url, resume=not no_resume))
+        count += 1
+    return count
+
+
 @app.command()
 async def download(
-    urls: Annotated[
-        list[str],
+    urls: UrlsArgument = None,
+    input_file: InputFileOption = None,
+    output: OutputOption = None,
+    concurrency: ConcurrencyOption = 8,
+    quality: QualityOption = "mp3_128",
+    fallback: FallbackOption = None,
+    connections: ConnectionsOption = 4,
+    no_resume: NoResumeOption = False,
+    resume: ResumeOption = False,
+    group: GroupOption = False,
+    api_rate: ApiRateOption = 20,
+    no_cache: NoCacheOption = False,
+    cookies: CookiesOption = None,
+    balance: BalanceOption = "least_loaded",
+    fsync: FsyncOption = "never",
+    write_buffer: WriteBufferOption = 1024,
+    no_tag: NoTagOption = False,
+    lyric: LyricOption = False,
+    metrics: MetricsOption = None,
+    metrics_port: MetricsPortOption = None,
+    limit_rate: LimitRateOption = None,
+    limit_file_rate: LimitFileRateOption = None,
+    limit_schedule: LimitScheduleOption = None,
+):
+    """
+    下载,输出目录索引中已有的歌曲链接到目标目录而不重新下载
+    """
+    await run_downloader(
+        iter_urls(urls, input_file, required=not resume),
+        output or Path.cwd(),
+        concurrency=concurrency,
+        quality=quality,
+        fallback=fallback,
+        connections=connections,
+        no_resume=no_resume,
+        no_cache=no_cache,
+        group=group,
+        api_rate=api_rate,
+        cookies=cookies,
+        balance=balance,
+        fsync=fsync,
+        write_buffer=write_buffer,
+        no_tag=no_tag,
+        lyric=lyric,
+        metrics=metrics,
+        metrics_port=metrics_port,
+        resume=resume,
+        limiter=parse_limits(limit_rate, limit_file_rate, limit_schedule),
+    )
+
+
+@app.command()
+async def sync(
+    urls: UrlsArgument = None,
+    input_file: InputFileOption = None,
+    output: OutputOption = None,
+    concurrency: ConcurrencyOption = 8,
+    quality: QualityOption = "mp3_128",
+    fallback: FallbackOption = None,
+    connections: ConnectionsOption = 4,
+    no_resume: NoResumeOption = False,
+    resume: ResumeOption = False,
+    group: GroupOption = False,
+    api_rate: ApiRateOption = 20,
+    no_cache: NoCacheOption = False,
+    cookies: CookiesOption = None,
+    balance: BalanceOption = "least_loaded",
+    fsync: FsyncOption = "never",
+    write_buffer: WriteBufferOption = 1024,
+    no_tag: NoTagOption = False,
+    lyric: LyricOption = False,
+    metrics: MetricsOption = None,
+    metrics_port: MetricsPortOption = None,
+    limit_rate: LimitRateOption = None,
+    limit_file_rate: LimitFileRateOption = None,
+    limit_schedule: LimitScheduleOption = None,
+):
+    """
+    增量同步,只下载输出目录索引中没有或音质更低的歌曲,已有的歌曲不链接到合集目录
+    """
+    await run_downloader(
+        iter_urls(urls, input_file, required=not resume),
+        output or Path.cwd(),
+        concurrency=concurrency,
+        quality=quality,
+        fallback=fallback,
+        connections=connections,
+        no_resume=no_resume,
+        no_cache=no_cache,
+        group=group,
+        api_rate=api_rate,
+        cookies=cookies,
+        balance=balance,
+        fsync=fsync,
+        write_buffer=write_buffer,
+        no_tag=no_tag,
+        lyric=lyric,
+        metrics=metrics,
+        metrics_port=metrics_port,
+        sync=True,
+        resume=resume,
+        limiter=parse_limits(limit_rate, limit_file_rate, limit_schedule),
+    )
+
+
+HostOption = Annotated[str, typer.Option("--host", help="服务监听地址")]
+PortOption = Annotated[int, typer.Option("--port", help="服务监听端口", min=1, max=65535)]
+SocketOption = Annotated[
+    Path | None,
+    typer.Option("--socket", help="使用 Unix 套接字代替 TCP 端口", dir_okay=False, show_default=False),
+]
+
+
+@app.command()
+async def serve(
+    host: HostOption = "127.0.0.1",
+    port: PortOption = 8910,
+    socket: SocketOption = None,
+    output: OutputOption = None,
+    concurrency: ConcurrencyOption = 8,
+    quality: QualityOption = "mp3_128",
+    fallback: FallbackOption = None,
+    connections: ConnectionsOption = 4,
+    group: GroupOption = False,
+    api_rate: ApiRateOption = 20,
+    no_cache: NoCacheOption = False,
+    cookies: CookiesOption = None,
+    balance: BalanceOption = "least_loaded",
+    fsync: FsyncOption = "never",
+    write_buffer: WriteBufferOption = 1024,
+    no_tag: NoTagOption = False,
+    lyric: LyricOption = False,
+    metrics_port: MetricsPortOption = None,
+    limit_rate: LimitRateOption = None,
+    limit_file_rate: LimitFileRateOption = None,
+    limit_schedule: LimitScheduleOption = None,
+):
+    """
+    以常驻服务运行,通过本地 HTTP 接口接收下载任务
+    """
+    from QMDown import api
+    from QMDown.api import song as song_api
+    from QMDown.downloader import Downloader
+    from QMDown.postprocess import PostProcessor
+    from QMDown.server import DownloadServer
+    from QMDown.utils.library import LibraryIndex
+    from QMDown.utils.metrics import Metrics, serve_metrics, set_metrics
+    from QMDown.utils.ratelimit import HostLimit
+    from QMDown.utils.writer import DiskWriter
+
+    output = output or Path.cwd()
+    # 服务始终创建限速器,以便通过 `PUT /limits` 在运行中调整
+    limiter = parse_limits(limit_rate, limit_file_rate, limit_schedule, always=True)
+    if metrics_port:
+        set_metrics(Metrics())
+    metrics_server = await serve_metrics(metrics_port) if metrics_port else None
+    await api.setup(
+        credentials=parse_cookies(cookies),
+        strategy=balance,  # pyright: ignore[reportArgumentType]
+        cache=not no_cache,
+        api_limit=HostLimit(api_rate, api_rate * 2),
+    )
+    with LibraryIndex(output) as index:
+        downloader = Downloader(
+            concurrency=concurrency,
+            connections=connections,
+            file_type=song_api.SongFileType[quality.upper()],
+            fallback=[song_api.SongFileType[value.upper()] for value in fallback or []],
+            index=index,
+            group=group,
+            postprocessor=None if no_tag else PostProcessor(lyric=lyric),
+            writer=DiskWriter(buffer_size=write_buffer * 1024, fsync=fsync),  # pyright: ignore[reportArgumentType]
+            limiter=limiter,
+            output=output,
+        )
+        downloader.start()
+        server = DownloadServer(downloader)
+        try:
+            await server.start(host, port, socket)
+            console.print(f"[green]服务已启动: [blue]{server.address}[/],下载目录: [blue]{output}")
+            await server.serve_forever()
+        finally:
+            await server.close()
+            await downloader.stop()
+            await api.close()
+            if metrics_server is not None:
+                metrics_server.close()
+            set_metrics(None)
+            if socket is not None:
+                socket.unlink(missing_ok=True)
+
+
+@app.command()
+async def submit(
+    urls: UrlsArgument = None,
+    input_file: InputFileOption = None,
+    server: Annotated[str, typer.Option("--server", help="服务地址")] = "http://127.0.0.1:8910",
+    socket: SocketOption = None,
+    no_resume: NoResumeOption = False,
+    priority: Annotated[int, typer.Option("--priority", help="任务优先级,数值大的先下载")] = 0,
+    detach: Annotated[bool, typer.Option("-d", "--detach", help="提交后立即返回,不等待任务完成")] = False,
+):
+    """
+    向常驻服务提交下载任务并输出进度
+    """
+    import httpx
+
+    values = [url async for url in iter_urls(urls, input_file)]
+    if not values:
+        console.print("[red]未找到有效的 URL[/red]")
+        raise typer.Exit(1)
+    transport = httpx.AsyncHTTPTransport(uds=str(socket)) if socket else None
+    async with httpx.AsyncClient(base_url=server, transport=transport, timeout=None) as client:
+        try:
+            resp = await client.post("/jobs", json={"urls": values, "resume": not no_resume, "priority": priority})
+            _ = resp.raise_for_status()
+        except httpx.HTTPError as e:
+            console.print("[red]提交失败:[/]", repr(e))
+            raise typer.Exit(1) from e
+        job_id = resp.json()["id"]  # pyright: ignore[reportAny]
+        console.print(f"[green]已提交任务 [blue]{job_id}")
+        if detach:
+            return
+        async with client.stream("GET", f"/jobs/{job_id}/events") as stream:
+            async for line in stream.aiter_lines():
+                if not line:
+                    continue
+                _print_event(json.loads(line))  # pyright: ignore[reportAny]
+
+
+def _print_event(event: dict[str, Any]):  # pyright: ignore[reportExplicitAny]
+    """输出任务事件,任务完成且有错误时以非零状态退出"""
+    match event["event"]:  # pyright: ignore[reportMatchNotExhaustive]
+        case "status":
+            console.print(f"[yellow]已省略 [blue]{event['dropped']}[/] 条较早的事件")
+        case "track":
+            color = "red" if event["status"] == "failed" else "green"
+            console.print(f"[{color}]{event['status']}[/] {event['title']}")
+        case "error":
+            console.print("[red]任务处理失败:[/]", event["url"], event["error"])
+        case "finished":
+            tracks = ", ".join(f"{k} {v}" for k, v in event["tracks"].items()) or "0"  # pyright: ignore[reportAny]
+            console.print(f"[green]任务完成: [blue]{tracks}")
+            if event["errors"]:
+                raise typer.Exit(1)
+
+
+@app.command()
+async def bench(
+    workloads: Annotated[
+        list[str] | None,
         typer.Argument(
-            help="歌曲或专辑的 URL(可包含其他字符)",
-            metavar="URL",
+            help="工作负载,默认运行全部",
+            click_type=click.Choice(WORKLOADS),
             show_default=False,
         ),
-    ],
-    output: Annotated[
+    ] = None,
+    concurrency: ConcurrencyOption = 8,
+    connections: ConnectionsOption = 4,
+    latency: Annotated[float, typer.Option("--latency", help="模拟服务每个请求的延迟(毫秒)", min=0)] = 0,
+    bandwidth: Annotated[float, typer.Option("--bandwidth", help="模拟 CDN 每个连接的带宽(MB/s),0 为不限", min=0)] = 0,
+    error_rate: Annotated[float, typer.Option("--error-rate", help="模拟服务返回 503 的概率", min=0, max=1)] = 0,
+    file_size: Annotated[int, typer.Option("--file-size", help="模拟音频文件大小(KB)", min=1)] = 1024,
+    tag: Annotated[bool, typer.Option("--tag", help="同时写入标签和封面")] = False,
+    report: Annotated[
         Path | None,
-        typer.Option(
-            "-o",
-            "--output",
-            help="下载文件存储目录",
-            resolve_path=True,
-            show_default=False,
-            file_okay=False,
-        ),
+        typer.Option("--report", help="将 JSON 结果写入文件", dir_okay=False, show_default=False),
     ] = None,
 ):
     """
-    下载
+    使用本地模拟服务运行基准测试,输出 JSON 结果
     """
-    pattern = re.compile(r"https?://\S+")
-    valid_urls = set[str]()
-    for value in urls:
-        result = pattern.findall(value)
-        if result:
-            valid_urls.update(result)
-    if not valid_urls:
-        console.print("[red]未找到有效的 URL[/red]")
-        raise typer.Exit(1)
+    from QMDown.bench.mock import MockConfig
+    from QMDown.bench.runner import report_to_dict, run_bench
 
-    downloader = Downloader(
-        output=output or Path.cwd(),
+    config = MockConfig(
+        latency=latency / 1000,
+        bandwidth=bandwidth * 1024 * 1024,
+        error_rate=error_rate,
+        file_size=file_size * 1024,
+    )
+    result = json.dumps(
+        report_to_dict(await run_bench(workloads, config, concurrency=concurrency, connections=connections, tag=tag)),
+        ensure_ascii=False,
+        indent=2,
     )
-    downloader.start()
-    [downloader.add_task(DownloadTask(url=url)) for url in valid_urls]
-    await downloader.add_stop_task()
-    await downloader.wait_for_completion()
+    if report:
+        _ = report.write_text(result, encoding="utf-8")
+    console.print_json(result)
 
 
 @app.command()
 async def search(
     query: Annotated[
-        str,
+        str | None,
         typer.Argument(
             help="搜索关键词",
+            show_default=False,
         ),
-    ],
+    ] = None,
+    input_file: Annotated[
+        Path | None,
+        typer.Option(
+            "-i",
+            "--input-file",
+            help="批量模式: 从文件逐行读取关键词,.csv 文件按 歌手,标题 两列读取,- 表示标准输入",
+            dir_okay=False,
+            allow_dash=True,
+            show_default=False,
+        ),
+    ] = None,
+    jsonl: Annotated[
+        Path | None,
+        typer.Option(
+            "--jsonl",
+            help="将匹配结果以 JSON Lines 写入文件,批量模式下默认输出到标准输出,下载时仅在指定时写出",
+            dir_okay=False,
+            show_default=False,
+        ),
+    ] = None,
+    pages: Annotated[int, typer.Option("--pages", help="每个关键词并发获取的结果页数", min=1)] = 1,
+    page_size: Annotated[int, typer.Option("--page-size", help="每页结果数", min=1, max=50)] = 20,
+    concurrency: ConcurrencyOption = 8,
+    download: Annotated[bool, typer.Option("--download", help="下载匹配到的歌曲")] = False,
+    output: OutputOption = None,
+    quality: QualityOption = "mp3_128",
+    no_cache: NoCacheOption = False,
 ):
     """
-    搜索
+    搜索歌曲,批量模式下并发匹配并输出 JSON Lines
     """
-    console.print(f"[blue]正在搜索: {query}...[/blue]")
+    from QMDown import api
+    from QMDown.searcher import Searcher, SearchQuery
+    from QMDown.utils.ratelimit import HostLimit
+
+    if (query is None) == (input_file is None):
+        console.print("[red]请指定搜索关键词或 --input-file 其中之一[/red]")
+        raise typer.Exit(1)
+    searcher = Searcher(page_size=page_size, pages=pages, concurrency=concurrency)
+    queries = _iter_queries(input_file) if input_file is not None else _single(SearchQuery(query or ""))
+
+    if download:
+        await run_downloader(
+            # 下载进度占用终端,匹配结果仅在指定 --jsonl 时写出
+            _write_matches(searcher, queries, jsonl, stdout=False),
+            output or Path.cwd(),
+            concurrency=concurrency,
+            quality=quality,
+            connections=4,
+            no_resume=False,
+            no_cache=no_cache,
+            group=False,
+            api_rate=20,
+        )
+        return
+
+    await api.setup(cache=not no_cache, api_limit=HostLimit(20, 40))
+    try:
+        if query is not None:
+            await _print_results(searcher, query)
+        else:
+            async for _ in _write_matches(searcher, queries, jsonl):
+                pass
+    finally:
+        await api.close()
+
+
+async def _single(item: "SearchQuery") -> AsyncIterator["SearchQuery"]:
+    yield item
+
+
+async def _iter_queries(input_file: Path) -> AsyncIterator["SearchQuery"]:
+    from QMDown.searcher import SearchQuery
+
+    is_csv = input_file.suffix.lower() == ".csv"
+    lineno = 0
+    async for line in _read_lines(input_file):
+        lineno += 1
+        if (item := SearchQuery.parse(line, lineno, is_csv)) is not None:
+            yield item
+
+
+async def _write_matches(
+    searcher: "Searcher",
+    queries: AsyncIterator["SearchQuery"],
+    jsonl: Path | None,
+    stdout: bool = True,
+) -> AsyncIterator[str]:
+    """将匹配结果写入 `jsonl`,未指定时写到标准输出(`stdout` 为 False 时不写出),同时产出匹配到的歌曲 URL"""
+    from QMDown.searcher import to_record
+
+    out: TextIO | None = jsonl.open("w", encoding="utf-8") if jsonl else sys.stdout if stdout else None
+    total = matched = 0
+    try:
+        async for item, song, error in searcher.resolve(queries):
+            total += 1
+            record = to_record(item, song, error)
+            if out is not None:
+                _ = out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if record["url"]:
+                matched += 1
+                yield record["url"]
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    if out is not sys.stdout:
+        console.print(f"[green]匹配 [blue]{matched}[/]/[blue]{total}[/] 个关键词")
+
+
+async def _print_results(searcher: "Searcher", keyword: str):
+    from rich.table import Table
+
+    from QMDown.searcher import SearchQuery, to_record
+
+    table = Table("#", "歌曲", "歌手", "专辑", "MID", title=f"搜索: {keyword}")
+    for i, song in enumerate(await searcher.search(keyword), 1):
+        record = to_record(SearchQuery(keyword), song)
+        table.add_row(str(i), record["title"], record["singer"], record["album"], record["mid"])  # pyright: ignore[reportAny]
+    console.print(table)
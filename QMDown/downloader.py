@@ -1,67 +1,207 @@
 import asyncio
-from dataclasses import dataclass
-from queue import Queue
+import itertools
+import math
+from collections.abc import Callable, Coroutine, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
 from typing import Any
 
-from QMDown import console
-from QMDown.extractor import Extractor, SongExtractor
+from QMDown import api, console
+from QMDown.api import song as song_api
+from QMDown.extractor import BatchExtractor, Extractor, SongExtractor, URLRouter
 from QMDown.extractor.album import AlbumExtractor
 from QMDown.extractor.singer import SingerExtractor
 from QMDown.extractor.songlist import SonglistExtractor
 from QMDown.extractor.top import ToplistExtractor
+from QMDown.postprocess import PostProcessor
+from QMDown.track import Track
+from QMDown.utils.fs import link_file, sanitize_filename
+from QMDown.utils.jobqueue import JobQueue, TaskState
+from QMDown.utils.library import LibraryIndex
+from QMDown.utils.metrics import span, timed_iter
+from QMDown.utils.progress import DownloadProgress
+from QMDown.utils.ratelimit import BandwidthLimiter
+from QMDown.utils.scheduler import FairScheduler
+from QMDown.utils.transfer import FileTransfer
+from QMDown.utils.writer import DiskWriter
+
+# 任务事件监听函数,参数为事件名和事件数据
+Listener = Callable[[str, dict[str, Any]], None]  # pyright: ignore[reportExplicitAny]
 
 
 @dataclass
 class DownloadTask:
     url: str
+    resume: bool = True
+    """是否从 `.part` 文件的断点记录继续下载"""
+    priority: int = 0
+    """优先级,数值大的任务先处理,下载槽位也优先分配给该任务"""
+    listener: Listener | None = field(default=None, repr=False, compare=False)
+    """接收任务事件: 每首歌曲的 `track`、出错时的 `error` 和最后的 `done`"""
+    error: str | None = field(default=None, repr=False, compare=False)
+    """任务出错或有歌曲下载失败时的错误信息"""
 
 
-class Downloader:
-    queue: Queue[DownloadTask | None] = Queue()
+# 当前协程正在处理的任务,页面和歌曲的子任务继承该值
+_current_task: ContextVar[DownloadTask | None] = ContextVar("current_task", default=None)
+
 
-    def __init__(self, **kwargs: Any):  # pyright: ignore[reportExplicitAny, reportAny]
+class Downloader:
+    def __init__(
+        self,
+        concurrency: int = 8,
+        max_pending: int | None = None,
+        max_downloads: int = 8,
+        connections: int = 4,
+        file_type: song_api.SongFileType = song_api.SongFileType.MP3_128,
+        fallback: Sequence[song_api.SongFileType] = (),
+        index: LibraryIndex | None = None,
+        sync: bool = False,
+        group: bool = False,
+        max_pages: int = 2,
+        postprocessor: PostProcessor | None = None,
+        writer: DiskWriter | None = None,
+        jobs: JobQueue | None = None,
+        limiter: BandwidthLimiter | None = None,
+        **kwargs: Any,  # pyright: ignore[reportExplicitAny, reportAny]
+    ):
+        """
+        Args:
+            concurrency: 并发工作协程数量
+            max_pending: 队列中最多等待的任务数,默认为 `concurrency * 4`
+            max_downloads: 同时下载的文件数量,由各任务按优先级轮流使用
+            connections: 单文件最大并发连接数
+            file_type: 下载的音频文件类型
+            fallback: `file_type` 不可用时依次尝试的文件类型
+            index: 已下载歌曲索引,索引中已存在且音质不低于 `file_type` 的歌曲不再下载,而是链接到合集目录
+            sync: 增量同步,索引中已有的歌曲直接跳过,不链接到合集目录,每首歌曲只保留一份文件
+            group: 按合集名称分目录保存
+            max_pages: 单个合集同时下载的分页数
+            postprocessor: 下载完成后写入标签的后处理器
+            writer: 磁盘写入器
+            jobs: 持久化任务队列,记录任务状态以便中断后继续
+            limiter: 下载带宽限制,可在运行中修改
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.concurrency: int = concurrency
+        # 按 (-优先级, 按类型预估的歌曲数, 加入顺序) 排序,结束标记排在最后;末项为加入时的路由结果
+        self.queue: asyncio.PriorityQueue[tuple[float, int, int, DownloadTask | None, tuple[Extractor, str] | None]] = (
+            asyncio.PriorityQueue(maxsize=concurrency * 4 if max_pending is None else max_pending)
+        )
+        self._seq: itertools.count[int] = itertools.count()
         self.extractors: list[Extractor] = []
+        self.router: URLRouter = URLRouter(())
         self.options: dict[str, Any] = kwargs  # pyright: ignore[reportExplicitAny]
-        self.loop_task: asyncio.Task[None] | None = None
+        self.workers: list[asyncio.Task[None]] = []
+        self.output: Path = Path(self.options.get("output") or Path.cwd())
+        self.connections: int = connections
+        self.file_type: song_api.SongFileType = file_type
+        self.file_types: list[song_api.SongFileType] = list(dict.fromkeys([file_type, *fallback]))
+        self.index: LibraryIndex | None = index
+        self.sync: bool = sync
+        self.group: bool = group
+        self.max_pages: int = max_pages
+        self.postprocessor: PostProcessor | None = postprocessor
+        self.writer: DiskWriter = writer or DiskWriter()
+        self.jobs: JobQueue | None = jobs
+        self.limiter: BandwidthLimiter | None = limiter
+        self.skipped: int = 0
+        self._inflight: dict[str, asyncio.Future[Path | None]] = {}
+        self.progress: DownloadProgress = DownloadProgress(limiter=limiter)
+        self.scheduler: FairScheduler = FairScheduler(max_downloads)
 
     def start(self):
-        self.loop_task = asyncio.create_task(self.loop())
+        if self.workers:
+            raise RuntimeError("Task manager is already started.")
+        self._setup_extractors()
+        self.workers = [asyncio.create_task(self.loop(), name=f"worker-{i}") for i in range(self.concurrency)]
+        if self.postprocessor is not None:
+            self.postprocessor.start()
 
-    def add_task(self, task: DownloadTask):
-        if self.loop_task is None:
+    def _ensure_started(self):
+        if not self.workers:
             raise RuntimeError("Task manager is not started.")
-        self.queue.put(task)
 
-    async def wait_for_completion(self):
-        if self.loop_task is None:
-            raise RuntimeError("Task manager is not started.")
-        if self.loop_task.done():
-            return
-        await self.loop_task
-        self.queue.join()
+    async def add_task(self, task: DownloadTask):
+        """添加任务,队列已满时等待"""
+        self._ensure_started()
+        if self.jobs is not None:
+            _ = self.jobs.add(task.url, task.resume)
+        self._setup_extractors()
+        with span("route"):
+            route = self.router.match(task.url)
+        # 同类链接的预估值相同,只区分单曲、专辑、歌单等类型;不支持的 URL 预估为 0,尽快报错
+        estimate = route[0].ESTIMATED_SIZE if route is not None else 0
+        await self.queue.put((-task.priority, estimate, next(self._seq), task, route))
 
     async def add_stop_task(self):
-        self.queue.put(None)
+        """在已添加任务之后追加结束标记,每个工作协程消费一个"""
+        self._ensure_started()
+        for _ in self.workers:
+            await self.queue.put((math.inf, 0, next(self._seq), None, None))
+
+    async def wait_for_completion(self):
+        self._ensure_started()
+        _ = await asyncio.gather(*self.workers, return_exceptions=True)
+        if self.postprocessor is not None:
+            await self.postprocessor.close()
+        await self.writer.close()
 
     async def stop(self):
-        if self.loop_task is None:
-            raise RuntimeError("Task manager is not started.")
-        if self.loop_task.done():
-            return
+        """取消所有工作协程并丢弃未处理任务"""
+        self._ensure_started()
+        for worker in self.workers:
+            _ = worker.cancel()
+        _ = await asyncio.gather(*self.workers, return_exceptions=True)
         while not self.queue.empty():
+            _ = self.queue.get_nowait()
             self.queue.task_done()
-        self.queue.join()
+        if self.postprocessor is not None:
+            await self.postprocessor.cancel()
+        await self.writer.close()
 
     async def loop(self):
         while True:
-            task = self.queue.get()
+            *_, task, route = await self.queue.get()
+            token = _current_task.set(task)
             try:
                 if task is None:
                     break
-                await self.process_task(task)
+                self._set_state(task, "extracting")
+                await self.process_task(task, route)
+                self._set_state(task, "failed" if task.error else "done", task.error)
+            except Exception as e:
+                console.print("[red]任务处理失败:[/]", task.url if task else "", repr(e))
+                self._emit("error", error=repr(e))
+                if task is not None:
+                    self._set_state(task, "failed", task.error)
             finally:
+                if task is not None:
+                    self._emit("done")
+                _current_task.reset(token)
                 self.queue.task_done()
 
+    def _emit(self, event: str, **data: Any):  # pyright: ignore[reportExplicitAny, reportAny]
+        """向当前任务的监听函数发送事件"""
+        if (task := _current_task.get()) is None:
+            return
+        if event == "error":
+            task.error = data["error"]
+        if task.listener is not None:
+            task.listener(event, {"url": task.url, **data})
+
+    def _set_state(self, task: DownloadTask, state: TaskState, error: str | None = None):
+        if self.jobs is not None:
+            self.jobs.update(task.url, state, error)
+
+    def _emit_track(self, song: Track, status: str, path: Path | None = None):
+        if status == "failed" and (task := _current_task.get()) is not None and task.error is None:
+            task.error = f"track failed: {song.mid}"
+        self._emit("track", mid=song.mid, title=song.title, status=status, path=path and str(path))
+
     def _setup_extractors(self):
         if self.extractors:
             return
@@ -72,14 +212,204 @@ class Downloader:
             SingerExtractor(),
             ToplistExtractor(),
         ]
+        self.router = URLRouter(self.extractors)
 
-    async def process_task(self, task: DownloadTask):
-        self._setup_extractors()
-        data = None
-        for extractor in self.extractors:
-            if extractor.suitable(task.url):
-                data = await extractor.extract(task.url)
-                break
+    async def process_task(self, task: DownloadTask, route: tuple[Extractor, str] | None):
+        """处理任务,`route` 为 `URLRouter.match` 的结果"""
+        if route is None:
+            console.print("[red]不支持的 URL:[/]", task.url)
+            self._emit("error", error="unsupported url")
+            return
 
+        extractor, url_id = route
+        if isinstance(extractor, BatchExtractor):
+            await self.process_pages(extractor, task, url_id)
+            return
+
+        with span("extract", extractor=type(extractor).__name__):
+            data = await extractor.extract(task.url, url_id)
         if data is None:
             console.print("[red]不支持的 URL:[/]", task.url)
+            self._emit("error", error="unsupported url")
+            return
+        self._set_state(task, "downloading")
+        await self.download_songs(data if isinstance(data, list) else [data], resume=task.resume)
+
+    async def process_pages(self, extractor: BatchExtractor, task: DownloadTask, url_id: str):
+        """边获取分页边下载,同时处理的页数不超过 `max_pages`"""
+        directory = self.output
+        if self.group and (title := await extractor.get_title(task.url, url_id)):
+            directory = self.output / sanitize_filename(title)
+
+        pending: set[asyncio.Task[None]] = set()
+        try:
+            async for page in timed_iter(
+                extractor.iter_pages(task.url, url_id), "extract", extractor=type(extractor).__name__
+            ):
+                if len(pending) >= self.max_pages:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for page_task in done:
+                        page_task.result()
+                self._set_state(task, "downloading")
+                pending.add(asyncio.create_task(self.download_songs(page, resume=task.resume, directory=directory)))
+            _ = await asyncio.gather(*pending)
+        finally:
+            for page_task in pending:
+                _ = page_task.cancel()
+
+    async def download_songs(
+        self,
+        songs: list[Track],
+        resume: bool = True,
+        directory: Path | None = None,
+    ):
+        """下载歌曲到 `directory`
+
+        同一首歌曲只下载一次:已在索引中的文件和本次运行中其他合集正在下载的文件会被链接到 `directory`,
+        增量同步时不链接.
+        """
+        directory = directory or self.output
+        fetch: list[Track] = []
+        places: list[Coroutine[Any, Any, None]] = []  # pyright: ignore[reportExplicitAny]
+        for song in songs:
+            mid = song.mid
+            if self.index is not None and (source := self.index.find(mid, self.file_type)) is not None:
+                self.skipped += 1
+                self._emit_track(song, "skipped", source)
+                places.append(self._place(source, directory, song))
+            elif (future := self._inflight.get(mid)) is not None:
+                places.append(self._place_when_done(future, directory, song))
+            else:
+                self._inflight[mid] = asyncio.get_running_loop().create_future()
+                fetch.append(song)
+
+        try:
+            with span("resolve_urls"):
+                resolved = (
+                    await song_api.resolve_file_urls([song.mid for song in fetch], self.file_types) if fetch else {}
+                )
+        except BaseException:
+            for song in fetch:
+                self._resolve_inflight(song.mid, None)
+            for place in places:
+                place.close()
+            raise
+        _ = await asyncio.gather(
+            *(self.download_song(song, resolved.get(song.mid), resume, directory) for song in fetch),
+            *places,
+        )
+
+    async def download_song(
+        self,
+        song: Track,
+        resolved: tuple[song_api.SongFileType, str] | None,
+        resume: bool = True,
+        directory: Path | None = None,
+    ):
+        """下载 `resolved` 指定音质的文件,已有不低于该音质的文件时直接链接"""
+        directory = directory or self.output
+        file_type, url = resolved or (self.file_type, "")
+        result: Path | None = None
+        status = "failed"
+        try:
+            if self.index is not None and (source := self.index.find(song.mid, file_type)) is not None:
+                self.skipped += 1
+                status, result = "skipped", source
+                await self._place(source, directory, song)
+            else:
+                path = directory / self.get_filename(song, file_type.e)
+                result = await self._download(song, url, path, resume, file_type)
+                status = "downloaded" if result else "failed"
+        finally:
+            self._resolve_inflight(song.mid, result)
+            self._emit_track(song, status, result)
+
+    async def _download(
+        self,
+        song: Track,
+        url: str,
+        path: Path,
+        resume: bool,
+        file_type: song_api.SongFileType,
+    ) -> Path | None:
+        if path.exists():
+            if self.index is not None and self.index.get(song.mid) is None:
+                self.index.add(song.mid, file_type, path, path.stat().st_size)
+            return path
+        if not url:
+            console.print("[yellow]无可用下载链接:[/]", path.name)
+            return None
+
+        if self.postprocessor is not None:
+            # 等待下载槽位期间获取封面,不占用槽位
+            self.postprocessor.prefetch(song)
+        task = _current_task.get()
+        async with self.scheduler.slot(task.url if task else None, task.priority if task else 0):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            task_id = self.progress.add_task("下载中:", filename=path.name, total=None)
+            transfer = FileTransfer(
+                await api.get_Session(),
+                url,
+                path,
+                connections=self.connections,
+                resume=resume,
+                progress=self.progress,
+                task_id=task_id,
+                writer=self.writer,
+                limiter=self.limiter,
+                # 写完标签后才重命名为目标文件,中断时不会留下未写标签的文件
+                before_commit=partial(self._tag, song, path.suffix) if self.postprocessor is not None else None,
+            )
+            try:
+                with span("download"):
+                    size = await transfer.run()
+            except Exception as e:
+                console.print("[red]下载失败:[/]", path.name, repr(e))
+                return None
+            finally:
+                self.progress.update(task_id, total=transfer.downloaded, completed=transfer.downloaded)
+        if self.postprocessor is not None:
+            # 写入标签后文件大小会变化
+            size = path.stat().st_size
+        if self.index is not None:
+            self.index.add(song.mid, file_type, path, size)
+        return path
+
+    async def _tag(self, song: Track, suffix: str, part: Path):
+        """写入 `.part` 文件的标签并等待完成"""
+        if self.postprocessor is not None:
+            await (await self.postprocessor.submit(part, song, suffix))
+
+    def _resolve_inflight(self, mid: str, path: Path | None):
+        if (future := self._inflight.pop(mid, None)) is not None and not future.done():
+            future.set_result(path)
+
+    async def _place_when_done(
+        self,
+        future: asyncio.Future[Path | None],
+        directory: Path,
+        song: Track,
+    ):
+        if (source := await asyncio.shield(future)) is not None:
+            await self._place(source, directory, song)
+        self._emit_track(song, ("skipped" if self.sync else "linked") if source else "failed", source)
+
+    async def _place(
+        self,
+        source: Path,
+        directory: Path,
+        song: Track,
+    ):
+        """将已下载的文件链接到 `directory`"""
+        target = directory / self.get_filename(song, source.suffix)
+        if self.sync or target == source or target.exists():
+            return
+        try:
+            _ = await asyncio.to_thread(link_file, source, target)
+        except OSError as e:
+            console.print("[red]链接文件失败:[/]", target.name, repr(e))
+
+    def get_filename(self, song: Track, suffix: str | None = None) -> str:
+        singers = ",".join(song.singers)
+        name = f"{singers} - {song.title}" if singers else song.title
+        return sanitize_filename(name) + (self.file_type.e if suffix is None else suffix)
@@ -1,5 +1,6 @@
-from ._abc import Extractor
+from ._abc import BatchExtractor, Extractor
 from .album import AlbumExtractor
+from .router import URLRouter
 from .singer import SingerExtractor
 from .song import SongExtractor
 from .songlist import SonglistExtractor
@@ -7,9 +8,11 @@ from .top import ToplistExtractor
 
 __all__ = [
     "AlbumExtractor",
+    "BatchExtractor",
     "Extractor",
     "SingerExtractor",
     "SongExtractor",
     "SonglistExtractor",
     "ToplistExtractor",
+    "URLRouter",
 ]
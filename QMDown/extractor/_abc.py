@@ -1,17 +1,25 @@
+import asyncio
 import re
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable
 from re import Pattern
 from typing import Any, override
 
 from rich.console import Console
 
 from QMDown import console
+from QMDown.track import Track
 
 
 class Extractor(ABC):
     _VALID_URL_RE: tuple[Pattern[str], ...]
     _VALID_URL: tuple[str, ...] | None = None
     _console: Console = console
+    ESTIMATED_SIZE: int = 1
+    """按链接类型预估的歌曲数,调度时先处理预估较小的任务
+
+    这是同类链接共用的固定值,不反映具体歌单或专辑的大小:入队时尚未请求接口,无法得知实际歌曲数.
+    """
 
     @classmethod
     def _match_valid_url(cls, url: str):
@@ -31,8 +39,19 @@ class Extractor(ABC):
             return str(match.group("id"))
         raise ValueError("Url invalid")
 
+    @classmethod
+    def _resolve_id(cls, url: str, url_id: str | None) -> str:
+        """优先使用路由已解析出的 id,未提供时重新匹配 URL"""
+        return url_id if url_id is not None else cls._match_id(url)
+
     @abstractmethod
-    async def extract(self, url: str) -> dict[str, Any] | list[dict[str, Any]] | None:  # pyright: ignore[reportExplicitAny]
+    async def extract(self, url: str, url_id: str | None = None) -> Track | list[Track] | None:
+        """获取 URL 对应的歌曲
+
+        Args:
+            url: 链接
+            url_id: `URLRouter.match` 从链接中解析出的 id
+        """
         raise NotImplementedError
 
     def print(self, *args: Any):  # pyright: ignore[reportExplicitAny, reportAny]
@@ -42,12 +61,59 @@ class Extractor(ABC):
 class SingleExtractor(Extractor, ABC):
     @abstractmethod
     @override
-    async def extract(self, url: str) -> dict[str, Any] | None:  # pyright: ignore[reportExplicitAny]
+    async def extract(self, url: str, url_id: str | None = None) -> Track | None:
         raise NotImplementedError
 
 
 class BatchExtractor(Extractor, ABC):
     @abstractmethod
-    @override
-    async def extract(self, url: str) -> list[dict[str, Any]] | None:  # pyright: ignore[reportExplicitAny]
+    def iter_pages(self, url: str, url_id: str | None = None) -> AsyncIterator[list[Track]]:
+        """逐页获取歌曲列表"""
         raise NotImplementedError
+
+    @override
+    async def extract(self, url: str, url_id: str | None = None) -> list[Track] | None:
+        return [song async for page in self.iter_pages(url, url_id) for song in page]
+
+    @staticmethod
+    async def paginate(
+        fetch: Callable[[int], Awaitable[list[dict[str, Any]]]],  # pyright: ignore[reportExplicitAny]
+        page_size: int,
+        total: int | None = None,
+        first: list[dict[str, Any]] | None = None,  # pyright: ignore[reportExplicitAny]
+    ) -> AsyncIterator[list[Track]]:
+        """按页码(从 1 开始)获取分页数据
+
+        处理当前页时预先请求下一页;返回数量不足 `page_size` 或达到 `total` 时结束.
+        每页的接口数据在产出前转换为 `Track`,之后即可释放.
+
+        Args:
+            fetch: 获取指定页的函数
+            page_size: 每页数量
+            total: 总数量,未知时为 `None`
+            first: 已获取的第一页
+        """
+        page = 1
+        pending: asyncio.Future[list[dict[str, Any]]] | None = None  # pyright: ignore[reportExplicitAny]
+        if first is None:
+            pending = asyncio.ensure_future(fetch(page))
+        try:
+            while True:
+                # `first` 为 None 时首轮一定有 `pending`
+                songs = (first or []) if pending is None else await pending
+                first = None
+                pending = None
+                if len(songs) >= page_size and (total is None or page * page_size < total):
+                    pending = asyncio.ensure_future(fetch(page + 1))
+                if songs:
+                    yield [Track.from_song(song) for song in songs]
+                if pending is None:
+                    return
+                page += 1
+        finally:
+            if pending is not None:
+                _ = pending.cancel()
+
+    async def get_title(self, url: str, url_id: str | None = None) -> str | None:  # pyright: ignore[reportUnusedParameter]
+        """合集名称"""
+        return None
@@ -1,7 +1,9 @@
-from typing import final, override
+from collections.abc import AsyncIterator
+from typing import cast, final, override
 
 from QMDown.api import album as api
 from QMDown.extractor._abc import BatchExtractor
+from QMDown.track import Track
 
 
 @final
@@ -10,12 +12,21 @@ class AlbumExtractor(BatchExtractor):
         r"https?://y\.qq\.com/n/ryqq/albumDetail/(?P<id>[0-9A-Za-z]+)",
         r"https?://i\.y\.qq\.com/n2/m/share/details/album\.html\?.*albumId=(?P<id>[0-9]+)",
     )
+    PAGE_SIZE = 100
+    ESTIMATED_SIZE = 20
+
+    def _album_id(self, url: str, url_id: str | None) -> str | int:
+        album_id = self._resolve_id(url, url_id)
+        return int(album_id) if album_id.isdigit() else album_id
+
+    @override
+    async def get_title(self, url: str, url_id: str | None = None) -> str:
+        info = await api.get_detail(self._album_id(url, url_id))
+        return cast(str, info["basicInfo"]["albumName"])
 
     @override
-    async def extract(self, url: str):
-        album_id = self._match_id(url)
-        if album_id.isdigit():
-            album_id = int(album_id)
-        info = await api.get_detail(album_id)
-        self.print(f"专辑信息获取成功:[red]{info['basicInfo']['albumName']}")
-        return await api.get_song(album_id, 1000)
+    async def iter_pages(self, url: str, url_id: str | None = None) -> AsyncIterator[list[Track]]:
+        album_id = self._album_id(url, url_id)
+        self.print(f"专辑信息获取成功:[red]{await self.get_title(url, str(album_id))}")
+        async for page in self.paginate(lambda page: api.get_song(album_id, self.PAGE_SIZE, page), self.PAGE_SIZE):
+            yield page
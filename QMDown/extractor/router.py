@@ -0,0 +1,35 @@
+import re
+from collections.abc import Iterable
+
+from QMDown.extractor._abc import Extractor
+
+
+class URLRouter:
+    """将 URL 分派给对应的提取器
+
+    所有提取器的 `_VALID_URL` 合并为一个正则,每个模式包在独立的命名分组中,
+    一次匹配即可确定提取器和 id,不再逐个提取器、逐个模式尝试.
+
+    Args:
+        extractors: 提取器,排在前面的优先匹配
+    """
+
+    def __init__(self, extractors: Iterable[Extractor]) -> None:
+        self.extractors: list[Extractor] = list(extractors)
+        self._routes: dict[str, Extractor] = {}
+        patterns: list[str] = []
+        for i, extractor in enumerate(self.extractors):
+            for j, pattern in enumerate(extractor._VALID_URL or ()):  # pyright: ignore[reportPrivateUsage]
+                name = f"r{i}_{j}"
+                self._routes[name] = extractor
+                patterns.append(f"(?P<{name}>{pattern.replace('(?P<id>', f'(?P<{name}_id>')})")
+        self._regex: re.Pattern[str] | None = re.compile("|".join(patterns)) if patterns else None
+
+    def match(self, url: str) -> tuple[Extractor, str] | None:
+        """返回匹配的提取器和 URL 中的 id"""
+        if self._regex is None or (match := self._regex.match(url)) is None:
+            return None
+        # 外层分组最后闭合,因此 lastgroup 即为匹配的路由
+        name = match.lastgroup
+        assert name is not None
+        return self._routes[name], match.group(f"{name}_id")
@@ -1,9 +1,11 @@
-from typing import final
+from collections.abc import AsyncIterator
+from typing import Any, cast, final
 
 from typing_extensions import override
 
 from QMDown.api import singer as api
 from QMDown.extractor._abc import BatchExtractor
+from QMDown.track import Track
 
 
 @final
@@ -12,11 +14,28 @@ class SingerExtractor(BatchExtractor):
         r"https?://y\.qq\.com/n/ryqq/singer/(?P<id>[0-9A-Za-z]+)",
         r"https?://i\.y\.qq\.com/n2/m/share/profile_v2/index\.html\?.*singermid=(?P<id>[0-9A-Za-z]+)",
     )
+    # 接口单次最多返回 30 首
+    PAGE_SIZE = 30
+    ESTIMATED_SIZE = 1000
 
     @override
-    async def extract(self, url: str):
-        singer_id = self._match_id(url)
-        info = await api.get_info(singer_id)
-        songs = await api.get_songs_list_all(singer_id)
-        self.print(f"歌手信息获取成功: [red]{info['Info']['Singer']['Name']}")
-        return songs
+    async def get_title(self, url: str, url_id: str | None = None) -> str:
+        info = await api.get_info(self._resolve_id(url, url_id))
+        return cast(str, info["Info"]["Singer"]["Name"])
+
+    async def _get_page(self, singer_id: str, page: int) -> tuple[list[dict[str, Any]], int]:  # pyright: ignore[reportExplicitAny]
+        response = await api.get_songs_list(singer_id, self.PAGE_SIZE, (page - 1) * self.PAGE_SIZE)
+        songs: list[dict[str, dict[str, Any]]] = response["songList"]  # pyright: ignore[reportAny, reportExplicitAny]
+        return [song["songInfo"] for song in songs], cast(int, response["totalNum"])
+
+    @override
+    async def iter_pages(self, url: str, url_id: str | None = None) -> AsyncIterator[list[Track]]:
+        singer_id = self._resolve_id(url, url_id)
+        self.print(f"歌手信息获取成功: [red]{await self.get_title(url, singer_id)}")
+        first, total = await self._get_page(singer_id, 1)
+
+        async def fetch(page: int):
+            return (await self._get_page(singer_id, page))[0]
+
+        async for page in self.paginate(fetch, self.PAGE_SIZE, total, first):
+            yield page
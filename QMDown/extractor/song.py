@@ -2,6 +2,7 @@ from typing import final, override
 
 from QMDown.api import song as api
 from QMDown.extractor._abc import SingleExtractor
+from QMDown.track import Track
 
 
 @final
@@ -12,8 +13,8 @@ class SongExtractor(SingleExtractor):
     )
 
     @override
-    async def extract(self, url: str):
-        song_id = self._match_id(url)
+    async def extract(self, url: str, url_id: str | None = None) -> Track:
+        song_id = self._resolve_id(url, url_id)
         if song_id.isdigit():
             song_id = int(song_id)
-        return (await api.query_song([song_id]))[0]  # pyright: ignore[reportArgumentType]
+        return Track.from_song(await api.query_track(song_id))
@@ -1,7 +1,9 @@
-from typing import final, override
+from collections.abc import AsyncIterator
+from typing import Any, cast, final, override
 
 from QMDown.api import songlist as api
 from QMDown.extractor._abc import BatchExtractor
+from QMDown.track import Track
 
 
 @final
@@ -11,11 +13,24 @@ class SonglistExtractor(BatchExtractor):
         r"https?://i\.y\.qq\.com/n2/m/share/details/taoge\.html\?.*id=(?P<id>[0-9]+)",
         r"https?://i\.y\.qq\.com/n2/m/share/details/interactive_playlist\.html\?.*id=(?P<id>[0-9]+)",
     )
+    PAGE_SIZE = 100
+    ESTIMATED_SIZE = 100
 
     @override
-    async def extract(self, url: str):
-        songlist_id = int(self._match_id(url))
-        songlist = await api.get_songlist(songlist_id)
-        info = await api.get_detail(songlist_id)
-        self.print(f"歌单信息获取成功:[red]{info['dirinfo']['title']}")
-        return songlist
+    async def get_title(self, url: str, url_id: str | None = None) -> str:
+        info = await api.get_detail(int(self._resolve_id(url, url_id)))
+        return cast(str, info["dirinfo"]["title"])
+
+    @override
+    async def iter_pages(self, url: str, url_id: str | None = None) -> AsyncIterator[list[Track]]:
+        songlist_id = int(self._resolve_id(url, url_id))
+        self.print(f"歌单信息获取成功:[red]{await self.get_title(url, str(songlist_id))}")
+        response = await api.get_detail(songlist_id, num=self.PAGE_SIZE, page=1, onlysong=True)
+
+        async def fetch(page: int) -> list[dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+            response = await api.get_detail(songlist_id, num=self.PAGE_SIZE, page=page, onlysong=True)
+            return cast(list[dict[str, Any]], response["songlist"])  # pyright: ignore[reportExplicitAny]
+
+        total = cast(int, response["total_song_num"])
+        async for page in self.paginate(fetch, self.PAGE_SIZE, total, response["songlist"]):  # pyright: ignore[reportAny]
+            yield page
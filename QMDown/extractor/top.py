@@ -1,9 +1,11 @@
+from collections.abc import AsyncIterator
 from typing import Any, cast, final
 
 from typing_extensions import override
 
 from QMDown.api import top as api
 from QMDown.extractor._abc import BatchExtractor
+from QMDown.track import Track
 
 
 @final
@@ -12,10 +14,26 @@ class ToplistExtractor(BatchExtractor):
         r"https?://y\.qq\.com/n/ryqq/toplist/(?P<id>[0-9]+)",
         r"https?://i\.y\.qq\.com/n2/m/share/details/toplist\.html\?.*id=(?P<id>[0-9]+)",
     )
+    PAGE_SIZE = 100
+    ESTIMATED_SIZE = 100
+
+    async def _get_page(self, top_id: int, page: int) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        return await api.get_detail(top_id, num=self.PAGE_SIZE, page=page)
+
+    @override
+    async def get_title(self, url: str, url_id: str | None = None) -> str:
+        toplist = await self._get_page(int(self._resolve_id(url, url_id)), 1)
+        return cast(str, toplist["data"]["title"])
 
     @override
-    async def extract(self, url: str):
-        id = self._match_id(url)
-        toplist = await api.get_detail(int(id), num=1000)
+    async def iter_pages(self, url: str, url_id: str | None = None) -> AsyncIterator[list[Track]]:
+        top_id = int(self._resolve_id(url, url_id))
+        toplist = await self._get_page(top_id, 1)
         self.print(f"榜单信息获取成功: [red]{toplist['data']['title']}")
-        return cast(list[dict[str, Any]], toplist["songInfoList"])  # pyright: ignore[reportExplicitAny]
+
+        async def fetch(page: int) -> list[dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+            return cast(list[dict[str, Any]], (await self._get_page(top_id, page))["songInfoList"])  # pyright: ignore[reportExplicitAny]
+
+        total = cast(int | None, toplist["data"].get("totalNum"))  # pyright: ignore[reportAny]
+        async for page in self.paginate(fetch, self.PAGE_SIZE, total, toplist["songInfoList"]):  # pyright: ignore[reportAny]
+            yield page
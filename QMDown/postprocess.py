@@ -0,0 +1,152 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+import httpx
+
+from QMDown import api, console
+from QMDown.track import Track
+from QMDown.utils.metrics import span
+from QMDown.utils.tags import TrackTags, embed_tags
+
+
+class PostProcessor:
+    """下载完成后写入标签、封面和歌词
+
+    标签直接取自提取器返回的歌曲信息,封面按专辑只下载一次;文件写入在线程池中进行,不阻塞事件循环.
+    队列已满时 `submit` 等待,对下载形成背压.下载开始前可调用 `prefetch` 提前获取封面.
+
+    Args:
+        workers: 同时处理的文件数,也是线程池大小
+        max_pending: 队列中最多等待的文件数
+        cover: 是否嵌入专辑封面
+        lyric: 是否嵌入歌词
+        cover_size: 封面尺寸
+        max_covers: 内存中保留的封面数
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_pending: int = 64,
+        cover: bool = True,
+        lyric: bool = False,
+        cover_size: Literal[150, 300, 500, 800] = 800,
+        max_covers: int = 64,
+    ) -> None:
+        self.concurrency: int = workers
+        self.queue: asyncio.Queue[tuple[Path, Track, str | None, asyncio.Future[None]] | None] = asyncio.Queue(
+            maxsize=max_pending
+        )
+        self.cover: bool = cover
+        self.lyric: bool = lyric
+        self.cover_size: Literal[150, 300, 500, 800] = cover_size
+        self.max_covers: int = max_covers
+        self.workers: list[asyncio.Task[None]] = []
+        self.processed: int = 0
+        self.failed: int = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._covers: OrderedDict[str, asyncio.Task[bytes | None]] = OrderedDict()
+
+    def start(self):
+        if self.workers:
+            raise RuntimeError("PostProcessor is already started.")
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="postprocess")
+        self.workers = [asyncio.create_task(self.loop(), name=f"postprocess-{i}") for i in range(self.concurrency)]
+
+    def prefetch(self, song: Track):
+        """提前获取歌曲的封面,不等待结果"""
+        if self.cover:
+            _ = self._get_cover(song)
+
+    async def submit(self, path: Path, song: Track, suffix: str | None = None) -> asyncio.Future[None]:
+        """添加已下载的文件,队列已满时等待
+
+        Args:
+            path: 文件路径
+            song: 歌曲信息
+            suffix: 用于判断文件格式的后缀,默认取 `path` 的后缀,处理 `.part` 文件时需要指定
+
+        Returns:
+            该文件处理结束(无论成功与否)或被丢弃时完成的 future
+        """
+        done: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        await self.queue.put((path, song, suffix, done))
+        return done
+
+    async def close(self):
+        """处理完队列中的文件后停止"""
+        for _ in self.workers:
+            await self.queue.put(None)
+        _ = await asyncio.gather(*self.workers, return_exceptions=True)
+        self._shutdown()
+
+    async def cancel(self):
+        """取消所有处理并丢弃队列中的文件"""
+        for worker in self.workers:
+            _ = worker.cancel()
+        _ = await asyncio.gather(*self.workers, return_exceptions=True)
+        while not self.queue.empty():
+            if (item := self.queue.get_nowait()) is not None and not item[3].done():
+                item[3].set_result(None)
+            self.queue.task_done()
+        self._shutdown()
+
+    def _shutdown(self):
+        self.workers = []
+        for task in self._covers.values():
+            _ = task.cancel()
+        self._covers.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def loop(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    break
+                await self.process(item[0], item[1], item[2])
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                console.print("[red]写入标签失败:[/]", item[0].name if item else "", repr(e))
+            finally:
+                if item is not None and not item[3].done():
+                    item[3].set_result(None)
+                self.queue.task_done()
+
+    async def process(self, path: Path, song: Track, suffix: str | None = None):
+        tags = TrackTags.from_track(song)
+        cover = self._get_cover(song) if self.cover else None
+        if self.lyric:
+            tags.lyric = (await api.lyric.get_lyric(song.mid))["lyric"]
+        if cover is not None:
+            tags.cover = await cover
+        with span("tag"):
+            _ = await asyncio.get_running_loop().run_in_executor(self._executor, embed_tags, path, tags, suffix)
+
+    def _get_cover(self, song: Track) -> Awaitable[bytes | None] | None:
+        album_mid = song.album_mid
+        if not album_mid:
+            return None
+        if (task := self._covers.get(album_mid)) is None:
+            task = self._covers[album_mid] = asyncio.create_task(self._fetch_cover(album_mid))
+            if len(self._covers) > self.max_covers:
+                _ = self._covers.popitem(last=False)
+        else:
+            self._covers.move_to_end(album_mid)
+        return asyncio.shield(task)
+
+    async def _fetch_cover(self, album_mid: str) -> bytes | None:
+        session = await api.get_Session()
+        try:
+            resp = await session.get(api.album.get_cover(album_mid, self.cover_size))
+            _ = resp.raise_for_status()
+        except httpx.HTTPError:
+            return None
+        return resp.content
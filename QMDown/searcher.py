@@ -0,0 +1,145 @@
+import asyncio
+import csv
+import re
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+
+from QMDown import api
+from QMDown.track import Track
+
+SONG_URL = "https://y.qq.com/n/ryqq/songDetail/{mid}"
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_CSV_HEADERS = {("artist", "title"), ("singer", "title"), ("歌手", "标题")}
+
+
+def _normalize(value: str) -> str:
+    return _NON_WORD_RE.sub("", value.casefold())
+
+
+@dataclass
+class SearchQuery:
+    keyword: str
+    title: str = ""
+    artist: str = ""
+    line: int = 0
+    """在输入文件中的行号"""
+
+    @classmethod
+    def parse(cls, line: str, lineno: int = 0, is_csv: bool = False) -> "SearchQuery | None":
+        """解析一行输入,CSV 按 `歌手,标题` 两列读取,空行返回 None"""
+        if not is_csv:
+            keyword = line.strip()
+            return cls(keyword, line=lineno) if keyword else None
+        fields = next(csv.reader([line]), list[str]())
+        row = [field.strip() for field in fields]
+        if not any(row):
+            return None
+        # 只有一列时视为标题
+        artist, title = ("", row[0]) if len(row) == 1 else (row[0], row[1])
+        if (artist.casefold(), title.casefold()) in _CSV_HEADERS:
+            return None
+        keyword = f"{artist} {title}".strip()
+        return cls(keyword, title=title, artist=artist, line=lineno) if keyword else None
+
+
+def score(song: Track, query: SearchQuery) -> int:
+    """歌曲与查询的匹配程度,完全相同计 2 分,包含关系计 1 分"""
+    result = 0
+    if query.title:
+        title, wanted = _normalize(song.title), _normalize(query.title)
+        result += 2 if title == wanted else int(bool(title and wanted) and (wanted in title or title in wanted))
+    if query.artist:
+        wanted = _normalize(query.artist)
+        singers = [_normalize(singer) for singer in song.singers]
+        if wanted in singers:
+            result += 2
+        elif any(singer and (wanted in singer or singer in wanted) for singer in singers):
+            result += 1
+    return result
+
+
+def to_record(
+    query: SearchQuery,
+    song: Track | None,
+    error: str | None = None,
+) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+    """批量模式输出的 JSON Lines 记录,未匹配时 `mid` 和 `url` 为 None,搜索失败时包含 `error`"""
+    record: dict[str, Any] = {"line": query.line, "query": query.keyword, "mid": None}  # pyright: ignore[reportExplicitAny]
+    if song is not None:
+        record.update(mid=song.mid, title=song.title, singer=", ".join(song.singers), album=song.album)
+    record["url"] = SONG_URL.format(mid=song.mid) if song is not None else None
+    if error is not None:
+        record["error"] = error
+    return record
+
+
+class Searcher:
+    """歌曲搜索
+
+    同一关键词的多个结果页并发请求,结果按 `search.search_by_type` 的有效期缓存.
+
+    Args:
+        page_size: 每页结果数
+        pages: 每个关键词获取的页数
+        concurrency: 批量模式下同时处理的关键词数
+    """
+
+    def __init__(self, page_size: int = 20, pages: int = 1, concurrency: int = 8) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.page_size: int = page_size
+        self.pages: int = pages
+        self.concurrency: int = concurrency
+
+    async def search(self, keyword: str, pages: int | None = None) -> list[Track]:
+        """搜索歌曲,结果按 mid 去重"""
+        results = await asyncio.gather(
+            *(
+                api.search.search_by_type(keyword, api.search.SearchType.SONG, self.page_size, page, False)
+                for page in range(1, (pages or self.pages) + 1)
+            )
+        )
+        songs: dict[str, Track] = {}
+        for page in results:
+            for song in page:
+                if song["mid"] not in songs:
+                    songs[song["mid"]] = Track.from_song(song)
+        return list(songs.values())
+
+    async def match(self, query: SearchQuery) -> Track | None:
+        """返回最匹配的歌曲;指定了标题或歌手而没有任何结果符合时返回 None"""
+        songs = await self.search(query.keyword)
+        if not songs:
+            return None
+        if not query.title and not query.artist:
+            return songs[0]
+        best = max(songs, key=lambda song: score(song, query))
+        return best if score(best, query) > 0 else None
+
+    async def _try_match(self, query: SearchQuery) -> tuple[Track | None, str | None]:
+        try:
+            return await self.match(query), None
+        except Exception as e:
+            return None, repr(e)
+
+    async def resolve(
+        self,
+        queries: AsyncIterable[SearchQuery],
+    ) -> AsyncIterator[tuple[SearchQuery, Track | None, str | None]]:
+        """并发匹配,同时处理的查询不超过 `concurrency`,按输入顺序产出 `(查询, 歌曲, 错误)`"""
+        window: deque[tuple[SearchQuery, asyncio.Task[tuple[Track | None, str | None]]]] = deque()
+        try:
+            async for query in queries:
+                if len(window) >= self.concurrency:
+                    done, task = window.popleft()
+                    yield done, *await task
+                window.append((query, asyncio.create_task(self._try_match(query))))
+            while window:
+                done, task = window.popleft()
+                yield done, *await task
+        finally:
+            for _, task in window:
+                _ = task.cancel()
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from QMDown import api, console
+from QMDown.downloader import Downloader, DownloadTask
+from QMDown.utils.http import BadRequest, ChunkedResponse, Request, read_request, send_json
+from QMDown.utils.ratelimit import BandwidthLimiter, RateWindow, parse_rate
+
+# 每个任务保留的最近事件数
+MAX_EVENTS = 1000
+
+
+@dataclass
+class Job:
+    """一次提交的下载任务,包含若干 URL"""
+
+    id: str
+    urls: list[str]
+    resume: bool = True
+    priority: int = 0
+    status: str = "queued"
+    """`queued`、`running` 或 `done`"""
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+    tracks: Counter[str] = field(default_factory=Counter)
+    """各状态的歌曲数量"""
+    errors: list[dict[str, str]] = field(default_factory=list)
+    events: deque[dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_EVENTS), repr=False)  # pyright: ignore[reportExplicitAny]
+    """最近的事件,超出 `MAX_EVENTS` 时丢弃较早的事件"""
+    published: int = field(default=0, repr=False)
+    """已发布的事件总数"""
+    _pending: int = field(default=0, repr=False)
+    _subscribers: set[asyncio.Queue[dict[str, Any] | None]] = field(default_factory=set, repr=False)  # pyright: ignore[reportExplicitAny]
+
+    def __post_init__(self):
+        self._pending = len(self.urls)
+
+    def on_event(self, event: str, data: dict[str, Any]):  # pyright: ignore[reportExplicitAny]
+        """`DownloadTask` 的监听函数"""
+        self.status = "running"
+        if event == "track":
+            self.tracks[data["status"]] += 1
+        elif event == "error":
+            self.errors.append({"url": data["url"], "error": data["error"]})
+        elif event == "done":
+            self._pending -= 1
+        self._publish({"event": event, **data})
+        if not self._pending:
+            self.status = "done"
+            self.finished = time.time()
+            self._publish({"event": "finished", **self.summary()})
+            for queue in self._subscribers:
+                queue.put_nowait(None)
+
+    def _publish(self, record: dict[str, Any]):  # pyright: ignore[reportExplicitAny]
+        self.events.append(record)
+        self.published += 1
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    async def iter_events(self):
+        """先产出最近的事件,再产出新事件直到任务结束
+
+        较早的事件已被丢弃时,首先产出 `status` 事件,包含当前任务状态(已计入随后的最近事件)和丢弃的事件数.
+        """
+        queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()  # pyright: ignore[reportExplicitAny]
+        history: list[dict[str, Any]] = list(self.events)  # pyright: ignore[reportExplicitAny]
+        if (dropped := self.published - len(history)) > 0:
+            history.insert(0, {"event": "status", "dropped": dropped, **self.summary()})
+        done = self.status == "done"
+        if not done:
+            self._subscribers.add(queue)
+        try:
+            for record in history:
+                yield record
+            if done:
+                return
+            while (record := await queue.get()) is not None:
+                yield record
+        finally:
+            self._subscribers.discard(queue)
+
+    def summary(self) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        return {
+            "id": self.id,
+            "status": self.status,
+            "urls": self.urls,
+            "priority": self.priority,
+            "created": self.created,
+            "finished": self.finished,
+            "tracks": dict(self.tracks),
+            "errors": self.errors,
+        }
+
+
+def _parse_job(request: Request) -> tuple[list[str], bool, int]:
+    """解析 `POST /jobs` 的请求体,返回去重后的 URL、是否断点续传和优先级"""
+    body = request.json()  # pyright: ignore[reportAny]
+    urls = body.get("urls") if isinstance(body, dict) else None  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):  # pyright: ignore[reportUnknownVariableType]
+        raise BadRequest("`urls` must be a non-empty list of strings")
+    priority = body.get("priority", 0)  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        raise BadRequest("`priority` must be an integer")
+    return list(dict.fromkeys(urls)), bool(body.get("resume", True)), priority  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
+
+
+def _parse_rate(value: Any) -> float:  # pyright: ignore[reportExplicitAny, reportAny]
+    if isinstance(value, int | float) and not isinstance(value, bool) and value >= 0:
+        return float(value)
+    if isinstance(value, str):
+        return parse_rate(value)
+    raise ValueError(f"Invalid rate: {value!r}")
+
+
+def _update_limits(limiter: BandwidthLimiter, request: Request):
+    """按 `PUT /limits` 的请求体修改带宽限制,全部校验通过后才生效"""
+    body = request.json()  # pyright: ignore[reportAny]
+    if not isinstance(body, dict):
+        raise BadRequest("body must be an object")
+    try:
+        rate = _parse_rate(body["rate"]) if "rate" in body else None
+        file_rate = _parse_rate(body["file_rate"]) if "file_rate" in body else None
+        schedule = body.get("schedule")  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+        if schedule is not None:
+            if not isinstance(schedule, list):
+                raise ValueError("`schedule` must be a list")
+            schedule = [RateWindow.parse(str(window)) for window in schedule]  # pyright: ignore[reportUnknownArgumentType, reportUnknownVariableType]
+    except ValueError as e:
+        raise BadRequest(str(e)) from e
+    if rate is not None:
+        limiter.set_rate(rate)
+    if file_rate is not None:
+        limiter.set_file_rate(file_rate)
+    if schedule is not None:
+        limiter.set_schedule(schedule)
+
+
+class DownloadServer:
+    """常驻下载服务
+
+    在本地 HTTP 端口或 Unix 套接字上接收任务,所有任务共用同一个 `Downloader`,
+    因此 API 会话、连接池、元数据缓存和已下载索引在任务之间保持复用.
+
+    接口:
+        - `POST /jobs`: 提交任务,请求体为 `{"urls": [...], "resume": true, "priority": 0}`
+        - `GET /jobs`: 任务列表
+        - `GET /jobs/<id>`: 任务状态
+        - `GET /jobs/<id>/events`: 以 NDJSON 流式返回任务事件,任务结束后关闭
+        - `GET /limits`: 当前带宽限制
+        - `PUT /limits`: 修改带宽限制,请求体为 `{"rate": "5M", "file_rate": 0, "schedule": ["09:00-18:00=5M"]}`,
+          省略的字段保持不变
+        - `GET /health`: 服务状态
+
+    Args:
+        downloader: 已启动的下载器
+        max_jobs: 保留的已结束任务数
+    """
+
+    def __init__(self, downloader: Downloader, max_jobs: int = 100) -> None:
+        self.downloader: Downloader = downloader
+        self.max_jobs: int = max_jobs
+        self.jobs: dict[str, Job] = {}
+        self.started: float = time.time()
+        self._server: asyncio.Server | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8910, path: Path | None = None):
+        """监听 `path` 指定的 Unix 套接字,未指定时监听 `host:port`"""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self._server = await asyncio.start_server(self.handle, host, port)
+
+    @property
+    def address(self) -> str:
+        if self._server is None:
+            return ""
+        sockname: str | tuple[str, int] = self._server.sockets[0].getsockname()  # pyright: ignore[reportAny]
+        return f"unix:{sockname}" if isinstance(sockname, str) else f"http://{sockname[0]}:{sockname[1]}"
+
+    async def serve_forever(self):
+        if self._server is None:
+            raise RuntimeError("Server is not started.")
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            _ = task.cancel()
+        _ = await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, urls: list[str], resume: bool = True, priority: int = 0) -> Job:
+        """创建任务并在后台加入下载队列"""
+        job = Job(uuid.uuid4().hex[:12], urls, resume, priority)
+        self.jobs[job.id] = job
+        self._evict()
+        task = asyncio.create_task(self._enqueue(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _enqueue(self, job: Job):
+        def listener(event: str, data: dict[str, Any]):  # pyright: ignore[reportExplicitAny]
+            job.on_event(event, data)
+            if job.status == "done" and self.downloader.index is not None:
+                self.downloader.index.flush()
+
+        for url in job.urls:
+            await self.downloader.add_task(
+                DownloadTask(url=url, resume=job.resume, priority=job.priority, listener=listener)
+            )
+
+    def _evict(self):
+        finished = [job for job in self.jobs.values() if job.status == "done"]
+        for job in finished[: max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job.id]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            if (request := await read_request(reader)) is not None:
+                await self.dispatch(request, writer)
+        except BadRequest as e:
+            await send_json(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            console.print("[red]请求处理失败:[/]", repr(e))
+            await send_json(writer, 500, {"error": repr(e)})
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        parts = request.path.strip("/").split("/")
+        match request.method, parts:
+            case "GET", ["health"]:
+                progress = self.downloader.progress
+                await send_json(
+                    writer,
+                    200,
+                    {
+                        "status": "ok",
+                        "uptime": time.time() - self.started,
+                        "jobs": len(self.jobs),
+                        "queued": self.downloader.queue.qsize(),
+                        "downloads": progress.total_tasks - progress.finished_tasks,
+                        "bytes": progress.completed_bytes,
+                        "accounts": pool.stats() if (pool := api.get_pool()) else [],
+                        "connections": api.connection_stats(),
+                    },
+                )
+            case (("GET" | "PUT"), ["limits"]):
+                await self._limits(request, writer)
+            case "POST", ["jobs"]:
+                job = self.submit(*_parse_job(request))
+                await send_json(writer, 201, job.summary())
+            case "GET", ["jobs"]:
+                await send_json(writer, 200, [job.summary() for job in self.jobs.values()])
+            case "GET", ["jobs", job_id]:
+                if (job := self.jobs.get(job_id)) is None:
+                    await send_json(writer, 404, {"error": "job not found"})
+                else:
+                    await send_json(writer, 200, job.summary())
+            case "GET", ["jobs", job_id, "events"]:
+                await self._events(job_id, writer)
+            case _:
+                await send_json(writer, 404, {"error": "not found"})
+
+    async def _events(self, job_id: str, writer: asyncio.StreamWriter):
+        if (job := self.jobs.get(job_id)) is None:
+            await send_json(writer, 404, {"error": "job not found"})
+            return
+        response = ChunkedResponse(writer)
+        await response.start()
+        async for record in job.iter_events():
+            await response.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        await response.close()
+
+    async def _limits(self, request: Request, writer: asyncio.StreamWriter):
+        if (limiter := self.downloader.limiter) is None:
+            await send_json(writer, 404, {"error": "bandwidth limiter not configured"})
+            return
+        if request.method == "PUT":
+            _update_limits(limiter, request)
+        await send_json(writer, 200, limiter.to_dict())
@@ -0,0 +1,70 @@
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+from qqmusic_api.song import SongFileType
+
+# 音质对应的 `file` 字段中的大小键,去掉 `size_` 前缀
+_SIZE_KEYS = {
+    SongFileType.MASTER: "hires",
+    SongFileType.FLAC: "flac",
+    SongFileType.OGG_640: "640ogg",
+    SongFileType.OGG_320: "320ogg",
+    SongFileType.OGG_192: "192ogg",
+    SongFileType.OGG_96: "96ogg",
+    SongFileType.MP3_320: "320mp3",
+    SongFileType.MP3_128: "128mp3",
+    SongFileType.ACC_192: "192aac",
+    SongFileType.ACC_96: "96aac",
+    SongFileType.ACC_48: "48aac",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    """歌曲信息
+
+    提取器从接口返回的歌曲字典中只取下载和写入标签需要的字段,
+    之后的下载、链接和后处理都使用该对象,不再持有完整的接口数据.
+    """
+
+    mid: str
+    id: int = 0
+    title: str = ""
+    singers: tuple[str, ...] = ()
+    album: str = ""
+    album_mid: str = ""
+    track_number: int = 0
+    date: str = ""
+    duration: int = 0
+    """时长(秒)"""
+    sizes: tuple[tuple[str, int], ...] = ()
+    """各音质的文件大小,如 `("320mp3", 9600000)`,只包含大小不为 0 的音质"""
+
+    @classmethod
+    def from_song(cls, song: dict[str, Any]) -> "Track":  # pyright: ignore[reportExplicitAny]
+        """从接口返回的歌曲信息构建"""
+        album: dict[str, str] = song.get("album") or {}
+        file: dict[str, object] = song.get("file") or {}
+        return cls(
+            mid=song["mid"],  # pyright: ignore[reportAny]
+            id=song.get("id") or 0,
+            title=song.get("title") or song.get("name", ""),  # pyright: ignore[reportAny]
+            # 同一歌手、专辑的歌曲共用字符串
+            singers=tuple(sys.intern(singer["name"]) for singer in song.get("singer", ())),  # pyright: ignore[reportAny]
+            album=sys.intern(album.get("title") or album.get("name", "")),
+            album_mid=album.get("mid", ""),
+            track_number=song.get("index_album") or 0,
+            date=song.get("time_public", ""),  # pyright: ignore[reportAny]
+            duration=song.get("interval") or 0,
+            sizes=tuple(
+                (key[5:], size)
+                for key, size in file.items()
+                if key.startswith("size_") and isinstance(size, int) and size
+            ),
+        )
+
+    def size(self, file_type: SongFileType) -> int:
+        """指定音质的文件大小,未知时为 0"""
+        key = _SIZE_KEYS.get(file_type)
+        return next((size for name, size in self.sizes if name == key), 0)
@@ -0,0 +1,102 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class Batcher(Generic[K, V]):
+    """合并并发的单个查询为批量请求
+
+    `delay` 时间窗口内或累计达到 `max_size` 个键时调用一次 `func`,再将结果分发给各调用方.
+    相同的键在同一批次中只查询一次.
+
+    Args:
+        func: 批量查询函数,返回键到结果的映射
+        max_size: 单次批量查询的最大键数
+        delay: 等待合并的时间窗口(秒)
+    """
+
+    def __init__(
+        self,
+        func: Callable[[list[K]], Awaitable[dict[K, V]]],
+        max_size: int = 100,
+        delay: float = 0.02,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.func: Callable[[list[K]], Awaitable[dict[K, V]]] = func
+        self.max_size: int = max_size
+        self.delay: float = delay
+        self._pending: dict[K, asyncio.Future[V]] = {}
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def get(self, key: K) -> V:
+        # 同一个 future 可能被多个调用方共享,取消时不影响其他调用方
+        return await asyncio.shield(self._enqueue(key))
+
+    async def get_many(self, keys: Iterable[K]) -> dict[K, V]:
+        """查询多个键,`func` 结果中没有的键不包含在返回值中;其他错误在所有键完成后抛出"""
+        futures = {key: self._enqueue(key) for key in keys}
+        results = await asyncio.gather(*map(asyncio.shield, futures.values()), return_exceptions=True)
+        found: dict[K, V] = {}
+        error: BaseException | None = None
+        for key, result in zip(futures, results, strict=True):
+            if not isinstance(result, BaseException):
+                found[key] = result
+            elif not isinstance(result, KeyError) and error is None:
+                error = result
+        if error is not None:
+            raise error
+        return found
+
+    def _enqueue(self, key: K) -> asyncio.Future[V]:
+        if (future := self._pending.get(key) or self._inflight.get(key)) is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._inflight.update(batch)
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future[V]]):
+        try:
+            results = await self.func(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # 批量任务被取消时同样结束等待中的调用方,否则它们会一直等待
+            for future in batch.values():
+                _ = future.cancel()
+            raise
+        finally:
+            for key in batch:
+                del self._inflight[key]
+        for key, future in batch.items():
+            if future.done():
+                continue
+            if key in results:
+                future.set_result(results[key])
+            else:
+                future.set_exception(KeyError(key))
@@ -0,0 +1,227 @@
+"""HTTP 连接池"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+import httpcore
+import httpx
+from httpcore import AsyncNetworkBackend, AsyncNetworkStream
+from httpcore._backends.auto import AutoBackend
+from typing_extensions import override
+
+from QMDown.utils.ratelimit import RateLimitedTransport
+
+SocketOption = tuple[int, int, int] | tuple[int, int, bytes | bytearray] | tuple[int, int, None, int]
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """连接池配置
+
+    Args:
+        max_connections: 最大连接数
+        max_keepalive: 最多保持的空闲连接数
+        keepalive_expiry: 空闲连接保持时间(秒)
+        http2: 是否启用 HTTP/2
+    """
+
+    max_connections: int | None = 100
+    max_keepalive: int | None = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+    def to_httpx(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+# API 请求小而频繁,HTTP/2 在少量连接上多路复用
+API_POOL = PoolLimits(max_connections=16, max_keepalive=16, keepalive_expiry=120.0, http2=True)
+# 文件下载按分片并发,每个分片使用独立的 HTTP/1.1 连接以免共用一条 TCP 连接的带宽
+CDN_POOL = PoolLimits(max_connections=64, max_keepalive=64, keepalive_expiry=30.0)
+
+
+class DNSCache:
+    """缓存域名解析结果 `ttl` 秒,同一域名的并发解析共用一次查询"""
+
+    def __init__(self, ttl: float = 300.0) -> None:
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._pending: dict[tuple[str, int], asyncio.Future[list[str]]] = {}
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        key = (host, port)
+        if (entry := self._entries.get(key)) is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        if (future := self._pending.get(key)) is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+        self.misses += 1
+        future = self._pending[key] = asyncio.ensure_future(self._lookup(host, port))
+        try:
+            addresses = await asyncio.shield(future)
+        finally:
+            _ = self._pending.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    @staticmethod
+    async def _lookup(host: str, port: int) -> list[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(str(info[4][0]) for info in infos))
+
+    def invalidate(self, host: str, port: int):
+        _ = self._entries.pop((host, port), None)
+
+
+class PoolBackend(AsyncNetworkBackend):
+    """记录新建连接数的网络后端,给出 `dns` 时通过缓存解析域名后按地址依次尝试连接"""
+
+    def __init__(self, dns: DNSCache | None = None, backend: AsyncNetworkBackend | None = None) -> None:
+        self.dns: DNSCache | None = dns
+        self.backend: AsyncNetworkBackend = backend or AutoBackend()
+        self.connects: int = 0
+
+    @override
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable[SocketOption] | None = None,
+    ) -> AsyncNetworkStream:
+        self.connects += 1
+        if self.dns is None or _is_ip(host):
+            return await self.backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        try:
+            addresses = await self.dns.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        options = list(socket_options or [])
+        error: Exception | None = None
+        # TLS 的 SNI 由 httpcore 按原始域名设置,这里只替换连接地址
+        for address in addresses:
+            try:
+                return await self.backend.connect_tcp(address, port, timeout, local_address, options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self.dns.invalidate(host, port)
+        raise error or httpcore.ConnectError(f"Unable to resolve {host}")
+
+    @override
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: float | None = None,
+        socket_options: Iterable[SocketOption] | None = None,
+    ) -> AsyncNetworkStream:
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    @override
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        _ = ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+
+def create_transport(limits: PoolLimits, dns: DNSCache | None = None) -> httpx.AsyncHTTPTransport:
+    """按 `limits` 创建传输层,新建连接通过 `PoolBackend` 计数和解析"""
+    transport = httpx.AsyncHTTPTransport(http2=limits.http2, limits=limits.to_httpx())
+    # httpx 不支持指定网络后端,直接替换连接池的后端
+    transport._pool._network_backend = PoolBackend(dns)  # pyright: ignore[reportPrivateUsage]
+    return transport
+
+
+def _find_pool(transport: httpx.AsyncBaseTransport) -> httpcore.AsyncConnectionPool | None:
+    """沿 `transport` 属性找到 httpx 传输层的连接池"""
+    while not isinstance(transport, httpx.AsyncHTTPTransport):
+        if (inner := getattr(transport, "transport", None)) is None:
+            return None
+        transport = inner  # pyright: ignore[reportAny]
+    return transport._pool  # pyright: ignore[reportPrivateUsage]
+
+
+def pool_stats(transport: httpx.AsyncBaseTransport) -> dict[str, int]:
+    """连接池当前的连接数、空闲连接数、HTTP/2 连接数、排队请求数和累计新建连接数"""
+    if (pool := _find_pool(transport)) is None:
+        return {}
+    connections = pool.connections
+    backend = pool._network_backend  # pyright: ignore[reportPrivateUsage]
+    return {
+        "connections": len(connections),
+        "idle": sum(connection.is_idle() for connection in connections),
+        "http2": sum("HTTP/2" in connection.info() for connection in connections),
+        "queued": sum(request.is_queued() for request in pool._requests),  # pyright: ignore[reportPrivateUsage]
+        "connects": backend.connects if isinstance(backend, PoolBackend) else 0,
+    }
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """API 请求和 CDN 下载使用各自的连接池
+
+    API 主机默认启用 HTTP/2,CDN 使用更大的 HTTP/1.1 连接池;两者共用 DNS 缓存.
+
+    Args:
+        api: API 请求的传输层,默认按 `api_limits` 创建
+        cdn: CDN 请求的传输层,默认按 `cdn_limits` 创建
+        api_limits: API 连接池配置
+        cdn_limits: CDN 连接池配置
+        dns_ttl: DNS 缓存时间(秒),0 为不缓存
+    """
+
+    def __init__(
+        self,
+        api: httpx.AsyncBaseTransport | None = None,
+        cdn: httpx.AsyncBaseTransport | None = None,
+        *,
+        api_limits: PoolLimits = API_POOL,
+        cdn_limits: PoolLimits = CDN_POOL,
+        dns_ttl: float = 300.0,
+    ) -> None:
+        self.dns: DNSCache | None = DNSCache(dns_ttl) if dns_ttl > 0 and (api is None or cdn is None) else None
+        self.api: httpx.AsyncBaseTransport = api or create_transport(api_limits, self.dns)
+        self.cdn: httpx.AsyncBaseTransport = cdn or create_transport(cdn_limits, self.dns)
+        self.requests: dict[str, int] = {"api": 0, "cdn": 0}
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if RateLimitedTransport.is_api_host(request.url.host):
+            self.requests["api"] += 1
+            return await self.api.handle_async_request(request)
+        self.requests["cdn"] += 1
+        return await self.cdn.handle_async_request(request)
+
+    def stats(self) -> dict[str, dict[str, Any]]:  # pyright: ignore[reportExplicitAny]
+        """各连接池的使用情况,`reuse` 为复用已有连接的请求比例"""
+        result: dict[str, dict[str, Any]] = {}  # pyright: ignore[reportExplicitAny]
+        for name, transport in (("api", self.api), ("cdn", self.cdn)):
+            stats: dict[str, Any] = {"requests": self.requests[name], **pool_stats(transport)}  # pyright: ignore[reportExplicitAny]
+            if stats["requests"] and "connects" in stats:
+                stats["reuse"] = round(max(0.0, 1 - stats["connects"] / stats["requests"]), 4)  # pyright: ignore[reportAny]
+            result[name] = stats
+        if self.dns is not None:
+            result["dns"] = {"hits": self.dns.hits, "misses": self.dns.misses}
+        return result
+
+    @override
+    async def aclose(self) -> None:
+        await self.api.aclose()
+        await self.cdn.aclose()
@@ -0,0 +1,57 @@
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+
+_ILLEGAL_CHARS_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def get_cache_dir() -> Path:
+    """默认缓存目录"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "QMDown"
+
+
+def sanitize_filename(name: str) -> str:
+    """替换文件名中的非法字符"""
+    return _ILLEGAL_CHARS_RE.sub("_", name).strip().rstrip(".") or "_"
+
+
+def _reflink(src: Path, dst: Path):
+    if sys.platform != "linux":
+        raise OSError("reflink is not supported on this platform")
+    import fcntl
+
+    with src.open("rb") as s, dst.open("wb") as d:
+        try:
+            _ = fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            dst.unlink(missing_ok=True)
+            raise
+
+
+def link_file(src: Path, dst: Path) -> str:
+    """将 `src` 以硬链接、reflink 或复制的方式放到 `dst`,返回使用的方式"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except OSError:
+        pass
+    _ = shutil.copyfile(src, dst)
+    return "copy"
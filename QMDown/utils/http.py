@@ -0,0 +1,99 @@
+"""本地服务使用的最小 HTTP/1.1 实现"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+from httpx import codes
+
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class BadRequest(Exception):
+    pass
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def json(self) -> Any:  # pyright: ignore[reportAny, reportExplicitAny]
+        try:
+            return json.loads(self.body or b"null")  # pyright: ignore[reportAny]
+        except ValueError as e:
+            raise BadRequest(f"Invalid JSON: {e}") from e
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    """读取一个请求,连接已关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError as e:
+        raise BadRequest("Malformed request line") from e
+    headers: dict[str, str] = {}
+    while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        key, _, value = header.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_SIZE:
+        raise BadRequest("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, dict(parse_qsl(url.query)), headers, body)
+
+
+def _head(status: int, headers: dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {codes.get_reason_phrase(status)}", *(f"{k}: {v}" for k, v in headers.items())]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes = b"",
+    content_type: str = "application/json",
+    headers: dict[str, str] | None = None,
+):
+    writer.write(
+        _head(
+            status,
+            {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "close", **(headers or {})},
+        )
+        + body
+    )
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, data: Any):  # pyright: ignore[reportAny, reportExplicitAny]
+    await send_response(writer, status, json.dumps(data, ensure_ascii=False).encode())
+
+
+class ChunkedResponse:
+    """以分块传输编码逐段发送响应"""
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer: asyncio.StreamWriter = writer
+
+    async def start(self, status: int = 200, content_type: str = "application/x-ndjson"):
+        self.writer.write(
+            _head(status, {"Content-Type": content_type, "Transfer-Encoding": "chunked", "Connection": "close"})
+        )
+        await self.writer.drain()
+
+    async def write(self, data: bytes):
+        if data:
+            self.writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await self.writer.drain()
+
+    async def close(self):
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
@@ -0,0 +1,145 @@
+import asyncio
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Literal
+
+JOBS_FILENAME = ".qmdown-jobs.sqlite3"
+
+TaskState = Literal["pending", "extracting", "downloading", "done", "failed"]
+
+
+@dataclass
+class QueuedTask:
+    id: int
+    """加入队列的顺序"""
+    url: str
+    resume: bool = True
+    state: TaskState = "pending"
+    error: str | None = None
+
+
+class JobQueue:
+    """持久化的下载任务队列
+
+    记录每个 URL 的任务状态,进程中断后可以只继续未完成的任务,已完成的合集不再重新提取.
+    所有任务在打开时载入内存,状态变化累积到 `flush_size` 条或 `flush_interval` 秒后批量提交.
+
+    状态: `pending` -> `extracting` -> `downloading` -> `done` / `failed`
+
+    Args:
+        path: 数据库文件路径
+        flush_size: 批量提交条数
+        flush_interval: 最长提交间隔(秒)
+    """
+
+    def __init__(self, path: Path, flush_size: int = 100, flush_interval: float = 1.0) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self.flush_size: int = flush_size
+        self.flush_interval: float = flush_interval
+        self._conn: sqlite3.Connection = sqlite3.connect(path)
+        _ = self._conn.execute("PRAGMA journal_mode=WAL")
+        _ = self._conn.execute("PRAGMA synchronous=NORMAL")
+        _ = self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY, id INTEGER NOT NULL, resume INTEGER NOT NULL, state TEXT NOT NULL,
+                error TEXT, updated REAL NOT NULL
+            )"""
+        )
+        self._tasks: dict[str, QueuedTask] = {}
+        rows: list[tuple[str, int, int, TaskState, str | None]] = self._conn.execute(
+            "SELECT url, id, resume, state, error FROM tasks ORDER BY id"
+        ).fetchall()
+        for url, task_id, resume, state, error in rows:
+            self._tasks[url] = QueuedTask(task_id, url, bool(resume), state, error)
+        self._next_id: int = max((task.id for task in self._tasks.values()), default=0) + 1
+        self._dirty: dict[str, QueuedTask] = {}
+        self._timer: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def get(self, url: str) -> QueuedTask | None:
+        return self._tasks.get(url)
+
+    def add(self, url: str, resume: bool = True) -> QueuedTask:
+        """加入任务,已有的任务重新置为 `pending`"""
+        if (task := self._tasks.get(url)) is None:
+            task = self._tasks[url] = QueuedTask(self._next_id, url, resume)
+            self._next_id += 1
+        else:
+            task.resume = resume
+            task.state = "pending"
+            task.error = None
+        self._mark(task)
+        return task
+
+    def update(self, url: str, state: TaskState, error: str | None = None):
+        if (task := self._tasks.get(url)) is None or (task.state, task.error) == (state, error):
+            return
+        task.state = state
+        task.error = error
+        self._mark(task)
+
+    def unfinished(self) -> list[QueuedTask]:
+        """未完成的任务(包括失败的任务),按加入顺序"""
+        return [task for task in sorted(self._tasks.values(), key=lambda task: task.id) if task.state != "done"]
+
+    def counts(self) -> dict[str, int]:
+        """各状态的任务数"""
+        counts: dict[str, int] = {}
+        for task in self._tasks.values():
+            counts[task.state] = counts.get(task.state, 0) + 1
+        return counts
+
+    def clear(self):
+        """删除所有任务"""
+        self._cancel_timer()
+        self._tasks.clear()
+        self._dirty.clear()
+        self._next_id = 1
+        with self._conn:
+            _ = self._conn.execute("DELETE FROM tasks")
+
+    def _mark(self, task: QueuedTask):
+        self._dirty[task.url] = task
+        if len(self._dirty) >= self.flush_size:
+            self.flush()
+        elif self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._timer = loop.call_later(self.flush_interval, self.flush)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def flush(self):
+        self._cancel_timer()
+        if not self._dirty:
+            return
+        now = time.time()
+        with self._conn:
+            _ = self._conn.executemany(
+                "INSERT OR REPLACE INTO tasks (url, id, resume, state, error, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(task.url, task.id, int(task.resume), task.state, task.error, now) for task in self._dirty.values()],
+            )
+        self._dirty.clear()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ):
+        self.close()
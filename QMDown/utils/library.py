@@ -0,0 +1,112 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+
+from qqmusic_api.song import SongFileType
+
+INDEX_FILENAME = ".qmdown.sqlite3"
+
+# 音质等级,数值越大越好. 有损格式按码率(kbps)比较,同码率的格式视为相同;
+# 无损格式高于所有有损格式,全景声是另一种混音,低于立体声无损
+_QUALITY_RANK = {
+    SongFileType.MASTER: 3000,
+    SongFileType.FLAC: 2000,
+    SongFileType.ATMOS_51: 1500,
+    SongFileType.ATMOS_2: 1400,
+    SongFileType.OGG_640: 640,
+    SongFileType.OGG_320: 320,
+    SongFileType.MP3_320: 320,
+    SongFileType.OGG_192: 192,
+    SongFileType.ACC_192: 192,
+    SongFileType.MP3_128: 128,
+    SongFileType.OGG_96: 96,
+    SongFileType.ACC_96: 96,
+    SongFileType.ACC_48: 48,
+}
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    mid: str
+    quality: SongFileType
+    path: str
+    size: int
+
+
+class LibraryIndex:
+    """输出目录中已下载歌曲的索引
+
+    以歌曲 mid 为键记录已下载的最高音质和文件路径,打开时全部载入内存,
+    新记录累积到 `flush_size` 条后批量写入.
+
+    Args:
+        root: 输出目录
+        flush_size: 批量写入条数
+    """
+
+    def __init__(self, root: Path, flush_size: int = 100) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        self.root: Path = root
+        self.flush_size: int = flush_size
+        self._conn: sqlite3.Connection = sqlite3.connect(root / INDEX_FILENAME)
+        _ = self._conn.execute("PRAGMA journal_mode=WAL")
+        _ = self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tracks (
+                mid TEXT PRIMARY KEY, quality TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._entries: dict[str, IndexEntry] = {}
+        rows: list[tuple[str, str, str, int]] = self._conn.execute(
+            "SELECT mid, quality, path, size FROM tracks"
+        ).fetchall()
+        for mid, quality, path, size in rows:
+            if quality in SongFileType.__members__:
+                self._entries[mid] = IndexEntry(mid, SongFileType[quality], path, size)
+        self._pending: list[IndexEntry] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, mid: str) -> IndexEntry | None:
+        return self._entries.get(mid)
+
+    def find(self, mid: str, quality: SongFileType) -> Path | None:
+        """查找已下载且音质不低于 `quality` 的文件"""
+        entry = self._entries.get(mid)
+        if entry is None or _QUALITY_RANK[entry.quality] < _QUALITY_RANK[quality]:
+            return None
+        path = self.root / entry.path
+        return path if path.exists() else None
+
+    def add(self, mid: str, quality: SongFileType, path: Path, size: int):
+        entry = IndexEntry(mid, quality, path.relative_to(self.root).as_posix(), size)
+        self._entries[mid] = entry
+        self._pending.append(entry)
+        if len(self._pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        now = time.time()
+        with self._conn:
+            _ = self._conn.executemany(
+                "INSERT OR REPLACE INTO tracks (mid, quality, path, size, updated) VALUES (?, ?, ?, ?, ?)",
+                [(entry.mid, entry.quality.name, entry.path, entry.size, now) for entry in self._pending],
+            )
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ):
+        self.close()
@@ -0,0 +1,208 @@
+"""运行指标
+
+各阶段耗时按名称和标签聚合为直方图,可导出为 JSON 或 Prometheus 文本格式.
+未通过 `set_metrics` 启用时,`span` 等记录函数不做任何事.
+"""
+
+import asyncio
+import json
+import math
+import time
+from bisect import bisect_left
+from collections.abc import AsyncIterator, Callable, Coroutine
+from functools import wraps
+from pathlib import Path
+from types import TracebackType
+from typing import Any, ParamSpec, TypeVar, final
+
+P = ParamSpec("P")
+R = TypeVar("R")
+T = TypeVar("T")
+
+# 直方图桶上限(秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@final
+class Histogram:
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """按桶上限估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts, strict=True):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {_format_bound(bound): count for bound, count in zip(self.buckets, self.counts, strict=True)},
+        }
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(bound)
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Metrics:
+    """耗时直方图集合
+
+    Args:
+        buckets: 直方图桶上限(秒)
+        prefix: 导出 Prometheus 指标时的名称前缀
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, prefix: str = "qmdown") -> None:
+        self.buckets: tuple[float, ...] = buckets
+        self.prefix: str = prefix
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        series = self.histograms.setdefault(name, {})
+        if (histogram := series.get(labels)) is None:
+            histogram = series[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def to_json(self) -> dict[str, list[dict[str, Any]]]:  # pyright: ignore[reportExplicitAny]
+        return {
+            name: [{"labels": dict(labels), **histogram.to_dict()} for labels, histogram in series.items()]
+            for name, series in self.histograms.items()
+        }
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        for name, series in self.histograms.items():
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts, strict=True):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(labels, le=_format_bound(bound))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path):
+        """写入文件,`.json` 后缀为 JSON,其余为 Prometheus 文本格式"""
+        if path.suffix.lower() == ".json":
+            _ = path.write_text(json.dumps(self.to_json(), ensure_ascii=False, indent=2), encoding="utf-8")
+        else:
+            _ = path.write_text(self.to_prometheus(), encoding="utf-8")
+
+
+_metrics: Metrics | None = None
+
+
+def set_metrics(metrics: Metrics | None):
+    global _metrics
+    _metrics = metrics
+
+
+def get_metrics() -> Metrics | None:
+    return _metrics
+
+
+@final
+class span:
+    """记录代码块耗时的上下文管理器
+
+    Examples:
+        with span("download", quality="mp3_128"):
+            ...
+    """
+
+    __slots__ = ("labels", "name", "start")
+
+    def __init__(self, name: str, **labels: str) -> None:
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        if _metrics is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ):
+        if _metrics is not None and self.start:
+            _metrics.observe(self.name, time.perf_counter() - self.start, tuple(sorted(self.labels.items())))
+
+
+def timed(name: str, **labels: str):
+    """记录异步函数每次调用的耗时"""
+
+    def decorator(func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:  # pyright: ignore[reportExplicitAny]
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with span(name, **labels):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def timed_iter(iterator: AsyncIterator[T], name: str, **labels: str) -> AsyncIterator[T]:
+    """记录异步迭代器产出每一项的耗时"""
+    while True:
+        with span(name, **labels):
+            try:
+                item = await anext(iterator)
+            except StopAsyncIteration:
+                return
+        yield item
+
+
+async def serve_metrics(port: int, host: str = "127.0.0.1") -> asyncio.Server:
+    """在本地 HTTP 端口提供指标,`/metrics.json` 为 JSON,其余路径为 Prometheus 文本格式"""
+
+    from QMDown.utils.http import BadRequest, read_request, send_response
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            path = request.path if request else "/"
+            metrics = _metrics or Metrics()
+            if path.startswith("/metrics.json"):
+                await send_response(writer, 200, json.dumps(metrics.to_json()).encode())
+            else:
+                await send_response(writer, 200, metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+        except (ConnectionError, BadRequest, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -1,17 +1,56 @@
-from asyncio import Lock
+import threading
+import time
+from dataclasses import dataclass
+from itertools import count
+from types import TracebackType
 from typing import ClassVar
 
-from rich.console import Group
+from rich.console import Group, RenderableType
+from rich.filesize import decimal
 from rich.live import Live
 from rich.panel import Panel
-from rich.progress import BarColumn, DownloadColumn, Progress, SpinnerColumn, TaskID, TextColumn, TransferSpeedColumn
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    ProgressColumn,
+    SpinnerColumn,
+    TaskID,
+    TextColumn,
+    TransferSpeedColumn,
+)
 from rich.table import Column
 
 from QMDown import console
+from QMDown.utils.ratelimit import BandwidthLimiter
+
+
+@dataclass(slots=True)
+class _TaskState:
+    description: str
+    filename: str
+    total: float | None
+    completed: float
+    visible: bool
+    updated: float
 
 
 class DownloadProgress:
-    DEFAULT_COLUMNS: ClassVar = {
+    """下载进度
+
+    `add_task`/`update` 只修改计数器和任务状态,不加锁也不触发渲染;渲染线程按刷新频率采样,
+    只显示最近活跃的 `max_visible` 个下载,已完成的任务立即移除.
+    总进度中显示所有下载的总速度,设置了 `limiter` 时同时显示当前生效的限速.
+    非终端输出时不使用 Live 显示,改为每隔 `summary_interval` 秒输出一行汇总.
+
+    Args:
+        max_visible: 最多显示的下载任务数
+        refresh_per_second: 终端刷新频率
+        summary_interval: 非终端输出汇总行的间隔(秒)
+        limiter: 带宽限制
+    """
+
+    DEFAULT_COLUMNS: ClassVar[dict[str, str | ProgressColumn]] = {
         "description": TextColumn(
             "{task.description}[bold blue]{task.fields[filename]}",
             table_column=Column(ratio=2),
@@ -23,58 +62,72 @@ class DownloadProgress:
         "speed": TransferSpeedColumn(),
     }
 
-    def __init__(self) -> None:
-        self._download_progress = Progress(
+    def __init__(
+        self,
+        max_visible: int = 8,
+        refresh_per_second: float = 10,
+        summary_interval: float = 5.0,
+        limiter: BandwidthLimiter | None = None,
+    ) -> None:
+        self.max_visible: int = max_visible
+        self.limiter: BandwidthLimiter | None = limiter
+        self.summary_interval: float = summary_interval
+        self.total_tasks: int = 0
+        self.finished_tasks: int = 0
+        self.completed_bytes: float = 0.0
+        self.speed: float = 0.0
+        """所有下载的总速度(字节/秒)"""
+        self._sample: tuple[float, float] = (0.0, time.monotonic())
+        self._ids: count[int] = count()
+        self._tasks: dict[TaskID, _TaskState] = {}
+        # 仅由渲染线程访问: 任务 -> rich 任务
+        self._shown: dict[TaskID, TaskID] = {}
+        self._download_progress: Progress = Progress(
             *self.DEFAULT_COLUMNS.values(),
             expand=True,
             console=console,
         )
-        self._overall_progress = Progress(
+        self._overall_progress: Progress = Progress(
             SpinnerColumn("moon"),
-            TextColumn("[green]{task.description} [blue]{task.completed}/{task.total}"),
+            TextColumn("[green]{task.description} [blue]{task.completed}/{task.total} [cyan]{task.fields[rate]}"),
             BarColumn(bar_width=None),
             expand=True,
             console=console,
         )
-        self._overall_task_id = self._overall_progress.add_task(
+        self._overall_task_id: TaskID = self._overall_progress.add_task(
             "下载进度",
             visible=False,
+            rate="",
+        )
+        self._group: Group = Group(
+            self._overall_progress,
+            Panel(self._download_progress),
         )
-        self._live = Live(
-            Group(
-                self._overall_progress,
-                Panel(self._download_progress),
-            ),
+        self._live: Live = Live(
             console=console,
             transient=True,
-            refresh_per_second=10,
+            refresh_per_second=refresh_per_second,
+            get_renderable=self._render,
         )
-        self._progress_lock = Lock()
-        self._active_tasks: set[TaskID] = set()
+        self._summary_thread: threading.Thread | None = None
+        self._stop_summary: threading.Event = threading.Event()
 
-    async def add_task(
+    def add_task(
         self,
         description: str,
         filename: str = "",
-        start: bool = True,
+        start: bool = True,  # pyright: ignore[reportUnusedParameter]
         total: float | None = 100.0,
         completed: int = 0,
         visible: bool = True,
     ) -> TaskID:
-        async with self._progress_lock:
-            task_id = self._download_progress.add_task(
-                description=description,
-                start=start,
-                total=total,
-                completed=completed,
-                visible=visible,
-                filename=filename,
-            )
-            self._active_tasks.add(task_id)
-            self._update_overall_progress()
-            return task_id
+        task_id = TaskID(next(self._ids))
+        self._tasks[task_id] = _TaskState(description, filename, total, completed, visible, time.monotonic())
+        self.total_tasks += 1
+        self.completed_bytes += completed
+        return task_id
 
-    async def update(
+    def update(
         self,
         task_id: TaskID,
         total: float | None = None,
@@ -83,33 +136,117 @@ class DownloadProgress:
         description: str | None = None,
         visible: bool = True,
     ) -> None:
-        async with self._progress_lock:
-            update_kwargs = {
-                "total": total,
-                "completed": completed,
-                "advance": advance or 0,
-                "description": description,
-                "visible": visible,
-            }
-
-            self._download_progress.update(task_id, **update_kwargs)
-
-            if self._download_progress.tasks[task_id].finished:
-                self._active_tasks.discard(task_id)
-                self._update_overall_progress()
-
-    def _update_overall_progress(self) -> None:
-        """更新总进度条"""
+        state = self._tasks.get(task_id)
+        if state is None:
+            return
+        if total is not None:
+            state.total = total
+        if completed is not None:
+            self.completed_bytes += completed - state.completed
+            state.completed = completed
+        if advance:
+            self.completed_bytes += advance
+            state.completed += advance
+        if description is not None:
+            state.description = description
+        state.visible = visible
+        state.updated = time.monotonic()
+        if state.total is not None and state.completed >= state.total:
+            del self._tasks[task_id]
+            self.finished_tasks += 1
+
+    @property
+    def active_tasks(self) -> int:
+        return len(self._tasks)
+
+    def _render(self) -> RenderableType:
+        """渲染线程中按当前状态同步显示的任务"""
+        tasks = self._tasks.copy()
+        for task_id, rich_id in list(self._shown.items()):
+            state = tasks.get(task_id)
+            if state is None or not state.visible:
+                self._download_progress.remove_task(rich_id)
+                del self._shown[task_id]
+
+        if (free := self.max_visible - len(self._shown)) > 0:
+            candidates = sorted(
+                (item for item in tasks.items() if item[0] not in self._shown and item[1].visible),
+                key=lambda item: item[1].updated,
+                reverse=True,
+            )
+            for task_id, state in candidates[:free]:
+                self._shown[task_id] = self._download_progress.add_task(
+                    state.description,
+                    total=state.total,
+                    # rich 的 add_task 只接受整数,下载字节数本身也是整数
+                    completed=int(state.completed),
+                    filename=state.filename,
+                )
+
+        for task_id, rich_id in self._shown.items():
+            state = tasks[task_id]
+            self._download_progress.update(
+                rich_id,
+                total=state.total,
+                completed=state.completed,
+                description=state.description,
+            )
         self._overall_progress.update(
             self._overall_task_id,
-            total=len(self._download_progress.tasks),
-            completed=len(self._download_progress.tasks) - len(self._active_tasks),
-            visible=bool(self._download_progress.tasks),
+            total=self.total_tasks,
+            completed=self.finished_tasks,
+            visible=bool(self.total_tasks),
+            rate=self.rate_text(),
         )
+        return self._group
+
+    def _update_speed(self, min_interval: float = 1.0):
+        last_bytes, last_time = self._sample
+        now = time.monotonic()
+        if now - last_time >= min_interval:
+            self.speed = (self.completed_bytes - last_bytes) / (now - last_time)
+            self._sample = (self.completed_bytes, now)
+
+    def rate_text(self) -> str:
+        """总速度和当前限速"""
+        self._update_speed()
+        text = f"{decimal(int(self.speed))}/s"
+        if self.limiter is not None:
+            limits: list[str] = []
+            if rate := self.limiter.rate:
+                limits.append(f"{decimal(int(rate))}/s")
+            if file_rate := self.limiter.file_rate:
+                limits.append(f"单文件 {decimal(int(file_rate))}/s")
+            if limits:
+                text += f" (限速 {', '.join(limits)})"
+        return text
+
+    def summary(self) -> str:
+        return f"下载进度 {self.finished_tasks}/{self.total_tasks} • {decimal(int(self.completed_bytes))}"
+
+    def _summary_loop(self):
+        self._sample = (self.completed_bytes, time.monotonic())
+        while not self._stop_summary.wait(self.summary_interval):
+            if self.total_tasks:
+                console.print(f"{self.summary()} • {self.rate_text()}", highlight=False)
 
     def __enter__(self):
-        self._live.start()
+        if console.is_terminal:
+            self._live.start()
+        else:
+            self._stop_summary.clear()
+            self._summary_thread = threading.Thread(target=self._summary_loop, name="progress-summary", daemon=True)
+            self._summary_thread.start()
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._live.stop()
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ):
+        if self._summary_thread is None:
+            self._live.stop()
+            return
+        self._stop_summary.set()
+        self._summary_thread.join()
+        self._summary_thread = None
+        if self.total_tasks:
+            console.print(self.summary(), highlight=False)
@@ -0,0 +1,351 @@
+import asyncio
+import datetime
+import random
+import re
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from typing_extensions import override
+
+# 判定为 API 请求的域名后缀,其余视为 CDN
+API_HOST_SUFFIXES = ("y.qq.com",)
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(httpx.TransportError):
+    """目标主机连续失败,熔断期间拒绝请求"""
+
+
+class TokenBucket:
+    """令牌桶限速
+
+    允许令牌数为负以预约后续令牌,调用方按预约顺序依次等待,无需加锁.
+
+    Args:
+        rate: 每秒生成的令牌数
+        capacity: 桶容量,即允许的突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate: float = rate
+        self.capacity: float = capacity or rate
+        self._tokens: float = self.capacity
+        self._updated: float = time.monotonic()
+
+    def set_rate(self, rate: float, capacity: float | None = None):
+        """修改速率,已生成的令牌按原速率结算"""
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        _ = self.reserve(0)
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = min(self._tokens, self.capacity)
+
+    def reserve(self, tokens: float = 1) -> float:
+        """预约令牌,返回需要等待的秒数"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= tokens
+        return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        if (delay := self.reserve(tokens)) > 0:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """连续失败 `threshold` 次后熔断 `reset_timeout` 秒,之后放行一个试探请求"""
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.threshold: int = threshold
+        self.reset_timeout: float = reset_timeout
+        self.failures: int = 0
+        self._opened_at: float | None = None
+        self._probing: bool = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """请求未得到结果(如被取消)时调用,放弃本次试探,下一个请求重新试探"""
+        self._probing = False
+
+
+@dataclass
+class HostLimit:
+    """单个主机的限速配置
+
+    Attributes:
+        rate: 每秒请求数
+        burst: 突发请求数
+    """
+
+    rate: float
+    burst: float | None = None
+
+
+_RATE_RE = re.compile(r"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[KMG]?)(?:i?B)?(?:/s)?", re.IGNORECASE)
+_UNITS = {"": 1, "K": 1000, "M": 1000**2, "G": 1000**3}
+
+
+def parse_rate(value: str) -> float:
+    """解析 `500K`、`5M`、`1.5MB/s` 等形式的速率,返回字节/秒,单位与进度显示一致按 1000 进位"""
+    if (match := _RATE_RE.fullmatch(value.strip())) is None:
+        raise ValueError(f"Invalid rate: {value}")
+    return float(match.group("value")) * _UNITS[match.group("unit").upper()]
+
+
+@dataclass(frozen=True)
+class RateWindow:
+    """时间段限速,`end` 早于 `start` 时跨越午夜
+
+    Attributes:
+        start: 开始时间
+        end: 结束时间
+        rate: 时间段内的全局速率(字节/秒),0 为不限
+    """
+
+    start: datetime.time
+    end: datetime.time
+    rate: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RateWindow":
+        """解析 `09:00-18:00=5M` 形式的时间段"""
+        period, sep, rate = value.partition("=")
+        start, dash, end = period.partition("-")
+        if not sep or not dash:
+            raise ValueError(f"Invalid schedule: {value}")
+        return cls(
+            datetime.time.fromisoformat(start.strip()), datetime.time.fromisoformat(end.strip()), parse_rate(rate)
+        )
+
+    def contains(self, now: datetime.time) -> bool:
+        if self.start <= self.end:
+            return self.start <= now < self.end
+        return now >= self.start or now < self.end
+
+
+class BandwidthLimiter:
+    """下载带宽限制
+
+    所有文件共用全局速率,每个文件另有单独的速率上限;`schedule` 中当前时间所在时间段的速率覆盖 `rate`.
+    限制可在运行中通过 `set_rate`、`set_file_rate` 和 `set_schedule` 修改,之后读取的数据立即生效.
+
+    Args:
+        rate: 全局速率(字节/秒),0 为不限
+        file_rate: 单文件速率(字节/秒),0 为不限
+        schedule: 时间段限速
+    """
+
+    def __init__(self, rate: float = 0, file_rate: float = 0, schedule: Iterable[RateWindow] = ()) -> None:
+        self.base_rate: float = rate
+        self.file_rate: float = file_rate
+        self.schedule: list[RateWindow] = list(schedule)
+        self._bucket: TokenBucket | None = None
+        self._checked: float = 0.0
+        self._rate: float = rate
+        self._update()
+
+    @property
+    def rate(self) -> float:
+        """当前生效的全局速率,0 为不限"""
+        return self._rate
+
+    def refresh(self):
+        """重新计算当前时间段的速率,每秒最多计算一次"""
+        if time.monotonic() - self._checked >= 1:
+            self._update()
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.rate or self.file_rate)
+
+    def set_rate(self, rate: float):
+        self.base_rate = rate
+        self._update()
+
+    def set_file_rate(self, rate: float):
+        self.file_rate = rate
+
+    def set_schedule(self, schedule: Iterable[RateWindow]):
+        self.schedule = list(schedule)
+        self._update()
+
+    def _update(self):
+        self._checked = time.monotonic()
+        now = datetime.datetime.now().time()
+        self._rate = next((window.rate for window in self.schedule if window.contains(now)), self.base_rate)
+        if not self._rate:
+            self._bucket = None
+        elif self._bucket is None:
+            self._bucket = TokenBucket(self._rate)
+        elif self._bucket.rate != self._rate:
+            self._bucket.set_rate(self._rate)
+
+    def file_bucket(self) -> TokenBucket:
+        """单个文件的令牌桶,速率在每次 `acquire` 时与 `file_rate` 同步"""
+        return TokenBucket(self.file_rate or 1)
+
+    async def acquire(self, size: int, bucket: TokenBucket | None = None):
+        """等待 `size` 字节的配额"""
+        self.refresh()
+        delay = 0.0
+        if self.rate and self._bucket is not None:
+            delay = self._bucket.reserve(size)
+        if bucket is not None and self.file_rate:
+            if bucket.rate != self.file_rate:
+                bucket.set_rate(self.file_rate)
+            delay = max(delay, bucket.reserve(size))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def to_dict(self) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        self.refresh()
+        return {
+            "rate": self.rate,
+            "base_rate": self.base_rate,
+            "file_rate": self.file_rate,
+            "schedule": [
+                {
+                    "start": window.start.isoformat("minutes"),
+                    "end": window.end.isoformat("minutes"),
+                    "rate": window.rate,
+                }
+                for window in self.schedule
+            ],
+        }
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """为请求添加限速、重试退避和熔断的传输层
+
+    所有请求先获取全局令牌,再获取所属主机的令牌;API 主机与 CDN 主机使用不同的限速配置,
+    每个主机独立计数熔断.响应为 429/5xx 或连接失败时按带抖动的指数退避重试,优先使用 `Retry-After`.
+
+    Args:
+        transport: 实际发送请求的传输层
+        global_limit: 全局限速
+        api_limit: API 主机限速
+        cdn_limit: CDN 主机限速
+        max_retries: 最大重试次数
+        backoff_base: 退避基础时间(秒)
+        backoff_max: 单次退避最长时间(秒)
+        failure_threshold: 触发熔断的连续失败次数
+        reset_timeout: 熔断持续时间(秒)
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        *,
+        global_limit: HostLimit | None = None,
+        api_limit: HostLimit | None = None,
+        cdn_limit: HostLimit | None = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ) -> None:
+        self.transport: httpx.AsyncBaseTransport = transport
+        global_limit = global_limit or HostLimit(100, 200)
+        self.api_limit: HostLimit = api_limit or HostLimit(20, 40)
+        self.cdn_limit: HostLimit = cdn_limit or HostLimit(50, 100)
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_max: float = backoff_max
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+        self._global: TokenBucket = TokenBucket(global_limit.rate, global_limit.burst)
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    @staticmethod
+    def is_api_host(host: str) -> bool:
+        return host.endswith(API_HOST_SUFFIXES)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        if (bucket := self._buckets.get(host)) is None:
+            limit = self.api_limit if self.is_api_host(host) else self.cdn_limit
+            bucket = self._buckets[host] = TokenBucket(limit.rate, limit.burst)
+        return bucket
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        if (breaker := self._breakers.get(host)) is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def _backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        retry_after: str = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))  # pyright: ignore[reportAny]
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        breaker = self._breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host}", request=request)
+            # 熔断中仍被放行的请求是试探请求
+            probe = breaker.is_open
+            try:
+                await self._global.acquire()
+                await self._bucket(host).acquire()
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # 试探请求被取消时没有记录结果,需要放弃试探,否则之后的请求一直被拒绝
+                if probe:
+                    breaker.release()
+                raise
+
+            if response.status_code not in RETRY_STATUS:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt >= self.max_retries:
+                return response
+            delay = self._backoff(attempt, response)
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @override
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,96 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncGenerator, Hashable
+from contextlib import asynccontextmanager
+
+
+class FairScheduler:
+    """按任务公平分配下载槽位
+
+    每个任务有独立的等待队列. 槽位空出时先选择优先级最高的任务,同优先级的任务中选择最久未获得槽位的,
+    因此新加入的任务不必等待大合集已排队的歌曲,多个合集轮流下载;仍相同时选择等待歌曲最少的任务.
+
+    Args:
+        slots: 同时下载的文件数
+    """
+
+    def __init__(self, slots: int) -> None:
+        if slots < 1:
+            raise ValueError("slots must be >= 1")
+        self.slots: int = slots
+        self._free: int = slots
+        self._waiters: dict[Hashable, deque[asyncio.Future[None]]] = {}
+        self._priorities: dict[Hashable, int] = {}
+        self._served: dict[Hashable, int] = {}
+        self._tick: int = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, key: Hashable, priority: int = 0):
+        """为 `key` 对应的任务获取一个槽位"""
+        if self._free and not self._waiters:
+            self._free -= 1
+            self._mark_served(key)
+            return
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        self._priorities[key] = max(priority, self._priorities.get(key, priority))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分配槽位但等待方被取消,交给下一个任务
+                self.release()
+            else:
+                self._remove(key, future)
+            raise
+
+    def release(self):
+        self._free += 1
+        while self._free and self._waiters:
+            key = min(
+                self._waiters,
+                key=lambda key: (-self._priorities[key], self._served.get(key, 0), len(self._waiters[key])),
+            )
+            future = self._waiters[key].popleft()
+            if not self._waiters[key]:
+                self._forget(key)
+            if future.done():
+                # 等待方已取消,尚未从队列中移除
+                continue
+            self._free -= 1
+            self._mark_served(key)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, priority: int = 0) -> AsyncGenerator[None, None]:
+        await self.acquire(key, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _mark_served(self, key: Hashable):
+        self._tick += 1
+        self._served[key] = self._tick
+        # 只保留最近获得槽位的任务,避免长时间运行时无限增长
+        if len(self._served) > self.slots * 64:
+            for stale in sorted(self._served, key=self._served.__getitem__)[: len(self._served) // 2]:
+                if stale not in self._waiters:
+                    del self._served[stale]
+
+    def _remove(self, key: Hashable, future: asyncio.Future[None]):
+        if (waiters := self._waiters.get(key)) is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            return
+        if not waiters:
+            self._forget(key)
+
+    def _forget(self, key: Hashable):
+        del self._waiters[key]
+        del self._priorities[key]
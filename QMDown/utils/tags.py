@@ -0,0 +1,137 @@
+# mutagen 缺少完整的类型标注
+# pyright: reportUnknownMemberType=false, reportAny=false, reportPrivateImportUsage=false
+import base64
+from dataclasses import dataclass
+from pathlib import Path
+
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import APIC, ID3, TALB, TDRC, TIT2, TPE1, TRCK, USLT, ID3NoHeaderError
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.oggvorbis import OggVorbis
+
+from QMDown.track import Track
+
+# ID3/FLAC 图片类型: 封面(正面)
+_FRONT_COVER = 3
+
+
+@dataclass(slots=True)
+class TrackTags:
+    title: str
+    artists: list[str]
+    album: str = ""
+    track_number: int | None = None
+    date: str = ""
+    lyric: str = ""
+    cover: bytes | None = None
+
+    @classmethod
+    def from_track(cls, track: Track) -> "TrackTags":
+        """从提取器返回的歌曲信息构建标签"""
+        return cls(
+            title=track.title,
+            artists=list(track.singers),
+            album=track.album,
+            track_number=track.track_number or None,
+            date=track.date,
+        )
+
+    @property
+    def cover_mime(self) -> str:
+        return "image/png" if self.cover and self.cover.startswith(b"\x89PNG") else "image/jpeg"
+
+
+def _embed_id3(path: Path, tags: TrackTags):
+    try:
+        id3 = ID3(path)
+    except ID3NoHeaderError:
+        id3 = ID3()
+    id3.add(TIT2(encoding=3, text=tags.title))
+    id3.add(TPE1(encoding=3, text=tags.artists))
+    if tags.album:
+        id3.add(TALB(encoding=3, text=tags.album))
+    if tags.track_number:
+        id3.add(TRCK(encoding=3, text=str(tags.track_number)))
+    if tags.date:
+        id3.add(TDRC(encoding=3, text=tags.date))
+    if tags.lyric:
+        id3.setall("USLT", [USLT(encoding=3, lang="chi", desc="", text=tags.lyric)])
+    if tags.cover:
+        id3.setall("APIC", [APIC(encoding=3, mime=tags.cover_mime, type=_FRONT_COVER, desc="", data=tags.cover)])
+    id3.save(path)
+
+
+def _vorbis_comments(tags: TrackTags) -> dict[str, list[str]]:
+    comments = {"title": [tags.title], "artist": tags.artists}
+    if tags.album:
+        comments["album"] = [tags.album]
+    if tags.track_number:
+        comments["tracknumber"] = [str(tags.track_number)]
+    if tags.date:
+        comments["date"] = [tags.date]
+    if tags.lyric:
+        comments["lyrics"] = [tags.lyric]
+    return comments
+
+
+def _picture(tags: TrackTags) -> Picture:
+    picture = Picture()
+    picture.type = _FRONT_COVER
+    picture.mime = tags.cover_mime
+    picture.data = tags.cover
+    return picture
+
+
+def _embed_flac(path: Path, tags: TrackTags):
+    audio = FLAC(path)
+    audio.update(_vorbis_comments(tags))
+    if tags.cover:
+        audio.clear_pictures()
+        audio.add_picture(_picture(tags))
+    audio.save()
+
+
+def _embed_ogg(path: Path, tags: TrackTags):
+    audio = OggVorbis(path)
+    audio.update(_vorbis_comments(tags))
+    if tags.cover:
+        audio["metadata_block_picture"] = [base64.b64encode(_picture(tags).write()).decode("ascii")]
+    audio.save()
+
+
+def _embed_mp4(path: Path, tags: TrackTags):
+    audio = MP4(path)
+    if audio.tags is None:
+        audio.add_tags()
+    if (mp4_tags := audio.tags) is None:
+        raise ValueError(f"Failed to add MP4 tags: {path.name}")
+    mp4_tags["\xa9nam"] = [tags.title]
+    mp4_tags["\xa9ART"] = tags.artists
+    if tags.album:
+        mp4_tags["\xa9alb"] = [tags.album]
+    if tags.track_number:
+        mp4_tags["trkn"] = [(tags.track_number, 0)]
+    if tags.date:
+        mp4_tags["\xa9day"] = [tags.date]
+    if tags.lyric:
+        mp4_tags["\xa9lyr"] = [tags.lyric]
+    if tags.cover:
+        image_format = MP4Cover.FORMAT_PNG if tags.cover_mime == "image/png" else MP4Cover.FORMAT_JPEG
+        mp4_tags["covr"] = [MP4Cover(tags.cover, imageformat=image_format)]
+    audio.save()
+
+
+_EMBEDDERS = {
+    ".mp3": _embed_id3,
+    ".flac": _embed_flac,
+    ".ogg": _embed_ogg,
+    ".m4a": _embed_mp4,
+}
+
+
+def embed_tags(path: Path, tags: TrackTags, suffix: str | None = None) -> bool:
+    """写入标签、封面和歌词,返回是否支持该文件格式;`suffix` 用于判断格式,默认取 `path` 的后缀"""
+    if (embed := _EMBEDDERS.get((suffix or path.suffix).lower())) is None:
+        return False
+    embed(path, tags)
+    return True
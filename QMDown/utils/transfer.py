@@ -0,0 +1,403 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import aiofiles
+import httpx
+from rich.progress import TaskID
+
+from QMDown.utils.progress import DownloadProgress
+from QMDown.utils.ratelimit import BandwidthLimiter, TokenBucket
+from QMDown.utils.writer import DiskWriter, WriterFile, get_default_writer
+
+CHUNK_SIZE = 64 * 1024
+SEGMENT_SIZE = 4 * 1024 * 1024
+# 断点记录最短保存间隔(秒)
+JOURNAL_INTERVAL = 1.0
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+|\*)")
+
+
+@dataclass(frozen=True)
+class Segment:
+    """文件字节区间 `[start, end]`"""
+
+    start: int
+    end: int
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    @property
+    def header(self) -> str:
+        return f"bytes={self.start}-{self.end}"
+
+
+def split_segments(size: int, segment_size: int = SEGMENT_SIZE) -> list[Segment]:
+    """将文件按 `segment_size` 切分为连续区间"""
+    return [Segment(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+def parse_content_range(value: str) -> tuple[Segment, int | None]:
+    """解析 `Content-Range` 响应头,返回区间和文件总大小"""
+    match = _CONTENT_RANGE_RE.fullmatch(value.strip())
+    if not match:
+        raise ValueError(f"Invalid Content-Range: {value}")
+    size = match.group("size")
+    return Segment(int(match.group("start")), int(match.group("end"))), None if size == "*" else int(size)
+
+
+@dataclass
+class TransferJournal:
+    """未完成文件的断点记录
+
+    以 `<path>.part.json` 保存在 `.part` 文件旁,记录文件大小、ETag 以及已写入的区间.
+    """
+
+    size: int
+    etag: str | None = None
+    done: list[Segment] = field(default_factory=list)
+
+    @property
+    def completed(self) -> int:
+        return sum(seg.length for seg in self.done)
+
+    @property
+    def finished(self) -> bool:
+        return self.size == 0 or self.done == [Segment(0, self.size - 1)]
+
+    def add(self, start: int, end: int):
+        """记录已写入区间,合并相邻或重叠的区间"""
+        merged: list[Segment] = []
+        for seg in self.done:
+            if seg.end + 1 < start or seg.start > end + 1:
+                merged.append(seg)
+            else:
+                start, end = min(start, seg.start), max(end, seg.end)
+        merged.append(Segment(start, end))
+        merged.sort(key=lambda seg: seg.start)
+        self.done = merged
+
+    def missing(self, segment_size: int = SEGMENT_SIZE) -> list[Segment]:
+        """未写入的区间,按 `segment_size` 切分"""
+        gaps: list[Segment] = []
+        offset = 0
+        for seg in [*self.done, Segment(self.size, self.size)]:
+            if seg.start > offset:
+                gaps.append(Segment(offset, seg.start - 1))
+            offset = max(offset, seg.end + 1)
+        return [
+            Segment(start, min(start + segment_size - 1, gap.end))
+            for gap in gaps
+            for start in range(gap.start, gap.end + 1, segment_size)
+        ]
+
+    @classmethod
+    def load(cls, path: Path) -> "TransferJournal | None":
+        try:
+            data: dict[str, Any] = json.loads(path.read_text("utf-8"))  # pyright: ignore[reportAny, reportExplicitAny]
+            done: list[tuple[int, int]] = data["done"]  # pyright: ignore[reportAny]
+            etag: str | None = data.get("etag")
+            return cls(size=int(data["size"]), etag=etag, done=[Segment(int(start), int(end)) for start, end in done])  # pyright: ignore[reportAny]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def dumps(self) -> str:
+        return json.dumps({"size": self.size, "etag": self.etag, "done": [[seg.start, seg.end] for seg in self.done]})
+
+
+class _StaleJournal(Exception):
+    """断点记录与服务器上的文件不一致"""
+
+
+class FileTransfer:
+    """分段并发下载单个文件
+
+    数据经 `writer` 缓冲写入 `<path>.part`,校验完成并调用 `before_commit` 后重命名为 `path`,
+    因此 `path` 只会是完整且已处理(如写入标签)的文件.
+    首个分段请求同时用于探测服务器是否支持 Range:
+    支持时按 `segment_size` 切分剩余区间,最多 `connections` 个请求并发写入预分配文件的对应偏移,
+    已写入区间记录在 `<path>.part.json`,再次下载时只请求缺失的区间;
+    不支持时退化为单连接流式写入.
+
+    Args:
+        client: HTTP 客户端
+        url: 文件链接
+        path: 保存路径
+        connections: 单文件最大并发连接数
+        segment_size: 分段大小
+        chunk_size: 单次读取/写入大小
+        retries: 分段失败重试次数
+        resume: 是否从已有断点记录继续下载
+        progress: 下载进度
+        task_id: 进度任务 ID
+        writer: 磁盘写入器,默认为共享实例
+        limiter: 带宽限制
+        before_commit: 重命名前对 `.part` 文件调用,如写入标签;失败或取消时删除 `.part` 文件和断点记录
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        path: Path,
+        *,
+        connections: int = 4,
+        segment_size: int = SEGMENT_SIZE,
+        chunk_size: int = CHUNK_SIZE,
+        retries: int = 2,
+        resume: bool = True,
+        progress: DownloadProgress | None = None,
+        task_id: TaskID | None = None,
+        writer: DiskWriter | None = None,
+        limiter: BandwidthLimiter | None = None,
+        before_commit: Callable[[Path], Awaitable[None]] | None = None,
+    ) -> None:
+        if connections < 1:
+            raise ValueError("connections must be >= 1")
+        self.client: httpx.AsyncClient = client
+        self.url: str = url
+        self.path: Path = path
+        self.part_path: Path = path.with_name(path.name + ".part")
+        self.journal_path: Path = path.with_name(path.name + ".part.json")
+        self.connections: int = connections
+        self.segment_size: int = segment_size
+        self.chunk_size: int = chunk_size
+        self.retries: int = retries
+        self.resume: bool = resume
+        self.progress: DownloadProgress | None = progress
+        self.task_id: TaskID | None = task_id
+        self.writer: DiskWriter = writer or get_default_writer()
+        self.limiter: BandwidthLimiter | None = limiter
+        self.before_commit: Callable[[Path], Awaitable[None]] | None = before_commit
+        self._bucket: TokenBucket | None = limiter.file_bucket() if limiter is not None else None
+        self.file: WriterFile | None = None
+        self.size: int | None = None
+        self.downloaded: int = 0
+        self.journal: TransferJournal | None = None
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(connections)
+        self._journal_lock: asyncio.Lock = asyncio.Lock()
+        self._journal_saved_at: float = 0.0
+
+    async def run(self) -> int:
+        """执行下载,返回文件大小"""
+        try:
+            try:
+                return await self._run()
+            except _StaleJournal:
+                # 文件已变短,断点记录的缺失区间超出文件大小,从头下载
+                self.resume = False
+                return await self._run()
+        finally:
+            if self.file is not None:
+                self.file.close()
+
+    async def _run(self) -> int:
+        journal = TransferJournal.load(self.journal_path) if self.resume and self.part_path.exists() else None
+        pending = journal.missing(self.segment_size) if journal else []
+        requested = pending[0] if pending else Segment(0, self.segment_size - 1)
+        headers = {"Range": requested.header}
+        if journal and journal.etag:
+            headers["If-Range"] = journal.etag
+
+        async with self._semaphore, self.client.stream("GET", self.url, headers=headers) as resp:
+            if journal is not None and resp.status_code == 416:
+                raise _StaleJournal
+            _ = resp.raise_for_status()
+            if resp.status_code != 206:
+                await self._stream_whole(resp)
+                return self.downloaded
+
+            first, size = parse_content_range(resp.headers["Content-Range"])
+            if size is None:
+                raise ValueError("Unknown file size in Content-Range")
+            etag: str | None = resp.headers.get("ETag")  # pyright: ignore[reportAny]
+            if journal is None or journal.size != size or (journal.etag and etag and journal.etag != etag):
+                journal = TransferJournal(size=size, etag=etag)
+                # 首个响应是旧记录中的缺失区间,其余区间按新文件重新切分
+                pending = TransferJournal(size=size, done=[first]).missing(self.segment_size)
+                requested = first
+                self.file = await self.writer.open(self.part_path, size, truncate=True)
+            else:
+                self.file = await self.writer.open(self.part_path)
+            self.journal = journal
+            self.size = size
+            self.downloaded = journal.completed
+            self._report(total=size, completed=self.downloaded)
+
+            rest = [seg for seg in pending if seg.start > requested.end or seg.end < requested.start]
+            if first.end < requested.end:
+                rest.insert(0, Segment(first.end + 1, requested.end))
+            tasks = [asyncio.create_task(self._fetch(seg)) for seg in rest]
+            try:
+                offset = await self._write_segment(resp, first)
+                if offset <= first.end:
+                    tasks.append(asyncio.create_task(self._fetch(Segment(offset, first.end))))
+            except BaseException:
+                await self._cancel(tasks)
+                raise
+        try:
+            _ = await asyncio.gather(*tasks)
+        finally:
+            await self._cancel(tasks)
+        await self._finish()
+        return size
+
+    async def _cancel(self, tasks: list[asyncio.Task[None]]):
+        """取消未完成的分段并保存断点记录"""
+        for task in tasks:
+            _ = task.cancel()
+        _ = await asyncio.gather(*tasks, return_exceptions=True)
+        await self._save_journal()
+
+    async def _finish(self):
+        """校验写入区间和文件大小后将 `.part` 文件重命名为目标文件"""
+        journal = self.journal
+        if journal is None:
+            raise RuntimeError("Transfer not started")
+        if not journal.finished:
+            raise OSError(f"Incomplete download: {journal.completed}/{journal.size} bytes")
+        if (actual := self.part_path.stat().st_size) != journal.size:
+            self.part_path.unlink(missing_ok=True)
+            self.journal_path.unlink(missing_ok=True)
+            raise OSError(f"Size mismatch: {actual}/{journal.size} bytes")
+        if self.file is None:
+            raise RuntimeError("Transfer not started")
+        await self._commit(self.file)
+        self.journal_path.unlink(missing_ok=True)
+
+    async def _commit(self, file: WriterFile):
+        """调用 `before_commit` 后将 `.part` 文件重命名为目标文件"""
+        if self.before_commit is not None:
+            try:
+                await self.before_commit(self.part_path)
+            except BaseException:
+                # 文件可能已被部分改写,与断点记录不再一致
+                file.close()
+                self.part_path.unlink(missing_ok=True)
+                self.journal_path.unlink(missing_ok=True)
+                raise
+        await self.writer.commit(file, self.path)
+
+    async def _save_journal(self, force: bool = True):
+        if self.journal is None or self.journal.finished:
+            return
+        now = time.monotonic()
+        if not force and now - self._journal_saved_at < JOURNAL_INTERVAL:
+            return
+        self._journal_saved_at = now
+        async with self._journal_lock:
+            tmp = self.journal_path.with_name(self.journal_path.name + ".tmp")
+            async with aiofiles.open(tmp, "w", encoding="utf-8") as f:
+                _ = await f.write(self.journal.dumps())
+            os.replace(tmp, self.journal_path)
+
+    async def _stream_whole(self, resp: httpx.Response):
+        """服务器不支持 Range 时单连接下载,不记录断点"""
+        size: str | None = resp.headers.get("Content-Length")  # pyright: ignore[reportAny]
+        self.size = int(size) if size is not None else None
+        self.journal_path.unlink(missing_ok=True)
+        self._report(total=self.size, completed=0)
+        self.file = file = await self.writer.open(self.part_path, self.size, truncate=True)
+        try:
+            stream = file.stream()
+            async for chunk in resp.aiter_bytes(self.chunk_size):
+                await stream.write(chunk)
+                self._advance(len(chunk))
+                await self._throttle(len(chunk))
+            await stream.flush()
+            if self.size is not None and self.downloaded != self.size:
+                raise OSError(f"Incomplete download: {self.downloaded}/{self.size} bytes")
+        except BaseException:
+            file.close()
+            self.part_path.unlink(missing_ok=True)
+            raise
+        await self._commit(file)
+
+    async def _fetch(self, segment: Segment):
+        for _ in range(self.retries + 1):
+            try:
+                async with (
+                    self._semaphore,
+                    self.client.stream("GET", self.url, headers={"Range": segment.header}) as resp,
+                ):
+                    if resp.status_code != 206:
+                        raise httpx.HTTPStatusError(
+                            f"Range request failed with status {resp.status_code}",
+                            request=resp.request,
+                            response=resp,
+                        )
+                    if not self._range_matches(resp, segment):
+                        # 代理或 CDN 返回了其他区间,写入对应偏移会损坏文件
+                        continue
+                    offset = await self._write_segment(resp, segment)
+            except httpx.TransportError:
+                continue
+            if offset > segment.end:
+                await self._save_journal(force=False)
+                return
+            segment = Segment(offset, segment.end)
+        raise httpx.ReadError(f"Failed to fetch {self.url} ({segment.header})")
+
+    def _range_matches(self, resp: httpx.Response, segment: Segment) -> bool:
+        """响应区间是否从 `segment.start` 开始且不超出 `segment`,文件大小是否与首个响应一致"""
+        try:
+            returned, size = parse_content_range(resp.headers.get("Content-Range", ""))  # pyright: ignore[reportAny]
+        except ValueError:
+            return False
+        return (
+            returned.start == segment.start
+            and returned.end <= segment.end
+            and (size is None or self.size is None or size == self.size)
+        )
+
+    async def _write_segment(self, resp: httpx.Response, segment: Segment) -> int:
+        """写入区间数据,返回写入后的偏移;连接中断时提前返回
+
+        断点记录只包含已写出缓冲区的部分.
+        """
+        if self.file is None:
+            raise RuntimeError("Transfer not started")
+        stream = self.file.stream(segment.start)
+        try:
+            async for chunk in resp.aiter_bytes(self.chunk_size):
+                chunk = chunk[: segment.end + 1 - stream.offset]
+                if not chunk:
+                    break
+                written = stream.written
+                await stream.write(chunk)
+                if stream.written > written:
+                    self._record(segment.start, stream.written)
+                self._advance(len(chunk))
+                await self._throttle(len(chunk))
+        except httpx.TransportError:
+            pass
+        finally:
+            await stream.flush()
+            self._record(segment.start, stream.written)
+        return stream.written
+
+    def _record(self, start: int, end: int):
+        """记录 `[start, end)` 已写入"""
+        if self.journal is not None and end > start:
+            self.journal.add(start, end - 1)
+
+    def _report(self, total: int | None, completed: int | None = None):
+        if self.progress is not None and self.task_id is not None:
+            self.progress.update(self.task_id, total=total, completed=completed)
+
+    async def _throttle(self, n: int):
+        if self.limiter is not None:
+            await self.limiter.acquire(n, self._bucket)
+
+    def _advance(self, n: int):
+        self.downloaded += n
+        if self.progress is not None and self.task_id is not None:
+            self.progress.update(self.task_id, advance=n)
@@ -0,0 +1,247 @@
+"""下载文件的磁盘写入"""
+
+import asyncio
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Literal, TypeVar
+
+from QMDown.utils.metrics import span
+
+R = TypeVar("R")
+
+FsyncPolicy = Literal["never", "file", "batch"]
+
+BUFFER_SIZE = 1024 * 1024
+# 缓冲区写出时按该大小对齐文件偏移
+ALIGNMENT = 4096
+
+
+def _open_flags(truncate: bool) -> int:
+    flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+    return flags | os.O_TRUNC if truncate else flags
+
+
+def _fsync_path(path: Path, directory: bool = False):
+    """重新打开文件或目录并 fsync,不支持目录 fsync 的平台忽略目录"""
+    if directory and not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | (os.O_DIRECTORY if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriterFile:
+    """已打开的文件,各写入流以 `pwrite` 写入各自的偏移"""
+
+    def __init__(self, writer: "DiskWriter", path: Path, fd: int) -> None:
+        self.writer: DiskWriter = writer
+        self.path: Path = path
+        self.fd: int = fd
+        # 没有 pwrite 的平台(Windows)需要 lseek + write,以锁保证原子性
+        self._lock: threading.Lock | None = None if hasattr(os, "pwrite") else threading.Lock()
+
+    def stream(self, offset: int = 0) -> "WriteStream":
+        return WriteStream(self, offset)
+
+    def pwrite(self, data: bytes | bytearray, offset: int):
+        """在线程池中调用"""
+        view = memoryview(data)
+        while view:
+            if self._lock is None:
+                n = os.pwrite(self.fd, view, offset)
+            else:
+                with self._lock:
+                    _ = os.lseek(self.fd, offset, os.SEEK_SET)
+                    n = os.write(self.fd, view)
+            view = view[n:]
+            offset += n
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WriteStream:
+    """从 `offset` 开始顺序写入,数据在内存中累积到缓冲区大小后再写出
+
+    `written` 之前的数据已交给操作系统,断点记录只应包含这部分区间.
+    """
+
+    def __init__(self, file: WriterFile, offset: int) -> None:
+        self.file: WriterFile = file
+        self.written: int = offset
+        self._buffer: bytearray = bytearray()
+
+    @property
+    def offset(self) -> int:
+        """已接收数据的结束偏移"""
+        return self.written + len(self._buffer)
+
+    async def write(self, data: bytes):
+        self._buffer += data
+        buffer_size = self.file.writer.buffer_size
+        if len(self._buffer) < buffer_size:
+            return
+        # 只写出到对齐边界,余下部分留在缓冲区
+        size = (self.offset // ALIGNMENT * ALIGNMENT) - self.written
+        await self._write_out(size if size >= buffer_size // 2 else len(self._buffer))
+
+    async def flush(self):
+        if self._buffer:
+            await self._write_out(len(self._buffer))
+
+    async def _write_out(self, size: int):
+        data = self._buffer[:size]
+        del self._buffer[:size]
+        with span("write"):
+            await self.file.writer.run(self.file.pwrite, data, self.written)
+        self.written += size
+        self.file.writer.bytes_written += size
+
+
+class DiskWriter:
+    """下载文件的写入子系统
+
+    所有文件共用一个小线程池,写入和 fsync 都不在事件循环中执行.
+    新文件用 `posix_fallocate` 预分配空间,不支持时退化为 `ftruncate`;
+    数据写入临时文件,完成后由调用方通过 `commit` 原子重命名为目标文件.
+
+    fsync 策略:
+        - `never`: 不调用 fsync,由操作系统决定何时落盘
+        - `file`: 每个文件重命名前 fsync 文件,重命名后 fsync 所在目录
+        - `batch`: 立即重命名,完成的文件累积到 `batch_size` 个或 `batch_interval` 秒后统一 fsync;
+          崩溃时最近一批文件可能不完整
+
+    Args:
+        workers: 写入线程数
+        buffer_size: 每个写入流的缓冲区大小
+        fsync: fsync 策略
+        batch_size: `batch` 策略下每批的文件数
+        batch_interval: `batch` 策略下的最长等待时间(秒)
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        buffer_size: int = BUFFER_SIZE,
+        fsync: FsyncPolicy = "never",
+        batch_size: int = 32,
+        batch_interval: float = 5.0,
+    ) -> None:
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be >= 1")
+        self.workers: int = workers
+        self.buffer_size: int = buffer_size
+        self.fsync: FsyncPolicy = fsync
+        self.batch_size: int = batch_size
+        self.batch_interval: float = batch_interval
+        self.bytes_written: int = 0
+        self.fsyncs: int = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._unsynced: list[Path] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def run(self, func: Callable[..., R], *args: Any) -> R:  # pyright: ignore[reportExplicitAny, reportAny]
+        """在写入线程池中执行"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="writer")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self, path: Path, size: int | None = None, truncate: bool = False) -> WriterFile:
+        """打开文件,给出 `size` 时预分配空间"""
+        fd: int = await self.run(os.open, path, _open_flags(truncate), 0o644)
+        file = WriterFile(self, path, fd)
+        if size:
+            try:
+                await self.run(self._preallocate, fd, size)
+            except BaseException:
+                file.close()
+                raise
+        return file
+
+    @staticmethod
+    def _preallocate(fd: int, size: int):
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError:
+                # 部分文件系统(如网络存储)不支持
+                pass
+        os.ftruncate(fd, size)
+
+    async def commit(self, file: WriterFile, target: Path):
+        """关闭文件并按 fsync 策略重命名为 `target`"""
+        try:
+            if self.fsync == "file":
+                with span("fsync"):
+                    await self.run(os.fsync, file.fd)
+                self.fsyncs += 1
+        finally:
+            file.close()
+        with span("write"):
+            await self.run(os.replace, file.path, target)
+        if self.fsync == "file":
+            with span("fsync"):
+                await self.run(_fsync_path, target.parent, True)
+        elif self.fsync == "batch":
+            self._unsynced.append(target)
+            if len(self._unsynced) >= self.batch_size:
+                self._schedule_sync()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.batch_interval, self._schedule_sync)
+
+    def _schedule_sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._unsynced:
+            return
+        task = asyncio.create_task(self._sync(self._unsynced))
+        self._unsynced = []
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _sync(self, paths: list[Path]):
+        def sync():
+            for path in paths:
+                try:
+                    _fsync_path(path)
+                except OSError:
+                    # 文件可能已被移动或删除
+                    continue
+            for directory in {path.parent for path in paths}:
+                try:
+                    _fsync_path(directory, directory=True)
+                except OSError:
+                    continue
+
+        with span("fsync"):
+            await self.run(sync)
+        self.fsyncs += len(paths)
+
+    async def close(self):
+        """完成待处理的 fsync 并关闭线程池"""
+        self._schedule_sync()
+        _ = await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_default_writer: DiskWriter | None = None
+
+
+def get_default_writer() -> DiskWriter:
+    """未指定写入器时使用的共享实例"""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = DiskWriter()
+    return _default_writer
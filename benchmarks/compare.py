@@ -0,0 +1,44 @@
+"""对比两次基准测试结果,吞吐下降或延迟上升超过阈值时以非零状态退出
+
+用法: python benchmarks/compare.py <基准.json> <当前.json> [阈值,默认 0.1]
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# 指标 -> 数值越大越好
+METRICS = {
+    "tracks_per_sec": True,
+    "mb_per_sec": True,
+    "latency_p50": False,
+    "latency_p99": False,
+    "peak_rss_mb": False,
+}
+
+
+def load(path: str) -> dict[str, dict[str, float]]:
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {workload["name"]: workload for workload in report["workloads"]}
+
+
+def main(baseline_path: str, current_path: str, threshold: float = 0.1) -> int:
+    baseline, current = load(baseline_path), load(current_path)
+    regressions = 0
+    for name in baseline.keys() & current.keys():
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[name].get(metric), current[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = -change > threshold if higher_is_better else change > threshold
+            regressions += regressed
+            print(f"{'!' if regressed else ' '} {name:<10} {metric:<15} {old:>10.3f} -> {new:>10.3f} ({change:+.1%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1], sys.argv[2], *map(float, sys.argv[3:4])))
@@ -0,0 +1,25 @@
+"""运行基准测试并将结果保存到 `benchmarks/results/<版本>.json`
+
+用法: python benchmarks/run.py [工作负载...]
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from QMDown.bench.runner import report_to_dict, run_bench
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+async def main(workloads: list[str]):
+    report = report_to_dict(await run_bench(workloads or None))
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{report['version']}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已保存到 {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
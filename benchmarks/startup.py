@@ -0,0 +1,58 @@
+"""启动导入回归检查
+
+在子进程中运行 `QMDown --version`,启动时导入了下载相关的模块时以非零状态退出;
+同时输出多次运行的耗时中位数供参考,耗时受机器负载影响,不作为检查条件.
+
+用法: python benchmarks/startup.py
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 10
+
+# 不应在启动时导入的模块,包含其子模块
+LAZY_MODULES = ("qqmusic_api", "httpx", "rich_pyfiglet", "mutagen", "aiofiles", "QMDown.downloader", "QMDown.api")
+
+# 运行 `QMDown --version` 并在退出时将已导入的模块写到标准错误
+_LIST_MODULES = (
+    "import atexit, sys\n"
+    "atexit.register(lambda: sys.stderr.write('\\n'.join(sys.modules)))\n"
+    "sys.argv = ['QMDown', '--version']\n"
+    "from QMDown.__main__ import main\n"
+    "main()\n"
+)
+
+
+def measure() -> float:
+    subprocess.run([sys.executable, "-m", "QMDown", "--version"], check=True, capture_output=True)
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "QMDown", "--version"], check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def is_lazy(name: str) -> bool:
+    return any(name == module or name.startswith(module + ".") for module in LAZY_MODULES)
+
+
+def eager_modules() -> list[str]:
+    """`QMDown --version` 导入的、应延迟导入的模块"""
+    result = subprocess.run([sys.executable, "-c", _LIST_MODULES], check=True, capture_output=True, text=True)
+    return sorted(name for name in result.stderr.split() if is_lazy(name))
+
+
+def main() -> int:
+    eager = eager_modules()
+    print(f"QMDown --version: {measure() * 1000:.0f} ms")
+    if eager:
+        print("启动时导入了以下模块:", ", ".join(eager))
+    return 1 if eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
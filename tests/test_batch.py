@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from QMDown.utils.batch import Batcher
+
+
+async def upper(keys: list[str]) -> dict[str, str]:
+    if "boom" in keys:
+        raise RuntimeError("boom")
+    return {key: key.upper() for key in keys if key != "missing"}
+
+
+def test_coalesce():
+    calls: list[list[str]] = []
+
+    async def func(keys: list[str]) -> dict[str, str]:
+        calls.append(keys)
+        return await upper(keys)
+
+    async def run():
+        batcher = Batcher(func)
+        return await asyncio.gather(batcher.get("a"), batcher.get("b"), batcher.get("a"))
+
+    assert asyncio.run(run()) == ["A", "B", "A"]
+    assert calls == [["a", "b"]]
+
+
+def test_missing_key():
+    async def run():
+        batcher = Batcher(upper)
+        many = await batcher.get_many(["a", "missing", "b"])
+        with pytest.raises(KeyError):
+            await batcher.get("missing")
+        return many
+
+    assert asyncio.run(run()) == {"a": "A", "b": "B"}
+
+
+def test_batch_error():
+    async def run():
+        await Batcher(upper, max_size=2).get_many(["a", "b", "boom", "c"])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+def test_batch_cancelled():
+    started = asyncio.Event()
+
+    async def func(keys: list[str]) -> dict[str, str]:
+        started.set()
+        await asyncio.sleep(10)
+        return {}
+
+    async def run():
+        batcher = Batcher(func)
+        one = asyncio.create_task(batcher.get("a"))
+        many = asyncio.create_task(batcher.get_many(["a", "b"]))
+        await started.wait()
+        for task in batcher._tasks:  # pyright: ignore[reportPrivateUsage]
+            _ = task.cancel()
+        results = await asyncio.wait_for(asyncio.gather(one, many, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert not batcher._inflight  # pyright: ignore[reportPrivateUsage]
+
+    asyncio.run(run())
@@ -0,0 +1,31 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from QMDown.api import cache
+from QMDown.api.cache import SQLiteCache
+
+
+def test_get_many(tmp_path: Path):
+    disk = SQLiteCache(tmp_path / "cache.sqlite3")
+    expires = time.time() + 60
+    disk.set_many({f"k{i}": {"i": i} for i in range(10)}, expires)
+    disk.set("old", 1, time.time() - 1)
+    result = disk.get_many(["k1", "k3", "missing", "old", "k3"])
+    assert result == {"k1": ({"i": 1}, expires), "k3": ({"i": 3}, expires)}
+    assert disk.get("old") == (False, None, 0)
+    disk.close()
+
+
+def test_get_many_batches_statements(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(cache, "MAX_VARIABLES", 100)
+    disk = SQLiteCache(tmp_path / "cache.sqlite3")
+    disk.set_many({f"k{i}": i for i in range(300)}, time.time() + 60)
+    statements: list[str] = []
+    disk._conn.set_trace_callback(statements.append)  # pyright: ignore[reportPrivateUsage]
+    result = disk.get_many([f"k{i}" for i in range(300)])
+    assert len(result) == 300
+    # 每块一次 SELECT,UPDATE 由 executemany 执行
+    assert sum(statement.startswith("SELECT") for statement in statements) == 3
+    disk.close()
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from qqmusic_api.song import SongFileType
+
+from QMDown.utils.library import LibraryIndex
+
+
+def add_file(index: LibraryIndex, mid: str, quality: SongFileType) -> Path:
+    path = index.root / f"{mid}{quality.e}"
+    path.write_bytes(b"data")
+    index.add(mid, quality, path, 4)
+    return path
+
+
+def test_find_quality(tmp_path: Path):
+    with LibraryIndex(tmp_path) as index:
+        ogg = add_file(index, "ogg", SongFileType.OGG_96)
+        flac = add_file(index, "flac", SongFileType.FLAC)
+        atmos = add_file(index, "atmos", SongFileType.ATMOS_2)
+        # 低码率的 OGG 不能满足 MP3 320
+        assert index.find("ogg", SongFileType.MP3_320) is None
+        assert index.find("ogg", SongFileType.MP3_128) is None
+        assert index.find("ogg", SongFileType.ACC_96) == ogg
+        assert index.find("flac", SongFileType.ATMOS_51) == flac
+        assert index.find("flac", SongFileType.MASTER) is None
+        assert index.find("atmos", SongFileType.FLAC) is None
+        assert index.find("atmos", SongFileType.OGG_640) == atmos
+        assert index.find("missing", SongFileType.MP3_128) is None
+
+
+def test_reload(tmp_path: Path):
+    with LibraryIndex(tmp_path) as index:
+        path = add_file(index, "mid", SongFileType.MP3_320)
+    with LibraryIndex(tmp_path) as index:
+        assert index.find("mid", SongFileType.OGG_320) == path
+        path.unlink()
+        assert index.find("mid", SongFileType.MP3_128) is None
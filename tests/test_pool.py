@@ -0,0 +1,116 @@
+import asyncio
+from collections import Counter
+from typing import Any, ClassVar, cast
+
+import pytest
+from qqmusic_api import Session, get_session
+from qqmusic_api.exceptions import ResponseCodeError
+
+from QMDown.api import pool, song
+from QMDown.api.pool import QUOTA_CODES, CredentialPool, pooled
+
+
+class FakeSession:
+    def __init__(self, name: str, quota: int = 0):
+        self.name = name
+        self.quota = quota
+        """可用请求数,超出后返回配额耗尽的响应码,0 为不限"""
+        self.calls = 0
+
+
+def make_pool(*sessions: FakeSession, **kwargs: Any) -> CredentialPool:
+    # 假会话只实现测试用到的属性,经 object 转换以通过类型检查
+    return CredentialPool({s.name: cast(Session, cast(object, s)) for s in sessions}, **kwargs)
+
+
+@pooled
+async def fake_api(delay: float = 0) -> str:
+    """按当前上下文的会话模拟接口调用"""
+    session = cast(FakeSession, cast(object, get_session()))
+    session.calls += 1
+    await asyncio.sleep(delay)
+    if session.quota and session.calls > session.quota:
+        raise ResponseCodeError(104400, {}, {"code": 104400})
+    return session.name
+
+
+def run(pool_: CredentialPool, coro_factory, n: int, concurrent: bool = True) -> list[Any]:
+    async def call():
+        try:
+            return await coro_factory()
+        except ResponseCodeError as e:
+            return e
+
+    async def main():
+        pool.set_pool(pool_)
+        try:
+            if concurrent:
+                return await asyncio.gather(*(call() for _ in range(n)))
+            return [await call() for _ in range(n)]
+        finally:
+            pool.set_pool(None)
+
+    return asyncio.run(main())
+
+
+def test_default_evicts_quota_codes():
+    assert make_pool(FakeSession("a")).evict_codes == QUOTA_CODES
+
+
+def test_round_robin_spreads_calls():
+    a, b, c = FakeSession("a"), FakeSession("b"), FakeSession("c")
+    results = run(make_pool(a, b, c, strategy="round_robin"), fake_api, 9)
+    assert Counter(results) == {"a": 3, "b": 3, "c": 3}
+
+
+def test_least_loaded_spreads_concurrent_calls():
+    a, b = FakeSession("a"), FakeSession("b")
+    results = run(make_pool(a, b), lambda: fake_api(0.01), 10)
+    assert Counter(results) == {"a": 5, "b": 5}
+
+
+def test_quota_response_evicts_account():
+    a, b = FakeSession("a", quota=2), FakeSession("b")
+    pool_ = make_pool(a, b, strategy="round_robin")
+    results = run(pool_, fake_api, 10, concurrent=False)
+    errors = [r for r in results if isinstance(r, ResponseCodeError)]
+    # a 超出配额后被剔除,其余请求都由 b 处理
+    assert len(errors) == 1
+    assert a.calls == 3
+    assert results.count("b") == 7
+    assert {s["name"]: s["evicted"] for s in pool_.stats()} == {"a": True, "b": False}
+
+
+def test_other_codes_do_not_evict():
+    a, b = FakeSession("a"), FakeSession("b")
+    pool_ = make_pool(a, b)
+    account = pool_.accounts[0]
+
+    async def main():
+        with pytest.raises(ResponseCodeError):
+            async with pool_.use():
+                raise ResponseCodeError(500, {}, {"code": 500})
+
+    asyncio.run(main())
+    assert account.errors == 0
+    assert not pool_.stats()[0]["evicted"]
+
+
+def test_unavailable_cache_bypassed_with_pool(monkeypatch: pytest.MonkeyPatch):
+    class Cache:
+        ttls: ClassVar[dict[str, float]] = {"song.unavailable": 60}
+
+        async def get_many(self, keys: list[str]) -> dict[str, Any]:
+            raise AssertionError("cache used with pool")
+
+        async def set_many(self, items: dict[str, Any], ttl: float):
+            raise AssertionError("cache used with pool")
+
+    async def get_file_urls(mids: list[str], file_type: song.SongFileType) -> dict[str, str]:
+        return dict.fromkeys(mids, "")
+
+    monkeypatch.setattr(song, "get_cache", Cache)
+    monkeypatch.setattr(song, "get_file_urls", get_file_urls)
+    monkeypatch.setattr(pool, "_pool", make_pool(FakeSession("a"), FakeSession("b")))
+    result = asyncio.run(song.resolve_file_urls(["m1", "m2"], [song.SongFileType.MP3_128]))
+    assert result == {"m1": None, "m2": None}
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from QMDown import postprocess
+from QMDown.postprocess import PostProcessor
+from QMDown.track import Track
+from QMDown.utils.tags import TrackTags
+
+
+def test_submit_resolves_after_tagging(monkeypatch: pytest.MonkeyPatch):
+    tagged = threading.Event()
+
+    def embed(path: Path, tags: TrackTags, suffix: str | None):
+        time.sleep(0.05)
+        tagged.set()
+
+    monkeypatch.setattr(postprocess, "embed_tags", embed)
+
+    async def run():
+        processor = PostProcessor(workers=1, cover=False)
+        processor.start()
+        done = await processor.submit(Path("a.mp3"), Track(mid="a", title="a"))
+        assert not done.done()
+        await done
+        assert tagged.is_set()
+        await processor.close()
+
+    asyncio.run(run())
+
+
+def test_cancel_resolves_pending(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(postprocess, "embed_tags", lambda path, tags, suffix: time.sleep(0.05))
+
+    async def run():
+        processor = PostProcessor(workers=1, cover=False)
+        processor.start()
+        futures = [await processor.submit(Path(f"{i}.mp3"), Track(mid=str(i))) for i in range(3)]
+        await processor.cancel()
+        await asyncio.wait_for(asyncio.gather(*futures), 1)
+
+    asyncio.run(run())
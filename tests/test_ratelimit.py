@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import pytest
+
+from QMDown.utils.ratelimit import CircuitOpenError, HostLimit, RateLimitedTransport
+
+URL = "https://cdn.example/file"
+
+
+def make_transport(handler, **kwargs) -> RateLimitedTransport:
+    return RateLimitedTransport(
+        httpx.MockTransport(handler),
+        cdn_limit=HostLimit(1000, 1000),
+        backoff_base=0,
+        **kwargs,
+    )
+
+
+def test_retry_then_success():
+    statuses = iter([503, 503, 200])
+
+    async def run():
+        transport = make_transport(lambda request: httpx.Response(next(statuses)))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return (await client.get(URL)).status_code
+
+    assert asyncio.run(run()) == 200
+
+
+def test_circuit_open():
+    async def run():
+        transport = make_transport(lambda request: httpx.Response(503), max_retries=0, failure_threshold=2)
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(2):
+                assert (await client.get(URL)).status_code == 503
+            with pytest.raises(CircuitOpenError):
+                await client.get(URL)
+
+    asyncio.run(run())
+
+
+def test_cancelled_probe_releases_circuit():
+    async def run():
+        gate = asyncio.Event()
+        fail = True
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if fail:
+                return httpx.Response(503)
+            await gate.wait()
+            return httpx.Response(200)
+
+        transport = make_transport(handler, max_retries=0, failure_threshold=1, reset_timeout=0)
+        async with httpx.AsyncClient(transport=transport) as client:
+            assert (await client.get(URL)).status_code == 503
+            fail = False
+            # 试探请求在得到响应前被取消
+            probe = asyncio.create_task(client.get(URL))
+            await asyncio.sleep(0.01)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            gate.set()
+            assert (await client.get(URL)).status_code == 200
+
+    asyncio.run(run())
@@ -0,0 +1,33 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+
+from QMDown import cli
+from QMDown.extractor import URLRouter
+from QMDown.extractor.album import AlbumExtractor
+from QMDown.extractor.song import SongExtractor
+from QMDown.extractor.songlist import SonglistExtractor
+
+
+def test_match():
+    song, songlist, album = SongExtractor(), SonglistExtractor(), AlbumExtractor()
+    router = URLRouter([song, songlist, album])
+    assert router.match("https://y.qq.com/n/ryqq/playlist/7000") == (songlist, "7000")
+    assert router.match("https://i.y.qq.com/n2/m/share/details/album.html?albumId=42") == (album, "42")
+    assert router.match("https://y.qq.com/n/ryqq/songDetail/M0000000000001") == (song, "M0000000000001")
+    assert router.match("https://example.com/") is None
+
+
+def test_find_urls_bounded(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(cli, "RECENT_URLS", 2)
+
+    async def texts() -> AsyncIterator[str]:
+        for text in ("http://a http://b", "http://a", "http://c", "http://d http://a"):
+            yield text
+
+    async def run():
+        return [url async for url in cli._find_urls(texts())]  # pyright: ignore[reportPrivateUsage]
+
+    # `a` 在记住的最近 2 个 URL 之外后会再次产出
+    assert asyncio.run(run()) == ["http://a", "http://b", "http://c", "http://d", "http://a"]
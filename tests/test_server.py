@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from QMDown import server
+from QMDown.server import Job
+
+
+def collect(job: Job) -> list[dict[str, Any]]:
+    async def run():
+        return [record async for record in job.iter_events()]
+
+    return asyncio.run(run())
+
+
+def test_events_bounded(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(server, "MAX_EVENTS", 10)
+    job = Job("job", ["https://y.qq.com/n/ryqq/toplist/26"])
+    for i in range(100):
+        job.on_event("track", {"status": "downloaded", "title": str(i)})
+    job.on_event("done", {"url": job.urls[0]})
+    assert len(job.events) == 10
+
+    records = collect(job)
+    status, *recent = records
+    assert status["event"] == "status"
+    assert status["dropped"] == 92
+    assert status["tracks"] == {"downloaded": 100}
+    assert [record["event"] for record in recent[-2:]] == ["done", "finished"]
+    assert len(recent) == 10
+
+
+def test_events_replayed_without_status():
+    job = Job("job", ["https://y.qq.com/n/ryqq/toplist/26"])
+    job.on_event("track", {"status": "downloaded", "title": "a"})
+    job.on_event("done", {"url": job.urls[0]})
+    assert [record["event"] for record in collect(job)] == ["track", "done", "finished"]
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, ClassVar
+
+import httpx
+import pytest
+
+from QMDown.api import song
+from QMDown.api.song import SongFileType
+
+TIERS = [SongFileType.FLAC, SongFileType.MP3_320, SongFileType.MP3_128]
+
+
+class Cache:
+    ttls: ClassVar[dict[str, float]] = {"song.unavailable": 60}
+
+    def __init__(self) -> None:
+        self.written: dict[str, Any] = {}
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        return {}
+
+    async def set_many(self, items: dict[str, Any], ttl: float):
+        self.written.update(items)
+
+
+def fake_api(
+    monkeypatch: pytest.MonkeyPatch, urls: dict[SongFileType, dict[str, str]], failures: dict[SongFileType, int]
+):
+    """`failures` 为各音质前几次查询失败的次数"""
+    calls: list[SongFileType] = []
+
+    async def get_file_urls(mids: list[str], file_type: SongFileType) -> dict[str, str]:
+        calls.append(file_type)
+        if failures.get(file_type, 0) > 0:
+            failures[file_type] -= 1
+            raise httpx.ReadTimeout("timeout")
+        return {mid: urls.get(file_type, {}).get(mid, "") for mid in mids}
+
+    cache = Cache()
+    monkeypatch.setattr(song, "get_file_urls", get_file_urls)
+    monkeypatch.setattr(song, "get_cache", lambda: cache)
+    return calls, cache
+
+
+def resolve(mids: list[str]) -> dict[str, tuple[SongFileType, str] | None]:
+    return asyncio.run(song.resolve_file_urls(mids, TIERS))
+
+
+def test_errored_tier_retried(monkeypatch: pytest.MonkeyPatch):
+    urls = {SongFileType.FLAC: {"a": "flac"}, SongFileType.MP3_128: {"a": "mp3"}}
+    calls, _ = fake_api(monkeypatch, urls, {SongFileType.FLAC: 1})
+    assert resolve(["a"]) == {"a": (SongFileType.FLAC, "flac")}
+    assert calls.count(SongFileType.FLAC) == 2
+
+
+def test_errored_tier_not_treated_as_unavailable(monkeypatch: pytest.MonkeyPatch):
+    urls = {SongFileType.FLAC: {"a": "flac"}, SongFileType.MP3_128: {"a": "mp3"}}
+    _, cache = fake_api(monkeypatch, urls, {SongFileType.FLAC: 2})
+    with pytest.raises(httpx.ReadTimeout):
+        _ = resolve(["a"])
+    # 查询失败的音质不写入缓存
+    assert not any(":FLAC:" in key for key in cache.written)
+
+
+def test_error_below_selected_tier_ignored(monkeypatch: pytest.MonkeyPatch):
+    urls = {SongFileType.FLAC: {"a": "flac"}}
+    _ = fake_api(monkeypatch, urls, {SongFileType.MP3_320: 2})
+    assert resolve(["a"]) == {"a": (SongFileType.FLAC, "flac")}
+
+
+def test_error_above_selected_tier_raises(monkeypatch: pytest.MonkeyPatch):
+    urls = {SongFileType.FLAC: {"a": "flac"}, SongFileType.MP3_128: {"b": "mp3"}}
+    _, cache = fake_api(monkeypatch, urls, {SongFileType.MP3_320: 2})
+    with pytest.raises(httpx.ReadTimeout):
+        # b 需要经过查询失败的 MP3_320 才能选到 MP3_128
+        _ = resolve(["a", "b"])
+    assert set(cache.written) == {"song.unavailable:0:FLAC:b", "song.unavailable:0:MP3_128:a"}
@@ -0,0 +1,20 @@
+import importlib.util
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location("startup", Path(__file__).parents[1] / "benchmarks" / "startup.py")
+assert _spec is not None and _spec.loader is not None
+startup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(startup)
+
+
+def test_is_lazy():
+    assert startup.is_lazy("QMDown.api")
+    assert startup.is_lazy("QMDown.api.cache")
+    assert startup.is_lazy("httpx._client")
+    assert not startup.is_lazy("QMDown")
+    assert not startup.is_lazy("QMDown.cli")
+    assert not startup.is_lazy("httpx_extra")
+
+
+def test_version_imports():
+    assert startup.eager_modules() == []
@@ -0,0 +1,206 @@
+import asyncio
+import re
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import httpx
+import pytest
+
+from QMDown.utils.transfer import FileTransfer, Segment, TransferJournal
+from QMDown.utils.writer import DiskWriter
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+SEGMENT = 64 * 1024
+
+
+def range_server(data: bytes, etag: str | None = None, ranges: bool = True) -> httpx.MockTransport:
+    """按 Range 请求头返回 `data` 对应区间的模拟文件服务"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        headers = {"Accept-Ranges": "bytes"} if ranges else {}
+        if etag is not None:
+            headers["ETag"] = etag
+        match = _RANGE_RE.fullmatch(request.headers.get("Range", ""))
+        if_range = request.headers.get("If-Range")
+        if not ranges or match is None or (if_range is not None and if_range != etag):
+            return httpx.Response(200, headers=headers, content=data)
+        start = int(match.group(1))
+        if start >= len(data):
+            return httpx.Response(416, headers={"Content-Range": f"bytes */{len(data)}"})
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return httpx.Response(206, headers=headers, content=data[start : end + 1])
+
+    return httpx.MockTransport(handler)
+
+
+def shifted_server(data: bytes, times: int) -> httpx.MockTransport:
+    """前 `times` 个非首段请求返回错位的区间"""
+    inner = range_server(data)
+    remaining = times
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal remaining
+        match = _RANGE_RE.fullmatch(request.headers.get("Range", ""))
+        if match is not None and int(match.group(1)) > 0 and remaining > 0:
+            remaining -= 1
+            start = int(match.group(1)) + 1
+            end = min(int(match.group(2)), len(data) - 1)
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            return httpx.Response(206, headers=headers, content=data[start : end + 1])
+        return inner.handle_request(request)
+
+    return httpx.MockTransport(handler)
+
+
+def download(
+    tmp_path: Path,
+    transport: httpx.MockTransport,
+    resume: bool = True,
+    before_commit: Callable[[Path], Awaitable[None]] | None = None,
+) -> Path:
+    path = tmp_path / "song.mp3"
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            transfer = FileTransfer(
+                client,
+                "https://cdn.example/song.mp3",
+                path,
+                segment_size=SEGMENT,
+                chunk_size=16 * 1024,
+                resume=resume,
+                writer=DiskWriter(buffer_size=32 * 1024),
+                before_commit=before_commit,
+            )
+            _ = await transfer.run()
+
+    asyncio.run(run())
+    return path
+
+
+def write_partial(path: Path, journal: TransferJournal, data: bytes):
+    """模拟中断的下载,`journal.done` 中的区间以 `data` 填充"""
+    part = path.with_name(path.name + ".part")
+    buffer = bytearray(journal.size)
+    for seg in journal.done:
+        buffer[seg.start : seg.end + 1] = data[seg.start : seg.end + 1]
+    part.write_bytes(bytes(buffer))
+    path.with_name(path.name + ".part.json").write_text(journal.dumps(), "utf-8")
+
+
+def make_data(size: int, seed: int = 1) -> bytes:
+    return bytes((i * seed + i // 251) % 256 for i in range(size))
+
+
+def test_segmented(tmp_path: Path):
+    data = make_data(5 * SEGMENT + 123)
+    path = download(tmp_path, range_server(data, etag='"a"'))
+    assert path.read_bytes() == data
+    assert not path.with_name(path.name + ".part.json").exists()
+
+
+def test_no_range_support(tmp_path: Path):
+    data = make_data(3 * SEGMENT)
+    path = download(tmp_path, range_server(data, ranges=False))
+    assert path.read_bytes() == data
+
+
+def test_resume_missing_ranges(tmp_path: Path):
+    data = make_data(6 * SEGMENT + 7)
+    path = tmp_path / "song.mp3"
+    journal = TransferJournal(size=len(data), etag='"a"', done=[Segment(0, 2 * SEGMENT - 1)])
+    # 已下载部分以不同内容填充,继续下载时不应重新请求
+    write_partial(path, journal, make_data(len(data), seed=7))
+    download(tmp_path, range_server(data, etag='"a"'))
+    result = path.read_bytes()
+    assert result[2 * SEGMENT :] == data[2 * SEGMENT :]
+    assert result[: 2 * SEGMENT] == make_data(len(data), seed=7)[: 2 * SEGMENT]
+
+
+def test_resume_changed_etag(tmp_path: Path):
+    data = make_data(4 * SEGMENT)
+    path = tmp_path / "song.mp3"
+    write_partial(path, TransferJournal(size=len(data), etag='"old"', done=[Segment(0, SEGMENT - 1)]), data[::-1])
+    download(tmp_path, range_server(data, etag='"new"'))
+    assert path.read_bytes() == data
+
+
+def test_resume_changed_size(tmp_path: Path):
+    data = make_data(10 * SEGMENT)
+    path = tmp_path / "song.mp3"
+    # 记录的文件更大且没有 ETag,首个请求的缺失区间落在新文件中间
+    write_partial(path, TransferJournal(size=20 * SEGMENT, done=[Segment(0, 4 * SEGMENT - 1)]), make_data(20 * SEGMENT))
+    download(tmp_path, range_server(data))
+    assert path.read_bytes() == data
+
+
+def test_resume_range_beyond_new_size(tmp_path: Path):
+    data = make_data(3 * SEGMENT)
+    path = tmp_path / "song.mp3"
+    write_partial(path, TransferJournal(size=8 * SEGMENT, done=[Segment(0, 5 * SEGMENT - 1)]), make_data(8 * SEGMENT))
+    download(tmp_path, range_server(data))
+    assert path.read_bytes() == data
+
+
+def test_no_resume(tmp_path: Path):
+    data = make_data(3 * SEGMENT)
+    path = tmp_path / "song.mp3"
+    write_partial(path, TransferJournal(size=len(data), done=[Segment(0, SEGMENT - 1)]), data[::-1])
+    download(tmp_path, range_server(data), resume=False)
+    assert path.read_bytes() == data
+
+
+def test_mismatched_range_retried(tmp_path: Path):
+    data = make_data(4 * SEGMENT)
+    path = download(tmp_path, shifted_server(data, times=2))
+    assert path.read_bytes() == data
+
+
+def test_mismatched_range_fails(tmp_path: Path):
+    data = make_data(4 * SEGMENT)
+    with pytest.raises(httpx.ReadError):
+        _ = download(tmp_path, shifted_server(data, times=100))
+    assert not (tmp_path / "song.mp3").exists()
+
+
+def test_before_commit(tmp_path: Path):
+    data = make_data(2 * SEGMENT)
+    seen: list[Path] = []
+
+    async def tag(part: Path):
+        assert not (tmp_path / "song.mp3").exists()
+        seen.append(part)
+        with part.open("ab") as f:
+            _ = f.write(b"TAG")
+
+    path = download(tmp_path, range_server(data), before_commit=tag)
+    assert seen == [tmp_path / "song.mp3.part"]
+    assert path.read_bytes() == data + b"TAG"
+
+
+def test_cancel_during_before_commit(tmp_path: Path):
+    data = make_data(2 * SEGMENT)
+    path = tmp_path / "song.mp3"
+    tagging = asyncio.Event()
+
+    async def tag(part: Path):
+        # 写入一半时被取消
+        with part.open("r+b") as f:
+            _ = f.write(b"ID3")
+        tagging.set()
+        await asyncio.sleep(10)
+
+    async def run():
+        async with httpx.AsyncClient(transport=range_server(data)) as client:
+            transfer = FileTransfer(client, "https://cdn.example/song.mp3", path, before_commit=tag)
+            task = asyncio.create_task(transfer.run())
+            await tagging.wait()
+            _ = task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(run())
+    assert not path.exists()
+    assert not (tmp_path / "song.mp3.part").exists()
+    assert not (tmp_path / "song.mp3.part.json").exists()